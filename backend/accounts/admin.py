@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import GoogleCalendarToken, User
 
 
 @admin.register(User)
@@ -8,9 +8,17 @@ class UserAdmin(BaseUserAdmin):
     list_display = ('username', 'email', 'role', 'phone_number', 'is_staff', 'date_joined')
     list_filter = ('role', 'is_staff', 'is_superuser', 'is_active')
     fieldsets = BaseUserAdmin.fieldsets + (
-        ('Additional Info', {'fields': ('role', 'phone_number', 'google_calendar_token')}),
+        ('Additional Info', {'fields': ('role', 'phone_number')}),
     )
     add_fieldsets = BaseUserAdmin.add_fieldsets + (
         ('Additional Info', {'fields': ('role', 'email', 'phone_number')}),
     )
 
+
+@admin.register(GoogleCalendarToken)
+class GoogleCalendarTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'token_expiry', 'updated_at')
+    search_fields = ('user__username', 'user__email')
+    # Tokens are secrets: show when they expire, never their values
+    fields = ('user', 'token_expiry', 'updated_at')
+    readonly_fields = ('user', 'token_expiry', 'updated_at')
@@ -0,0 +1,127 @@
+"""Google Calendar OAuth tokens, stored in GoogleCalendarToken.
+
+All reads and writes of calendar tokens go through this module. Access
+tokens are refreshed ahead of expiry by ``manage.py refresh_calendar_tokens``;
+a token found expiring on the request path is refreshed inline. Either way
+a refresh holds a per-user advisory lock, so concurrent callers share one
+call to the token endpoint instead of each making their own.
+"""
+from datetime import timedelta, timezone as dt_timezone
+import requests
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from google.oauth2.credentials import Credentials
+from .models import GoogleCalendarToken
+
+
+TOKEN_URL = "https://oauth2.googleapis.com/token"
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+# Refresh inline when a token has less than this left
+INLINE_REFRESH_MARGIN = timedelta(seconds=60)
+# First key of the two-key advisory lock, the second being the user id
+TOKEN_LOCK_NAMESPACE = 0x63616c  # 'cal'
+
+
+class TokenRevoked(Exception):
+    """The user revoked access; the stored token was deleted"""
+
+
+def save_calendar_token(user, access_token, expires_in, refresh_token=None):
+    """Store a token response for `user`, keeping the old refresh token if none was sent"""
+    defaults = {
+        'access_token': access_token,
+        'token_expiry': timezone.now() + timedelta(seconds=expires_in),
+    }
+    if refresh_token:
+        defaults['refresh_token'] = refresh_token
+    token, created = GoogleCalendarToken.objects.update_or_create(user=user, defaults=defaults)
+    return token
+
+
+def _lock_user_token(user_id):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [TOKEN_LOCK_NAMESPACE, user_id])
+
+
+def refresh_calendar_token(user_id, margin=INLINE_REFRESH_MARGIN, session=None):
+    """Refresh `user_id`'s access token unless it has more than `margin` left.
+
+    Callers that arrive while another refresh for the same user is in
+    flight wait for it and then find the token fresh. Returns the current
+    token, or None if the user has no calendar connected. Raises
+    TokenRevoked if Google no longer accepts the refresh token.
+    """
+    with transaction.atomic():
+        _lock_user_token(user_id)
+        token = GoogleCalendarToken.objects.filter(user_id=user_id).first()
+        if token is None or token.token_expiry > timezone.now() + margin:
+            return token
+        if not token.refresh_token:
+            token.delete()
+            raise TokenRevoked(f"No refresh token stored for user {user_id}")
+
+        response = (session or requests).post(TOKEN_URL, data={
+            'client_id': settings.GOOGLE_CALENDAR_CLIENT_ID,
+            'client_secret': settings.GOOGLE_CALENDAR_CLIENT_SECRET,
+            'refresh_token': token.refresh_token,
+            'grant_type': 'refresh_token',
+        }, timeout=10)
+        if response.status_code == 400 and response.json().get('error') == 'invalid_grant':
+            token.delete()
+            raise TokenRevoked(f"Refresh token of user {user_id} was revoked")
+        response.raise_for_status()
+        data = response.json()
+
+        token.access_token = data['access_token']
+        token.token_expiry = timezone.now() + timedelta(seconds=data['expires_in'])
+        if data.get('refresh_token'):
+            token.refresh_token = data['refresh_token']
+        token.save()
+        return token
+
+
+def get_calendar_credentials(user):
+    """Credentials for `user`'s calendar, or None if not connected.
+
+    The credentials carry no refresh token, so the Google client cannot
+    refresh them on its own behind the lock; every refresh goes through
+    refresh_calendar_token.
+    """
+    try:
+        token = user.google_calendar
+    except GoogleCalendarToken.DoesNotExist:
+        return None
+    if token.token_expiry <= timezone.now() + INLINE_REFRESH_MARGIN:
+        try:
+            token = refresh_calendar_token(user.id)
+        except TokenRevoked:
+            return None
+        if token is None:
+            return None
+    return Credentials(
+        token=token.access_token,
+        expiry=token.token_expiry.astimezone(dt_timezone.utc).replace(tzinfo=None),
+        scopes=SCOPES,
+    )
+
+
+def refresh_expiring_tokens(within=timedelta(minutes=10)):
+    """Refresh every token expiring within `within`, return counts by outcome"""
+    counts = {'refreshed': 0, 'revoked': 0, 'failed': 0}
+    deadline = timezone.now() + within
+    user_ids = list(
+        GoogleCalendarToken.objects.filter(token_expiry__lte=deadline).values_list('user_id', flat=True)
+    )
+    with requests.Session() as session:
+        for user_id in user_ids:
+            try:
+                refresh_calendar_token(user_id, margin=within, session=session)
+            except TokenRevoked:
+                counts['revoked'] += 1
+            except Exception as e:
+                print(f"Refreshing calendar token of user {user_id} failed: {e}")
+                counts['failed'] += 1
+            else:
+                counts['refreshed'] += 1
+    return counts
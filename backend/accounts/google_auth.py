@@ -1,9 +1,11 @@
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
+from django.db import transaction
+from notifications.services import enqueue_job
 from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-import json
+from datetime import datetime
+from .calendar_tokens import save_calendar_token
 
 
 @login_required
@@ -60,11 +62,11 @@ def google_calendar_callback(request):
     flow.fetch_token(authorization_response=authorization_response)
     
     credentials = flow.credentials
+    expires_in = (credentials.expiry - datetime.utcnow()).total_seconds() if credentials.expiry else 0
     
-    # Store credentials in user model
-    request.user.google_calendar_token = credentials.token
-    request.user.google_calendar_refresh_token = credentials.refresh_token
-    request.user.save()
+    with transaction.atomic():
+        save_calendar_token(request.user, credentials.token, expires_in, refresh_token=credentials.refresh_token)
+        enqueue_job('calendar_backfill', user_id=request.user.id)
     
     # Clear state from session
     del request.session['google_oauth_state']
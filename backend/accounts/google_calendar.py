@@ -2,11 +2,11 @@ import requests
 from django.conf import settings
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
-from django.utils.timezone import now, timedelta
-from .models import GoogleCalendarToken
+from django.db import transaction
+from notifications.services import enqueue_job
+from .calendar_tokens import TOKEN_URL, save_calendar_token
 
 AUTH_URL = "https://accounts.google.com/o/oauth2/v2/auth"
-TOKEN_URL = "https://oauth2.googleapis.com/token"
 
 SCOPES = "https://www.googleapis.com/auth/calendar"
 
@@ -38,13 +38,14 @@ def calendar_callback(request):
 
     response = requests.post(TOKEN_URL, data=data).json()
 
-    GoogleCalendarToken.objects.update_or_create(
-        user=request.user,
-        defaults={
-            "access_token": response["access_token"],
-            "refresh_token": response.get("refresh_token"),
-            "token_expiry": now() + timedelta(seconds=response["expires_in"]),
-        },
-    )
+    with transaction.atomic():
+        save_calendar_token(
+            request.user,
+            response["access_token"],
+            expires_in=response["expires_in"],
+            refresh_token=response.get("refresh_token"),
+        )
+        # Existing upcoming appointments are pushed to the new calendar
+        enqueue_job("calendar_backfill", user_id=request.user.id)
 
     return redirect("patients:dashboard")
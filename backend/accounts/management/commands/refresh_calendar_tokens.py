@@ -0,0 +1,16 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from accounts.calendar_tokens import refresh_expiring_tokens
+
+
+class Command(BaseCommand):
+    help = 'Refresh Google Calendar access tokens that expire soon (run every few minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--within', type=int, default=10, help='Refresh tokens expiring within this many minutes')
+
+    def handle(self, *args, **options):
+        counts = refresh_expiring_tokens(within=timedelta(minutes=options['within']))
+        self.stdout.write(
+            f"Refreshed {counts['refreshed']} token(s); {counts['revoked']} revoked, {counts['failed']} failed"
+        )
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def copy_user_tokens(apps, schema_editor):
+    """Move tokens stored on User into GoogleCalendarToken.
+
+    Their expiry was never recorded, so they are marked expired and get
+    refreshed on first use.
+    """
+    User = apps.get_model('accounts', 'User')
+    GoogleCalendarToken = apps.get_model('accounts', 'GoogleCalendarToken')
+    expired = django.utils.timezone.now()
+    GoogleCalendarToken.objects.bulk_create([
+        GoogleCalendarToken(
+            user_id=user.id,
+            access_token=user.google_calendar_token,
+            refresh_token=user.google_calendar_refresh_token or '',
+            token_expiry=expired,
+        )
+        for user in User.objects.exclude(google_calendar_token__isnull=True).exclude(google_calendar_token='')
+    ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoogleCalendarToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('access_token', models.TextField()),
+                ('refresh_token', models.TextField(blank=True)),
+                ('token_expiry', models.DateTimeField(db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='google_calendar', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(copy_user_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='user',
+            name='google_calendar_refresh_token',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='google_calendar_token',
+        ),
+    ]
@@ -33,8 +33,10 @@ class GoogleCalendarToken(models.Model):
         related_name="google_calendar"
     )
     access_token = models.TextField()
-    refresh_token = models.TextField()
-    token_expiry = models.DateTimeField()
+    refresh_token = models.TextField(blank=True)
+    # Indexed for the bulk refresh of tokens about to expire
+    token_expiry = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Google Calendar Token for {self.user.username}"
@@ -1,12 +1,48 @@
 import requests
 import os
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# (connect, read) timeouts in seconds for calls to the email service
+EMAIL_TIMEOUT = (3.05, 5)
+# Keep-alive connections kept per host, shared by the dispatcher's worker
+# threads
+EMAIL_POOL_SIZE = 16
+
+
+def build_email_session():
+    """Session with pooled keep-alive connections to the email service.
+
+    Only failures to connect are retried here (the request never reached
+    the service, so retrying cannot send twice); any other failure raises
+    and the outbox job is retried with backoff.
+    """
+    session = requests.Session()
+    retry = Retry(total=3, connect=3, read=0, status=0, other=0, backoff_factor=0.2, allowed_methods=None)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=EMAIL_POOL_SIZE, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+email_session = build_email_session()
+
+
+class EmailDeliveryError(Exception):
+    """The email service accepted a batch but could not send some of it"""
+
+
+def post_email(payload):
+    """POST a message (or a {"messages": [...]} batch) to the email service"""
+    response = email_session.post(settings.EMAIL_SERVICE_URL, json=payload, timeout=EMAIL_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
 
 
 def send_welcome_email(email, name, role):
     """Send welcome email via serverless service"""
-    email_service_url = settings.EMAIL_SERVICE_URL
-    
     payload = {
         'action': 'SIGNUP_WELCOME',
         'to': email,
@@ -15,51 +51,56 @@ def send_welcome_email(email, name, role):
     }
     
     try:
-        response = requests.post(email_service_url, json=payload, timeout=5)
-        response.raise_for_status()
-        return response.json()
+        return post_email(payload)
     except requests.exceptions.RequestException as e:
         print(f"Failed to send welcome email: {e}")
         raise
 
 
-def send_booking_confirmation_email(patient_email, doctor_email, patient_name, doctor_name, appointment_date, appointment_time):
+def send_booking_confirmation_email(patient_email, doctor_email, patient_name, doctor_name, appointment_date, appointment_time,
+                                    recipients=('patient', 'doctor')):
     """Send booking confirmation email via serverless service"""
-    email_service_url = settings.EMAIL_SERVICE_URL
-    
-    # Send to patient
-    patient_payload = {
+    details = {
         'action': 'BOOKING_CONFIRMATION',
-        'to': patient_email,
         'patient_name': patient_name,
         'doctor_name': doctor_name,
         'appointment_date': appointment_date,
         'appointment_time': appointment_time,
-        'recipient_type': 'patient'
-    }
-    
-    # Send to doctor
-    doctor_payload = {
-        'action': 'BOOKING_CONFIRMATION',
-        'to': doctor_email,
-        'patient_name': patient_name,
-        'doctor_name': doctor_name,
-        'appointment_date': appointment_date,
-        'appointment_time': appointment_time,
-        'recipient_type': 'doctor'
     }
+    addresses = {'patient': patient_email, 'doctor': doctor_email}
+    messages = [dict(details, to=addresses[recipient], recipient_type=recipient) for recipient in recipients]
     
+    # One batch request: the emails go out over one SMTP session
     try:
-        # Send to patient
-        response1 = requests.post(email_service_url, json=patient_payload, timeout=5)
-        response1.raise_for_status()
-        
-        # Send to doctor
-        response2 = requests.post(email_service_url, json=doctor_payload, timeout=5)
-        response2.raise_for_status()
-        
-        return {'patient': response1.json(), 'doctor': response2.json()}
+        response = post_email({'messages': messages})
     except requests.exceptions.RequestException as e:
         print(f"Failed to send booking confirmation email: {e}")
         raise
+    failed = [result for result in response['results'] if result['status'] != 'sent']
+    if failed:
+        raise EmailDeliveryError(f"Booking confirmation not sent to {failed}")
+    return dict(zip(recipients, response['results']))
+
+
+def send_booking_digests(digests):
+    """Send doctors their booking digests in one batch request.
 
+    Each digest is {doctor_email, doctor_name, appointments: [{patient_name,
+    appointment_date, appointment_time}]}; one with a single appointment is
+    sent as the doctor's usual booking confirmation. Returns the email
+    service's result for each digest, in order.
+    """
+    messages = []
+    for digest in digests:
+        message = {'to': digest['doctor_email'], 'recipient_type': 'doctor', 'doctor_name': digest['doctor_name']}
+        if len(digest['appointments']) == 1:
+            message.update(digest['appointments'][0], action='BOOKING_CONFIRMATION')
+        else:
+            message.update(action='BOOKING_DIGEST', appointments=digest['appointments'])
+        messages.append(message)
+    try:
+        response = post_email({'messages': messages})
+    except requests.exceptions.RequestException as e:
+        print(f"Failed to send booking digests: {e}")
+        raise
+    return response['results']
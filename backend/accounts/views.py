@@ -3,8 +3,9 @@ from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
+from django.db import transaction
+from notifications.services import enqueue_job
 from .forms import DoctorSignUpForm, PatientSignUpForm, LoginForm
-from .services import send_welcome_email
 
 
 def home(request):
@@ -26,13 +27,11 @@ def doctor_signup(request):
     if request.method == 'POST':
         form = DoctorSignUpForm(request.POST)
         if form.is_valid():
-            user = form.save()
+            with transaction.atomic():
+                user = form.save()
+                # Welcome email is sent by the outbox dispatcher
+                enqueue_job('welcome_email', email=user.email, name=user.first_name, role='doctor')
             messages.success(request, 'Account created successfully! Please log in.')
-            # Send welcome email
-            try:
-                send_welcome_email(user.email, user.first_name, 'doctor')
-            except Exception as e:
-                print(f"Email sending failed: {e}")
             return redirect('accounts:login')
     else:
         form = DoctorSignUpForm()
@@ -48,13 +47,11 @@ def patient_signup(request):
     if request.method == 'POST':
         form = PatientSignUpForm(request.POST)
         if form.is_valid():
-            user = form.save()
+            with transaction.atomic():
+                user = form.save()
+                # Welcome email is sent by the outbox dispatcher
+                enqueue_job('welcome_email', email=user.email, name=user.first_name, role='patient')
             messages.success(request, 'Account created successfully! Please log in.')
-            # Send welcome email
-            try:
-                send_welcome_email(user.email, user.first_name, 'patient')
-            except Exception as e:
-                print(f"Email sending failed: {e}")
             return redirect('accounts:login')
     else:
         form = PatientSignUpForm()
@@ -0,0 +1,91 @@
+"""Per-process cache of authorized Google Calendar service objects.
+
+build() loads and parses the Calendar discovery document and generates the
+resource classes on every call. Here the document is parsed once per
+process and each user's service is built once per access token.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import timezone as dt_timezone
+from functools import lru_cache
+from django.conf import settings
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+
+SERVICE_CACHE_SIZE = 256
+# Lifetime of a cached service when its token's expiry is unknown; Google
+# access tokens last an hour
+DEFAULT_SERVICE_TTL = 45 * 60
+# Rebuild this long before the token expires so no call starts on a token
+# about to lapse
+EXPIRY_MARGIN = 60
+
+CachedService = namedtuple('CachedService', ['token', 'service', 'expires_at'])
+
+
+@lru_cache(maxsize=None)
+def calendar_discovery_document():
+    """Calendar v3 discovery document shipped with google-api-python-client.
+
+    settings.GOOGLE_CALENDAR_ROOT_URL replaces the API host; requests and
+    batch requests are both addressed from rootUrl.
+    """
+    document = json.loads(get_static_doc('calendar', 'v3'))
+    if settings.GOOGLE_CALENDAR_ROOT_URL:
+        document['rootUrl'] = document['mtlsRootUrl'] = settings.GOOGLE_CALENDAR_ROOT_URL
+    return document
+
+
+def build_calendar_service(credentials):
+    """Build a Calendar service from the cached discovery document"""
+    return build_from_document(calendar_discovery_document(), credentials=credentials)
+
+
+class ServiceCache:
+    """LRU of Calendar services keyed by user id, valid while their token is.
+
+    A service holds an httplib2 connection, which is not thread safe, so
+    every thread (e.g. each dispatcher worker) keeps its own entries.
+    """
+
+    def __init__(self, maxsize=SERVICE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.local = threading.local()
+
+    def _entries(self):
+        if not hasattr(self.local, 'entries'):
+            self.local.entries = OrderedDict()
+        return self.local.entries
+
+    def get(self, user_id, token):
+        """The service cached for `user_id` if it was built for `token` and has not expired"""
+        entries = self._entries()
+        entry = entries.get(user_id)
+        if entry is None:
+            return None
+        if entry.token != token or entry.expires_at <= time.time():
+            del entries[user_id]
+            return None
+        entries.move_to_end(user_id)
+        return entry.service
+
+    def put(self, user_id, token, service, expiry=None):
+        """Cache `service` for `user_id` until `expiry` (naive UTC, as on Credentials)"""
+        if expiry is not None:
+            expires_at = expiry.replace(tzinfo=dt_timezone.utc).timestamp() - EXPIRY_MARGIN
+        else:
+            expires_at = time.time() + DEFAULT_SERVICE_TTL
+        entries = self._entries()
+        entries[user_id] = CachedService(token, service, expires_at)
+        entries.move_to_end(user_id)
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+    def discard(self, user_id):
+        self._entries().pop(user_id, None)
+
+
+calendar_services = ServiceCache()
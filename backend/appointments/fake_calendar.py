@@ -0,0 +1,144 @@
+"""Local stand-in for the Google Calendar API, for offline runs and tests.
+
+Implements just what HMS uses: event inserts (single and inside a
+multipart/mixed batch request) and listing a calendar's events. Events
+are kept in memory per bearer token, so each connected user has their own
+calendar. Start it with ``manage.py run_fake_calendar`` and set
+GOOGLE_CALENDAR_ROOT_URL to its address.
+"""
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+EVENTS_PATH = re.compile(r'^/calendar/v3/calendars/(?P<calendar>[^/]+)/events$')
+BATCH_PATH = '/batch/calendar/v3'
+
+
+class FakeCalendar:
+    """In-memory calendars and the request handling shared by plain and batched calls"""
+
+    def __init__(self, latency=0.0, fail_rate=0.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.events = {}
+        self.requests = 0
+        self.batches = 0
+
+    def handle(self, method, target, headers, body):
+        """Answer one API call, return (status, JSON-serializable body)"""
+        with self.lock:
+            self.requests += 1
+        scheme, _, token = headers.get('Authorization', '').partition(' ')
+        if scheme != 'Bearer' or not token.strip():
+            return 401, error_body(401, 'Login Required')
+        match = EVENTS_PATH.match(urlsplit(target).path)
+        if match is None:
+            return 404, error_body(404, 'Not Found')
+        if self.fail_rate and random.random() < self.fail_rate:
+            return 503, error_body(503, 'Backend Error')
+
+        calendar = (token.strip(), match['calendar'])
+        if method == 'GET':
+            with self.lock:
+                items = list(self.events.get(calendar, []))
+            return 200, {'kind': 'calendar#events', 'items': items}
+        if method != 'POST':
+            return 405, error_body(405, 'Method Not Allowed')
+        try:
+            event = json.loads(body or b'{}')
+        except ValueError:
+            return 400, error_body(400, 'Parse Error')
+        with self.lock:
+            event = dict(event, id=f'fake{next(self.ids)}', kind='calendar#event', status='confirmed')
+            self.events.setdefault(calendar, []).append(event)
+        return 200, event
+
+    def handle_batch(self, content_type, body):
+        """Answer a multipart/mixed batch, return (content type, body bytes)"""
+        with self.lock:
+            self.batches += 1
+        message = BytesParser(policy=HTTP).parsebytes(
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + body
+        )
+        boundary = f'batch_{uuid.uuid4().hex}'
+        parts = []
+        for part in message.iter_parts():
+            request_line, rest = re.split(rb'\r?\n', part.get_payload(decode=True), maxsplit=1)
+            method, target, _ = request_line.decode().split(' ', 2)
+            inner = BytesParser(policy=HTTP).parsebytes(rest)
+            status, response = self.handle(method, target, inner, inner.get_payload(decode=True))
+            content_id = part.get('Content-ID', '').strip('<>')
+            payload = json.dumps(response)
+            parts.append(
+                f'--{boundary}\r\n'
+                f'Content-Type: application/http\r\n'
+                f'Content-ID: <response-{content_id}>\r\n\r\n'
+                f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                f'Content-Type: application/json; charset=UTF-8\r\n'
+                f'Content-Length: {len(payload.encode())}\r\n\r\n'
+                f'{payload}\r\n'
+            )
+        parts.append(f'--{boundary}--\r\n')
+        return f'multipart/mixed; boundary={boundary}', ''.join(parts).encode()
+
+
+def error_body(code, message):
+    return {'error': {'code': code, 'message': message, 'errors': [{'reason': message, 'message': message}]}}
+
+
+class FakeCalendarHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def calendar(self):
+        return self.server.calendar
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def respond(self, method):
+        body = self.read_body()
+        if self.calendar.latency:
+            time.sleep(self.calendar.latency)
+        if urlsplit(self.path).path == BATCH_PATH and method == 'POST':
+            content_type, payload = self.calendar.handle_batch(self.headers.get('Content-Type', ''), body)
+            self.send(200, content_type, payload)
+            return
+        status, response = self.calendar.handle(method, self.path, self.headers, body)
+        self.send(status, 'application/json; charset=UTF-8', json.dumps(response).encode())
+
+    def do_GET(self):
+        self.respond('GET')
+
+    def do_POST(self):
+        self.respond('POST')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host='127.0.0.1', port=8765, latency=0.0, fail_rate=0.0, verbose=False):
+    """Fake Calendar HTTP server; call serve_forever() on it"""
+    server = ThreadingHTTPServer((host, port), FakeCalendarHandler)
+    server.calendar = FakeCalendar(latency=latency, fail_rate=fail_rate)
+    server.verbose = verbose
+    return server
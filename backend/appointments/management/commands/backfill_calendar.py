@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import User
+from appointments.services import backfill_calendar
+
+
+class Command(BaseCommand):
+    help = "Push upcoming appointments without events to users' Google Calendars (safe to rerun)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Users to backfill (default: every connected user)')
+        parser.add_argument('--rate', type=float, default=None,
+                            help='Inserts per second per user (default: GOOGLE_CALENDAR_BACKFILL_RATE)')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(google_calendar__isnull=False).order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+            missing = set(options['usernames']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"Not found or no calendar connected: {', '.join(sorted(missing))}")
+
+        total_failed = 0
+        for user in users.iterator():
+            done, failed, finished = backfill_calendar(user, rate=options['rate'])
+            total_failed += failed
+            self.stdout.write(f"{user.username}: {done} done, {failed} failed")
+        if total_failed:
+            raise CommandError(f"{total_failed} event(s) failed; rerun to retry them")
+        self.stdout.write(self.style.SUCCESS('Backfill complete'))
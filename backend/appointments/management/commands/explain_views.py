@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+from doctors.services import (
+    AVAILABILITY_LIST_KEYS, DIRECTORY_KEYS, availability_list_queryset, dashboard_slots, directory_queryset,
+    open_slots_after, with_schedule_rules,
+)
+from hms.pagination import first_page_query
+from appointments.models import Appointment
+from appointments.services import (
+    APPOINTMENT_LIST_KEYS, doctor_appointments, past_appointments, patient_appointments, upcoming_appointments
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Print EXPLAIN (ANALYZE, BUFFERS) for the queries behind the dashboard and list views. '
+        'Run it against seeded data (e.g. loadtest_booking --keep) to spot plan regressions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctor-id', type=int, help='Doctor to explain for (default: busiest doctor)')
+        parser.add_argument('--patient-id', type=int, help='Patient to explain for (default: busiest patient)')
+        parser.add_argument('--view', action='append', help='Only explain these views (repeatable)')
+
+    def busiest(self, field):
+        row = Appointment.objects.values(field).annotate(n=Count('id')).order_by('-n').first()
+        if row is None:
+            raise CommandError(f'No appointments found; pass --{field}-id or seed some data first')
+        return row[field]
+
+    def view_queries(self, doctor_id, patient_id):
+        """The views' own querysets, through the helpers the views use"""
+        now = timezone.now()
+        return {
+            'doctor_dashboard.upcoming_appointments': upcoming_appointments(doctor_appointments(doctor_id), now),
+            'doctor_dashboard.availability_slots': dashboard_slots(doctor_id),
+            'view_bookings': first_page_query(
+                doctor_appointments(doctor_id), APPOINTMENT_LIST_KEYS, descending=True
+            ),
+            'availability_list': first_page_query(
+                availability_list_queryset(doctor_id), AVAILABILITY_LIST_KEYS, descending=True
+            ),
+            # The concrete slots of bookable_slots_page's first page
+            'doctor_availability': open_slots_after(doctor_id, now)[:settings.PAGE_SIZE + 1],
+            'patient_dashboard.upcoming_appointments': upcoming_appointments(patient_appointments(patient_id), now),
+            'patient_dashboard.past_appointments': past_appointments(patient_appointments(patient_id), now),
+            'doctor_list': first_page_query(with_schedule_rules(directory_queryset()), DIRECTORY_KEYS),
+            'doctor_list.search': first_page_query(with_schedule_rules(directory_queryset('a')), DIRECTORY_KEYS),
+            'view_appointments': first_page_query(
+                patient_appointments(patient_id), APPOINTMENT_LIST_KEYS, descending=True
+            ),
+        }
+
+    def handle(self, *args, **options):
+        doctor_id = options['doctor_id'] or self.busiest('doctor')
+        patient_id = options['patient_id'] or self.busiest('patient')
+        self.stdout.write(f"Explaining for doctor {doctor_id}, patient {patient_id}")
+
+        for name, queryset in self.view_queries(doctor_id, patient_id).items():
+            if options['view'] and not any(name.startswith(view) for view in options['view']):
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {name}"))
+            self.stdout.write(queryset.explain(analyze=True, buffers=True))
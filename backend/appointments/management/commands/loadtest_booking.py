@@ -0,0 +1,195 @@
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dt_time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Exists, OuterRef
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User
+from doctors.models import AvailabilitySlot
+from notifications.models import OutboxJob
+from appointments.models import Appointment
+
+
+PREFIX = 'loadtest_'
+
+
+class ClaimTimer:
+    """Execute wrapper that times statements which update slot rows.
+
+    Time spent in these statements is dominated by waiting for other
+    transactions' row locks, so it is reported as lock wait.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith('UPDATE') or AvailabilitySlot._meta.db_table not in sql:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.durations.append(time.perf_counter() - start)
+
+
+def percentile(values, pct):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent patients at create_booking and verify no slot is double booked'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=5)
+        parser.add_argument('--slots-per-doctor', type=int, default=20)
+        parser.add_argument('--patients', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=16, help='Number of client threads')
+        parser.add_argument('--attempts', type=int, default=5, help='Booking attempts per patient')
+        parser.add_argument('--hot-slots', type=int, default=0,
+                            help='Aim every attempt at this many slots to force contention (0 = all slots)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for slot choice')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows after the run')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.cleanup()
+        doctors, patients, slot_ids = self.seed(options)
+        targets = slot_ids[:options['hot_slots']] if options['hot_slots'] else slot_ids
+
+        timer = ClaimTimer()
+        latencies = []
+        outcomes = {'booked': 0, 'rejected': 0, 'error': 0}
+        results_lock = threading.Lock()
+        success_url = reverse('patients:dashboard')
+
+        def run_patient(patient):
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(patient)
+            try:
+                with connection.execute_wrapper(timer):
+                    for _ in range(options['attempts']):
+                        slot_id = rng.choice(targets)
+                        start = time.perf_counter()
+                        try:
+                            response = client.post(
+                                reverse('appointments:create_booking', args=[slot_id]),
+                                {'slot_id': slot_id, 'notes': ''},
+                            )
+                            outcome = 'booked' if response.get('Location') == success_url else 'rejected'
+                        except Exception as e:
+                            self.stderr.write(f"Request failed: {e}")
+                            outcome = 'error'
+                        elapsed = time.perf_counter() - start
+                        with results_lock:
+                            latencies.append(elapsed)
+                            outcomes[outcome] += 1
+            finally:
+                connection.close()
+
+        self.stdout.write(
+            f"Booking with {len(patients)} patients x {options['attempts']} attempts "
+            f"on {len(targets)} slot(s), {options['concurrency']} threads"
+        )
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(run_patient, patients))
+        wall = time.perf_counter() - started
+
+        self.report(latencies, outcomes, timer.durations, wall)
+        problems = self.verify(doctors)
+        if not options['keep']:
+            self.cleanup()
+
+        if problems:
+            for problem in problems:
+                self.stderr.write(self.style.ERROR(problem))
+            raise CommandError('Booking consistency check failed')
+        self.stdout.write(self.style.SUCCESS('Consistency check passed: no double bookings'))
+
+    def seed(self, options):
+        doctors = User.objects.bulk_create([
+            User(username=f'{PREFIX}doctor{i}', email=f'{PREFIX}doctor{i}@example.com',
+                 first_name='Load', last_name=f'Doctor {i}', role='doctor')
+            for i in range(options['doctors'])
+        ])
+        patients = User.objects.bulk_create([
+            User(username=f'{PREFIX}patient{i}', email=f'{PREFIX}patient{i}@example.com',
+                 first_name='Load', last_name=f'Patient {i}', role='patient')
+            for i in range(options['patients'])
+        ])
+
+        first_day = timezone.now().date() + timedelta(days=1)
+        slots = []
+        for doctor in doctors:
+            for n in range(options['slots_per_doctor']):
+                day = first_day + timedelta(days=n // 16)
+                start = datetime.combine(day, dt_time(8, 0)) + timedelta(minutes=30 * (n % 16))
+                slot = AvailabilitySlot(
+                    doctor=doctor,
+                    date=day,
+                    start_time=start.time(),
+                    end_time=(start + timedelta(minutes=30)).time(),
+                )
+                slot.sync_timestamps()
+                slots.append(slot)
+        AvailabilitySlot.objects.bulk_create(slots, batch_size=1000)
+        slot_ids = list(
+            AvailabilitySlot.objects.filter(doctor__in=doctors).order_by('?').values_list('id', flat=True)
+        )
+        self.stdout.write(f"Seeded {len(doctors)} doctors, {len(patients)} patients, {len(slot_ids)} slots")
+        return doctors, patients, slot_ids
+
+    def report(self, latencies, outcomes, lock_waits, wall):
+        ms = [value * 1000 for value in latencies]
+        waits = [value * 1000 for value in lock_waits]
+        self.stdout.write(
+            f"Requests: {len(ms)} in {wall:.2f}s "
+            f"(booked={outcomes['booked']} rejected={outcomes['rejected']} error={outcomes['error']})"
+        )
+        self.stdout.write(f"Bookings/s: {outcomes['booked'] / wall:.1f}  Requests/s: {len(ms) / wall:.1f}")
+        if ms:
+            self.stdout.write(
+                f"Latency ms: p50={percentile(ms, 50):.1f} p95={percentile(ms, 95):.1f} "
+                f"p99={percentile(ms, 99):.1f} max={max(ms):.1f}"
+            )
+        if waits:
+            self.stdout.write(
+                f"Slot claim (lock wait) ms: total={sum(waits):.1f} p50={percentile(waits, 50):.1f} "
+                f"p99={percentile(waits, 99):.1f} max={max(waits):.1f}"
+            )
+
+    def verify(self, doctors):
+        problems = []
+        slots = AvailabilitySlot.objects.filter(doctor__in=doctors)
+        appointments = Appointment.objects.filter(doctor__in=doctors)
+
+        for row in appointments.values('availability_slot').annotate(n=Count('id')).filter(n__gt=1):
+            problems.append(f"Slot {row['availability_slot']} has {row['n']} appointments")
+        for row in (appointments.values('doctor', 'appointment_date', 'appointment_time')
+                    .annotate(n=Count('id')).filter(n__gt=1)):
+            problems.append(f"Doctor {row['doctor']} double booked at {row['appointment_date']} {row['appointment_time']}")
+
+        has_appointment = Exists(Appointment.objects.filter(availability_slot=OuterRef('pk')))
+        for slot_id in slots.filter(has_appointment, is_available=True).values_list('id', flat=True):
+            problems.append(f"Slot {slot_id} is booked but still marked available")
+        for slot_id in slots.filter(~has_appointment, is_available=False).values_list('id', flat=True):
+            problems.append(f"Slot {slot_id} is marked booked but has no appointment")
+        return problems
+
+    def cleanup(self):
+        appointment_ids = list(
+            Appointment.objects.filter(doctor__username__startswith=PREFIX).values_list('id', flat=True)
+        )
+        OutboxJob.objects.filter(payload__appointment_id__in=appointment_ids).delete()
+        User.objects.filter(username__startswith=PREFIX).delete()
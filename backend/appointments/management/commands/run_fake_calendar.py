@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from appointments.fake_calendar import make_server
+
+
+class Command(BaseCommand):
+    help = 'Serve a local fake Google Calendar API (set GOOGLE_CALENDAR_ROOT_URL to its address)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before each HTTP response')
+        parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of inserts answered with 503')
+        parser.add_argument('--verbose', action='store_true', help='Log every request')
+
+    def handle(self, *args, **options):
+        server = make_server(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            fail_rate=options['fail_rate'],
+            verbose=options['verbose'],
+        )
+        host, port = server.server_address[:2]
+        self.stdout.write(f"Fake Calendar API on http://{host}:{port}/ (GOOGLE_CALENDAR_ROOT_URL=http://{host}:{port}/)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            calendar = server.calendar
+            self.stdout.write(
+                f"Served {calendar.requests} API call(s) in {calendar.batches} batch request(s); "
+                f"{sum(len(events) for events in calendar.events.values())} event(s) stored"
+            )
+            server.server_close()
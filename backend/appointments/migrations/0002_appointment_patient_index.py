@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:40
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('appointments', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'appointment_date', 'appointment_time', 'id'], name='appt_patient_date_time_idx'),
+        ),
+    ]
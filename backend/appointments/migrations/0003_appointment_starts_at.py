@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+BACKFILL_SQL = """
+    UPDATE appointments_appointment AS a
+    SET starts_at = (a.appointment_date + a.appointment_time) AT TIME ZONE %s,
+        ends_at = s.ends_at
+    FROM doctors_availabilityslot AS s
+    WHERE s.id = a.availability_slot_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0003_availabilityslot_starts_at'),
+        ('appointments', '0002_appointment_patient_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='starts_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='ends_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunSQL(
+            [(BACKFILL_SQL, [settings.TIME_ZONE])],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='starts_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='ends_at',
+            field=models.DateTimeField(),
+        ),
+    ]
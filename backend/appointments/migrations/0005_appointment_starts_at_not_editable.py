@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_appointment_starts_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='ends_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='starts_at',
+            field=models.DateTimeField(editable=False),
+        ),
+    ]
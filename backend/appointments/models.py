@@ -1,7 +1,7 @@
 from django.db import models
 from django.utils import timezone
 from accounts.models import User
-from doctors.models import AvailabilitySlot
+from doctors.models import AvailabilitySlot, combine_local
 
 
 class Appointment(models.Model):
@@ -14,21 +14,40 @@ class Appointment(models.Model):
     notes = models.TextField(blank=True)
     google_calendar_event_id_doctor = models.CharField(max_length=255, blank=True, null=True)
     google_calendar_event_id_patient = models.CharField(max_length=255, blank=True, null=True)
+    # Copied from the slot so upcoming/past filters are one indexed predicate
+    starts_at = models.DateTimeField(editable=False)
+    ends_at = models.DateTimeField(editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['appointment_date', 'appointment_time']
         unique_together = ['doctor', 'appointment_date', 'appointment_time']
+        indexes = [
+            # Patient dashboard and appointment history; the doctor side is
+            # already covered by the unique_together index.
+            models.Index(
+                fields=['patient', 'appointment_date', 'appointment_time', 'id'],
+                name='appt_patient_date_time_idx',
+            ),
+            models.Index(fields=['doctor', 'starts_at'], name='appt_doctor_starts_idx'),
+            models.Index(fields=['patient', 'starts_at'], name='appt_patient_starts_idx'),
+        ]
     
     def __str__(self):
         return f"Appointment: {self.patient.get_full_name()} with Dr. {self.doctor.get_full_name()} on {self.appointment_date} at {self.appointment_time}"
     
+    def save(self, *args, **kwargs):
+        # Both follow appointment_date/time, ends_at keeping the slot's length;
+        # the slot is only fetched when they are missing or have moved
+        starts_at = combine_local(self.appointment_date, self.appointment_time)
+        if self.starts_at != starts_at or self.ends_at is None:
+            slot = self.availability_slot
+            self.starts_at = starts_at
+            self.ends_at = starts_at + (slot.ends_at - slot.starts_at)
+        super().save(*args, **kwargs)
+    
     def is_upcoming(self):
         """Check if appointment is in the future"""
-        now = timezone.now()
-        appointment_datetime = timezone.make_aware(
-            timezone.datetime.combine(self.appointment_date, self.appointment_time)
-        )
-        return appointment_datetime > now
+        return self.starts_at > timezone.now()
 
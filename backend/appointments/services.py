@@ -1,81 +1,444 @@
+import json
 import os
-from datetime import datetime, timedelta
+import time
+from datetime import timedelta
+from itertools import islice
 from django.conf import settings
-from google.oauth2.credentials import Credentials
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
 from google_auth_oauthlib.flow import Flow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from accounts.calendar_tokens import get_calendar_credentials
+from accounts.models import User
+from accounts.services import EmailDeliveryError, send_booking_confirmation_email, send_booking_digests
+from doctors.models import AvailabilitySlot
+from doctors.services import expand_schedule_week, invalidate_schedule, on_appointment_booked, on_slot_closed
+from notifications.services import enqueue_booking_side_effects, enqueue_job
+from .calendar_cache import build_calendar_service, calendar_services
+from .models import Appointment
 
 
-def get_google_calendar_service(user):
-    """Get Google Calendar service for user"""
-    if not user.google_calendar_token:
-        return None
-    
-    try:
-        token_dict = {
-            'token': user.google_calendar_token,
-            'refresh_token': user.google_calendar_refresh_token or '',
-            'token_uri': 'https://oauth2.googleapis.com/token',
-            'client_id': settings.GOOGLE_CLIENT_ID,
-            'client_secret': settings.GOOGLE_CLIENT_SECRET,
-            'scopes': ['https://www.googleapis.com/auth/calendar']
-        }
+# Calendar backfill: retries for parts rejected by the API's rate limit,
+# with the pause doubling from this many seconds
+BACKFILL_RATE_LIMIT_RETRIES = 5
+BACKFILL_BACKOFF_SECONDS = 2
+# 403 reasons Google gives for going over a quota
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+# Claims a slot in one statement: the row is only updated if it is still
+# free and in the future, so concurrent bookers never wait on a row lock
+# held across reads and the loser simply gets no row back.
+CLAIM_SLOT_SQL = f"""
+    UPDATE {AvailabilitySlot._meta.db_table}
+    SET is_available = false
+    WHERE id = %s
+      AND is_available
+      AND starts_at > now()
+    RETURNING doctor_id, date, start_time, end_time, starts_at, ends_at
+"""
+
+
+def book_slot(slot_id, patient, notes=''):
+    """Atomically claim a slot and create its appointment.
+
+    Returns the new Appointment, or None if the slot does not exist, is
+    already booked or has started.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(CLAIM_SLOT_SQL, [slot_id])
+            row = cursor.fetchone()
+        if row is None:
+            return None
         
-        creds = Credentials.from_authorized_user_info(token_dict)
+        doctor_id, date, start_time, end_time, starts_at, ends_at = row
+        slot = AvailabilitySlot(
+            id=slot_id, doctor_id=doctor_id, date=date, start_time=start_time,
+            end_time=end_time, starts_at=starts_at, ends_at=ends_at, is_available=False
+        )
+        appointment = Appointment.objects.create(
+            doctor_id=doctor_id,
+            patient=patient,
+            availability_slot_id=slot_id,
+            appointment_date=date,
+            appointment_time=start_time,
+            starts_at=starts_at,
+            ends_at=ends_at,
+            notes=notes
+        )
         
-        # Refresh token if needed
-        if creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-            user.google_calendar_token = creds.token
-            if creds.refresh_token:
-                user.google_calendar_refresh_token = creds.refresh_token
-            user.save()
+        on_slot_closed(doctor_id, slot)
+        on_appointment_booked(doctor_id, date)
         
-        service = build('calendar', 'v3', credentials=creds)
-        return service
-    except Exception as e:
-        print(f"Error getting calendar service: {e}")
+        # Calendar events and emails run from the outbox after commit
+        enqueue_booking_side_effects(appointment)
+    return appointment
+
+
+# Keyset of the doctors' and patients' appointment lists, newest first
+APPOINTMENT_LIST_KEYS = ('appointment_date', 'appointment_time', 'id')
+
+
+def doctor_appointments(doctor):
+    """The doctor's appointments, with their patients"""
+    return Appointment.objects.filter(doctor=doctor).select_related('patient')
+
+
+def patient_appointments(patient):
+    """The patient's appointments, with their doctors"""
+    return Appointment.objects.filter(patient=patient).select_related('doctor')
+
+
+def upcoming_appointments(appointments, now):
+    """The next 10 of `appointments`, as the dashboards list them"""
+    return appointments.filter(starts_at__gt=now).order_by('starts_at')[:10]
+
+
+def past_appointments(appointments, now):
+    """The last 10 of `appointments` before `now`, most recent first"""
+    return appointments.filter(starts_at__lte=now).order_by('-starts_at')[:10]
+
+
+def get_google_calendar_service(user):
+    """Get Google Calendar service for user, reusing this thread's cached one.
+
+    Returns None only if the user has no calendar connected (or revoked
+    access); a failed token refresh raises so the outbox job is retried.
+    """
+    creds = get_calendar_credentials(user)
+    if creds is None:
         return None
+    
+    service = calendar_services.get(user.id, creds.token)
+    if service is None:
+        service = build_calendar_service(creds)
+        calendar_services.put(user.id, creds.token, service, creds.expiry)
+    return service
+
+
+def calendar_event_body(title, starts_at, ends_at, description=''):
+    """Calendar API event resource for an appointment from `starts_at` to `ends_at` (aware)"""
+    # RFC 3339 with the UTC offset, shown in the site's time zone
+    time_zone = timezone.get_current_timezone_name()
+    return {
+        'summary': title,
+        'description': description,
+        'start': {
+            'dateTime': timezone.localtime(starts_at).isoformat(),
+            'timeZone': time_zone,
+        },
+        'end': {
+            'dateTime': timezone.localtime(ends_at).isoformat(),
+            'timeZone': time_zone,
+        },
+    }
+
 
+def create_google_calendar_event(user, title, starts_at, ends_at, description=''):
+    """Create a Google Calendar event, return its id (None if no calendar is connected).
 
-def create_google_calendar_event(user, title, date, start_time, end_time, description=''):
-    """Create a Google Calendar event"""
+    API and network errors raise, so the outbox job is retried.
+    """
     service = get_google_calendar_service(user)
     if not service:
         return None
     
+    event = calendar_event_body(title, starts_at, ends_at, description)
     try:
-        # Combine date and time
-        start_datetime = datetime.combine(date, start_time)
-        end_datetime = datetime.combine(date, end_time)
-        
-        # Format for Google Calendar API (RFC3339)
-        start_rfc3339 = start_datetime.isoformat() + 'Z'
-        end_rfc3339 = end_datetime.isoformat() + 'Z'
-        
-        event = {
-            'summary': title,
-            'description': description,
-            'start': {
-                'dateTime': start_rfc3339,
-                'timeZone': 'UTC',
-            },
-            'end': {
-                'dateTime': end_rfc3339,
-                'timeZone': 'UTC',
-            },
-        }
-        
         event = service.events().insert(calendarId='primary', body=event).execute()
-        return event.get('id')
     except HttpError as e:
         print(f"Error creating calendar event: {e}")
+        if e.resp.status == 401:
+            calendar_services.discard(user.id)
+        raise
+    return event.get('id')
+
+
+def _participant_event(appointment, participant):
+    """(user, event title, Appointment event id field) for one participant"""
+    if participant == 'doctor':
+        return (
+            appointment.doctor,
+            f"Appointment with {appointment.patient.get_full_name()}",
+            'google_calendar_event_id_doctor',
+        )
+    return (
+        appointment.patient,
+        f"Appointment with Dr. {appointment.doctor.get_full_name()}",
+        'google_calendar_event_id_patient',
+    )
+
+
+def create_appointment_calendar_event(appointment_id, participant):
+    """Create the calendar event for one participant of an appointment and record its id"""
+    appointment = Appointment.objects.select_related('doctor', 'patient').get(id=appointment_id)
+    user, title, field = _participant_event(appointment, participant)
+    if getattr(appointment, field):
+        # Created by an earlier attempt
+        return getattr(appointment, field)
+    
+    event_id = create_google_calendar_event(
+        user,
+        title,
+        appointment.starts_at,
+        appointment.ends_at,
+        appointment.notes
+    )
+    if event_id:
+        Appointment.objects.filter(id=appointment_id).update(**{field: event_id})
+    return event_id
+
+
+def create_appointment_calendar_events(payloads):
+    """Create many participants' calendar events through Calendar batch requests.
+
+    `payloads` are calendar_event job payloads ({appointment_id,
+    participant}); inserts for different users can share a batch because
+    each part carries its own credentials. Returns one entry per payload:
+    None when done (or when there is nothing to do, e.g. no calendar is
+    connected), otherwise the error, including failed token refreshes.
+    Participants that already have an event id are skipped, so re-running
+    a payload does not duplicate its event.
+    """
+    appointments = Appointment.objects.select_related(
+        'doctor__google_calendar', 'patient__google_calendar'
+    ).in_bulk({payload['appointment_id'] for payload in payloads})
+    errors = [None] * len(payloads)
+    inserts = []
+    for index, payload in enumerate(payloads):
+        appointment = appointments.get(payload['appointment_id'])
+        if appointment is None:
+            continue
+        user, title, field = _participant_event(appointment, payload['participant'])
+        if getattr(appointment, field):
+            continue
+        try:
+            service = get_google_calendar_service(user)
+        except Exception as e:
+            errors[index] = e
+            continue
+        if service is None:
+            continue
+        body = calendar_event_body(title, appointment.starts_at, appointment.ends_at, appointment.notes)
+        request = service.events().insert(calendarId='primary', body=body)
+        inserts.append((index, user, service, appointment.id, field, request))
+    
+    size = settings.GOOGLE_CALENDAR_BATCH_SIZE
+    for start in range(0, len(inserts), size):
+        chunk = inserts[start:start + size]
+        users = {index: user for index, user, *_ in chunk}
+        event_ids = {}
+        
+        def collect(request_id, response, exception):
+            index = int(request_id)
+            if exception is None:
+                event_ids[index] = response.get('id')
+                return
+            errors[index] = exception
+            if isinstance(exception, HttpError) and exception.resp.status == 401:
+                calendar_services.discard(users[index].id)
+        
+        batch = chunk[0][2].new_batch_http_request(callback=collect)
+        for index, user, service, appointment_id, field, request in chunk:
+            batch.add(request, request_id=str(index))
+        try:
+            batch.execute()
+        except Exception as e:
+            print(f"Calendar batch of {len(chunk)} failed: {e}")
+            for index, *_ in chunk:
+                if index not in event_ids:
+                    errors[index] = e
+        for index, user, service, appointment_id, field, request in chunk:
+            if event_ids.get(index):
+                Appointment.objects.filter(id=appointment_id, **{f'{field}__isnull': True}).update(
+                    **{field: event_ids[index]}
+                )
+    return errors
+
+
+def _error_reasons(error):
+    """The `reason` codes of a Google API error ('rateLimitExceeded', ...)"""
+    details = error.error_details
+    if not isinstance(details, list):
+        # error_details holds the first of details/errors/message in the body
+        try:
+            details = json.loads(error.content)['error']['errors']
+        except (ValueError, TypeError, KeyError):
+            return set()
+    return {detail.get('reason') for detail in details if isinstance(detail, dict)}
+
+
+def _is_rate_limited(error):
+    """Whether a calendar insert failed only for going over a quota, and can be retried.
+
+    Google answers 429, or 403 with a rate limit reason; any other 403
+    (no permission, calendar gone) fails the same way on every retry.
+    """
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status == 429:
+        return True
+    return error.resp.status == 403 and bool(_error_reasons(error) & RATE_LIMIT_REASONS)
+
+
+def _backfill_payloads(user):
+    """calendar_event payloads for `user`'s upcoming appointments that have no event yet"""
+    upcoming = Appointment.objects.filter(starts_at__gt=timezone.now()).order_by('starts_at', 'id')
+    for participant, appointments in (
+        ('doctor', upcoming.filter(doctor=user, google_calendar_event_id_doctor__isnull=True)),
+        ('patient', upcoming.filter(patient=user, google_calendar_event_id_patient__isnull=True)),
+    ):
+        for appointment_id in appointments.values_list('id', flat=True).iterator(chunk_size=500):
+            yield {'appointment_id': appointment_id, 'participant': participant}
+
+
+def backfill_calendar(user, rate=None, deadline=None):
+    """Push `user`'s upcoming appointments that have no event to their calendar.
+
+    Streams the appointments and inserts them in Calendar batch requests at
+    about `rate` inserts per second, backing off and retrying the parts
+    that hit a rate limit. Event ids are saved batch by batch and only
+    appointments without one are picked up, so a rerun carries on where an
+    interrupted run stopped. Stops early once time.monotonic() passes
+    `deadline`. Returns (done, failed, finished).
+    """
+    if get_calendar_credentials(user) is None:
+        return 0, 0, True
+    rate = rate or settings.GOOGLE_CALENDAR_BACKFILL_RATE
+    done = failed = 0
+    payloads = _backfill_payloads(user)
+    while chunk := list(islice(payloads, settings.GOOGLE_CALENDAR_BATCH_SIZE)):
+        if deadline is not None and time.monotonic() >= deadline:
+            return done, failed, False
+        for attempt in range(BACKFILL_RATE_LIMIT_RETRIES + 1):
+            errors = create_appointment_calendar_events(chunk)
+            limited = [payload for payload, error in zip(chunk, errors) if _is_rate_limited(error)]
+            done += sum(error is None for error in errors)
+            failed += sum(error is not None and not _is_rate_limited(error) for error in errors)
+            time.sleep(len(chunk) / rate)
+            if not limited:
+                break
+            chunk = limited
+            time.sleep(BACKFILL_BACKOFF_SECONDS * (2 ** attempt))
+        else:
+            failed += len(chunk)
+    return done, failed, True
+
+
+def run_calendar_backfill(user_id):
+    """Outbox handler: backfill a newly connected calendar.
+
+    Works for at most half the dispatcher lease, then queues a follow-up
+    job for the rest so the job is never re-claimed while still running.
+    """
+    user = User.objects.get(id=user_id)
+    deadline = time.monotonic() + settings.OUTBOX_LEASE_SECONDS / 2
+    done, failed, finished = backfill_calendar(user, deadline=deadline)
+    if not finished:
+        enqueue_job('calendar_backfill', user_id=user_id)
+    elif failed:
+        raise RuntimeError(f"{failed} calendar event(s) could not be backfilled for user {user_id}")
+
+
+def book_scheduled_slot(doctor, date, start_time, patient, notes=''):
+    """Book an opening generated by the doctor's schedule rules.
+
+    The AvailabilitySlot row is only created here, already booked, inside
+    the booking transaction. The slot_no_overlap constraint makes a second
+    concurrent booking of the same opening fail instead of double booking.
+    Returns the new Appointment, or None if the opening is not bookable.
+    """
+    monday = date - timedelta(days=date.weekday())
+    slot = next(
+        (opening for opening in expand_schedule_week(doctor, monday)
+         if opening.date == date and opening.start_time == start_time),
+        None
+    )
+    if slot is None:
         return None
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-        return None
+    
+    with transaction.atomic():
+        slot.is_available = False
+        try:
+            with transaction.atomic():
+                slot.save()
+        except IntegrityError:
+            return None
+        
+        appointment = Appointment.objects.create(
+            doctor=doctor,
+            patient=patient,
+            availability_slot=slot,
+            appointment_date=slot.date,
+            appointment_time=slot.start_time,
+            starts_at=slot.starts_at,
+            ends_at=slot.ends_at,
+            notes=notes
+        )
+        
+        on_appointment_booked(doctor.id, slot.date)
+        enqueue_booking_side_effects(appointment)
+        transaction.on_commit(lambda: invalidate_schedule(doctor.id))
+    return appointment
+
+
+def send_appointment_confirmation_email(appointment_id, recipients=('patient', 'doctor')):
+    """Send the booking confirmation emails for an appointment"""
+    appointment = Appointment.objects.select_related('doctor', 'patient').get(id=appointment_id)
+    return send_booking_confirmation_email(
+        patient_email=appointment.patient.email,
+        doctor_email=appointment.doctor.email,
+        patient_name=appointment.patient.get_full_name(),
+        doctor_name=appointment.doctor.get_full_name(),
+        appointment_date=str(appointment.appointment_date),
+        appointment_time=str(appointment.appointment_time),
+        recipients=recipients,
+    )
+
+
+def send_booking_digest_emails(payloads):
+    """Send each doctor one email covering all their new appointments in `payloads`.
+
+    `payloads` are booking_digest_email job payloads ({appointment_id});
+    all digests go to the email service in one batch request. Returns one
+    entry per payload: None when sent (or the appointment no longer
+    exists), otherwise the error of its doctor's digest.
+    """
+    appointments = Appointment.objects.select_related('doctor', 'patient').in_bulk(
+        {payload['appointment_id'] for payload in payloads}
+    )
+    by_doctor = {}
+    for index, payload in enumerate(payloads):
+        appointment = appointments.get(payload['appointment_id'])
+        if appointment is not None:
+            by_doctor.setdefault(appointment.doctor_id, []).append((index, appointment))
+    errors = [None] * len(payloads)
+    if not by_doctor:
+        return errors
+    
+    digests = []
+    for items in by_doctor.values():
+        items.sort(key=lambda item: (item[1].appointment_date, item[1].appointment_time))
+        doctor = items[0][1].doctor
+        digests.append({
+            'doctor_email': doctor.email,
+            'doctor_name': doctor.get_full_name(),
+            'appointments': [
+                {
+                    'patient_name': appointment.patient.get_full_name(),
+                    'appointment_date': str(appointment.appointment_date),
+                    'appointment_time': str(appointment.appointment_time),
+                }
+                for index, appointment in items
+            ],
+        })
+    results = send_booking_digests(digests)
+    for items, result in zip(by_doctor.values(), results):
+        if result['status'] != 'sent':
+            error = EmailDeliveryError(f"Booking digest not sent to {result['to']}: {result.get('error')}")
+            for index, appointment in items:
+                errors[index] = error
+    return errors
 
 
 def get_google_oauth_flow():
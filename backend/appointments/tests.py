@@ -0,0 +1,143 @@
+import io
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+from zoneinfo import ZoneInfo
+import httplib2
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from googleapiclient.errors import HttpError
+from accounts.models import User
+from doctors.models import AvailabilitySlot, combine_local
+from notifications.models import OutboxJob
+from .models import Appointment
+from .services import _is_rate_limited, book_slot, calendar_event_body
+
+
+def create_users():
+    doctor = User.objects.create_user('doctor', 'doctor@example.com', 'password', role='doctor')
+    patients = [
+        User.objects.create_user(f'patient{i}', f'patient{i}@example.com', 'password', role='patient')
+        for i in range(2)
+    ]
+    return doctor, patients
+
+
+def create_slot(doctor, days=7, start=time(10), end=time(10, 30)):
+    return AvailabilitySlot.objects.create(
+        doctor=doctor, date=date.today() + timedelta(days=days), start_time=start, end_time=end
+    )
+
+
+class BookSlotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor, cls.patients = create_users()
+
+    def test_books_a_free_slot_once(self):
+        slot = create_slot(self.doctor)
+        appointment = book_slot(slot.id, self.patients[0], 'Checkup')
+        self.assertEqual((appointment.patient, appointment.starts_at, appointment.ends_at),
+                         (self.patients[0], slot.starts_at, slot.ends_at))
+        slot.refresh_from_db()
+        self.assertFalse(slot.is_available)
+        self.assertIsNone(book_slot(slot.id, self.patients[1]))
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertEqual(OutboxJob.objects.count(), 4)
+
+    def test_refuses_past_and_missing_slots(self):
+        past = create_slot(self.doctor, days=-1)
+        self.assertIsNone(book_slot(past.id, self.patients[0]))
+        self.assertIsNone(book_slot(0, self.patients[0]))
+        self.assertFalse(Appointment.objects.exists())
+
+    def test_moving_an_appointment_moves_its_end(self):
+        slot = create_slot(self.doctor, start=time(10), end=time(10, 45))
+        appointment = book_slot(slot.id, self.patients[0])
+        appointment.appointment_time = time(11)
+        appointment.save()
+        self.assertEqual(appointment.starts_at, combine_local(slot.date, time(11)))
+        self.assertEqual(appointment.ends_at, combine_local(slot.date, time(11, 45)))
+
+
+class CalendarEventBodyTests(TestCase):
+    def test_times_keep_their_offset(self):
+        starts_at = datetime(2024, 1, 15, 14, tzinfo=ZoneInfo('UTC'))
+        with timezone.override('America/New_York'):
+            body = calendar_event_body('Checkup', starts_at, starts_at + timedelta(minutes=30))
+        self.assertEqual(body['start'], {'dateTime': '2024-01-15T09:00:00-05:00', 'timeZone': 'America/New_York'})
+        self.assertEqual(body['end'], {'dateTime': '2024-01-15T09:30:00-05:00', 'timeZone': 'America/New_York'})
+
+
+class BookSlotRaceTests(TransactionTestCase):
+    def test_concurrent_bookings_of_one_slot(self):
+        doctor, patients = create_users()
+        slot = create_slot(doctor)
+        barrier = threading.Barrier(len(patients))
+        results = []
+
+        def book(patient):
+            try:
+                barrier.wait()
+                results.append(book_slot(slot.id, patient))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(patient,)) for patient in patients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(result is not None for result in results), 1)
+        self.assertEqual(Appointment.objects.filter(availability_slot=slot).count(), 1)
+
+
+class CreateBookingViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor, cls.patients = create_users()
+        cls.slot = create_slot(cls.doctor)
+
+    def test_unexpected_error_is_logged_not_shown(self):
+        self.client.force_login(self.patients[0])
+        url = reverse('appointments:create_booking', args=[self.slot.id])
+        with mock.patch('appointments.views.book_slot', side_effect=RuntimeError('connection reset')), \
+                self.assertLogs('appointments.views', 'ERROR'):
+            response = self.client.post(url, {'slot_id': self.slot.id})
+        self.assertRedirects(
+            response, reverse('patients:doctor_availability', args=[self.doctor.id]), fetch_redirect_response=False
+        )
+        self.assertEqual([str(message) for message in get_messages(response.wsgi_request)],
+                         ['This slot is no longer available.'])
+
+
+def http_error(status, reason):
+    content = json.dumps({'error': {'code': status, 'message': 'Error', 'errors': [{'reason': reason}]}})
+    return HttpError(httplib2.Response({'status': status}), content.encode())
+
+
+class RateLimitTests(TestCase):
+    def test_only_quota_errors_are_rate_limits(self):
+        self.assertTrue(_is_rate_limited(http_error(429, 'rateLimitExceeded')))
+        self.assertTrue(_is_rate_limited(http_error(403, 'rateLimitExceeded')))
+        self.assertTrue(_is_rate_limited(http_error(403, 'userRateLimitExceeded')))
+        self.assertFalse(_is_rate_limited(http_error(403, 'forbidden')))
+        self.assertFalse(_is_rate_limited(http_error(404, 'notFound')))
+        self.assertFalse(_is_rate_limited(RuntimeError('timeout')))
+
+
+class ExplainViewsTests(TestCase):
+    def test_explains_each_view_query(self):
+        doctor, patients = create_users()
+        book_slot(create_slot(doctor).id, patients[0])
+        out = io.StringIO()
+        call_command('explain_views', stdout=out)
+        headings = [line for line in out.getvalue().splitlines() if line.startswith('== ')]
+        self.assertEqual(len(headings), 10)
+        self.assertIn('== view_bookings', headings)
@@ -5,5 +5,6 @@ app_name = 'appointments'
 
 urlpatterns = [
     path('book/<int:slot_id>/', views.create_booking, name='create_booking'),
+    path('book/<int:doctor_id>/<str:date>/<str:start>/', views.book_scheduled, name='book_scheduled'),
 ]
 
@@ -1,15 +1,28 @@
+import logging
+from datetime import date as date_cls, time as time_cls, timedelta
+from django.http import Http404
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
-from django.db import transaction
-from django.utils import timezone
 from accounts.models import User
 from doctors.models import AvailabilitySlot
-from .models import Appointment
-from .forms import BookingForm
-from .services import create_google_calendar_event
-from accounts.services import send_booking_confirmation_email
+from doctors.services import expand_schedule_week
+from .forms import BookingForm, ScheduledBookingForm
+from .services import book_slot, book_scheduled_slot
+
+
+logger = logging.getLogger(__name__)
+
+
+def _slot_unavailable(request, slot_id):
+    """Redirect back to the slot's doctor after a failed booking"""
+    doctor_id = AvailabilitySlot.objects.filter(id=slot_id).values_list('doctor_id', flat=True).first()
+    if doctor_id is None:
+        messages.error(request, 'Invalid availability slot.')
+        return redirect('patients:doctor_list')
+    messages.error(request, 'This slot is no longer available.')
+    return redirect('patients:doctor_availability', doctor_id=doctor_id)
 
 
 @login_required
@@ -20,103 +33,92 @@ def create_booking(request, slot_id):
         messages.error(request, 'Access denied. Patient access required.')
         return redirect('accounts:home')
     
-    slot = get_object_or_404(AvailabilitySlot, id=slot_id)
+    if request.method == 'POST':
+        form = BookingForm(request.POST)
+        if form.is_valid():
+            slot_id = form.cleaned_data['slot_id']
+            notes = form.cleaned_data.get('notes', '')
+            
+            try:
+                appointment = book_slot(slot_id, request.user, notes)
+            except Exception:
+                logger.exception('Booking slot %s failed', slot_id)
+                return _slot_unavailable(request, slot_id)
+            
+            # Contended slots fail fast instead of queueing on a row lock
+            if appointment is None:
+                return _slot_unavailable(request, slot_id)
+            
+            messages.success(request, 'Appointment booked successfully!')
+            return redirect('patients:dashboard')
+    else:
+        form = BookingForm(initial={'slot_id': slot_id})
+    
+    slot = get_object_or_404(AvailabilitySlot.objects.select_related('doctor'), id=slot_id)
     
     # Verify slot is available
     if not slot.is_available:
         messages.error(request, 'This slot is already booked.')
-        return redirect('patients:doctor_availability', doctor_id=slot.doctor.id)
+        return redirect('patients:doctor_availability', doctor_id=slot.doctor_id)
     
     if not slot.is_future():
         messages.error(request, 'Cannot book past time slots.')
-        return redirect('patients:doctor_availability', doctor_id=slot.doctor.id)
+        return redirect('patients:doctor_availability', doctor_id=slot.doctor_id)
+    
+    context = {
+        'form': form,
+        'slot': slot,
+        'doctor': slot.doctor,
+    }
+    return render(request, 'appointments/create_booking.html', context)
+
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def book_scheduled(request, doctor_id, date, start):
+    """Book an opening generated by a doctor's schedule rules"""
+    if not request.user.is_patient():
+        messages.error(request, 'Access denied. Patient access required.')
+        return redirect('accounts:home')
+    
+    doctor = get_object_or_404(User, id=doctor_id, role='doctor')
+    try:
+        date = date_cls.fromisoformat(date)
+        start = time_cls.fromisoformat(start)
+    except ValueError:
+        raise Http404('Invalid date or time')
     
     if request.method == 'POST':
-        form = BookingForm(request.POST)
+        form = ScheduledBookingForm(request.POST)
         if form.is_valid():
-            slot_id = form.cleaned_data['slot_id']
-            notes = form.cleaned_data.get('notes', '')
-            
-            # Use database transaction to prevent race conditions
             try:
-                with transaction.atomic():
-                    # Lock the slot row for update
-                    slot = AvailabilitySlot.objects.select_for_update().get(id=slot_id)
-                    
-                    # Double-check availability
-                    if not slot.is_available:
-                        messages.error(request, 'This slot was just booked by another patient.')
-                        return redirect('patients:doctor_availability', doctor_id=slot.doctor.id)
-                    
-                    # Create appointment
-                    appointment = Appointment.objects.create(
-                        doctor=slot.doctor,
-                        patient=request.user,
-                        availability_slot=slot,
-                        appointment_date=slot.date,
-                        appointment_time=slot.start_time,
-                        notes=notes
-                    )
-                    
-                    # Mark slot as unavailable
-                    slot.is_available = False
-                    slot.save()
-                    
-                    # Create Google Calendar events
-                    try:
-                        doctor_event_id = create_google_calendar_event(
-                            slot.doctor,
-                            f"Appointment with {request.user.get_full_name()}",
-                            slot.date,
-                            slot.start_time,
-                            slot.end_time,
-                            notes
-                        )
-                        if doctor_event_id:
-                            appointment.google_calendar_event_id_doctor = doctor_event_id
-                        
-                        patient_event_id = create_google_calendar_event(
-                            request.user,
-                            f"Appointment with Dr. {slot.doctor.get_full_name()}",
-                            slot.date,
-                            slot.start_time,
-                            slot.end_time,
-                            notes
-                        )
-                        if patient_event_id:
-                            appointment.google_calendar_event_id_patient = patient_event_id
-                        
-                        appointment.save()
-                    except Exception as e:
-                        print(f"Google Calendar integration failed: {e}")
-                        messages.warning(request, 'Appointment created but calendar event failed. Please check your Google Calendar settings.')
-                    
-                    # Send confirmation emails
-                    try:
-                        send_booking_confirmation_email(
-                            patient_email=request.user.email,
-                            doctor_email=slot.doctor.email,
-                            patient_name=request.user.get_full_name(),
-                            doctor_name=slot.doctor.get_full_name(),
-                            appointment_date=str(slot.date),
-                            appointment_time=str(slot.start_time)
-                        )
-                    except Exception as e:
-                        print(f"Email sending failed: {e}")
-                    
-                    messages.success(request, 'Appointment booked successfully!')
-                    return redirect('patients:dashboard')
-                    
-            except Exception as e:
-                messages.error(request, f'An error occurred: {str(e)}')
-                return redirect('patients:doctor_availability', doctor_id=slot.doctor.id)
+                appointment = book_scheduled_slot(doctor, date, start, request.user, form.cleaned_data.get('notes', ''))
+            except Exception:
+                logger.exception('Booking %s %s with doctor %s failed', date, start, doctor.id)
+                appointment = None
+            
+            if appointment is None:
+                messages.error(request, 'This slot is no longer available.')
+                return redirect('patients:doctor_availability', doctor_id=doctor.id)
+            
+            messages.success(request, 'Appointment booked successfully!')
+            return redirect('patients:dashboard')
     else:
-        form = BookingForm(initial={'slot_id': slot_id})
+        form = ScheduledBookingForm()
+    
+    monday = date - timedelta(days=date.weekday())
+    slot = next(
+        (opening for opening in expand_schedule_week(doctor, monday)
+         if opening.date == date and opening.start_time == start),
+        None
+    )
+    if slot is None:
+        messages.error(request, 'This slot is no longer available.')
+        return redirect('patients:doctor_availability', doctor_id=doctor.id)
     
     context = {
         'form': form,
         'slot': slot,
-        'doctor': slot.doctor,
+        'doctor': doctor,
     }
     return render(request, 'appointments/create_booking.html', context)
-
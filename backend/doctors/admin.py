@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DoctorProfile, AvailabilitySlot
+from .models import DoctorProfile, AvailabilitySlot, ScheduleRule, ScheduleException
 
 
 @admin.register(DoctorProfile)
@@ -14,3 +14,15 @@ class AvailabilitySlotAdmin(admin.ModelAdmin):
     list_filter = ('date', 'is_available', 'doctor')
     search_fields = ('doctor__username',)
 
+
+
+@admin.register(ScheduleRule)
+class ScheduleRuleAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'weekday', 'start_time', 'end_time', 'slot_minutes', 'valid_from', 'valid_until')
+    list_filter = ('weekday', 'doctor')
+
+
+@admin.register(ScheduleException)
+class ScheduleExceptionAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'date', 'reason')
+    list_filter = ('doctor',)
@@ -5,3 +5,5 @@ class DoctorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'doctors'
 
+    def ready(self):
+        from . import signals  # noqa: F401
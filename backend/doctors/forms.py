@@ -1,5 +1,7 @@
+from datetime import datetime
 from django import forms
-from .models import DoctorProfile, AvailabilitySlot
+from django.db.models import Q
+from .models import DoctorProfile, AvailabilitySlot, ScheduleRule, ScheduleException, combine_local
 from django.utils import timezone
 
 
@@ -22,6 +24,10 @@ class AvailabilitySlotForm(forms.ModelForm):
             'end_time': forms.TimeInput(attrs={'type': 'time'}),
         }
     
+    def __init__(self, *args, doctor=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.doctor = doctor
+    
     def clean(self):
         cleaned_data = super().clean()
         date = cleaned_data.get('date')
@@ -36,6 +42,129 @@ class AvailabilitySlotForm(forms.ModelForm):
             # Check if end_time is after start_time
             if end_time <= start_time:
                 raise forms.ValidationError("End time must be after start time.")
+            
+            # Early, friendly check; the slot_no_overlap constraint is what
+            # actually rules out overlaps created concurrently
+            if self.doctor is not None and AvailabilitySlot.objects.overlapping(
+                self.doctor, combine_local(date, start_time), combine_local(date, end_time)
+            ).exists():
+                raise forms.ValidationError("This slot overlaps one of your existing slots.")
         
         return cleaned_data
 
+
+
+class BulkAvailabilityForm(forms.Form):
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'),
+        (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday'),
+    ]
+    SLOT_LENGTH_CHOICES = [(15, '15 minutes'), (20, '20 minutes'), (30, '30 minutes'), (45, '45 minutes'), (60, '60 minutes')]
+    MAX_DAYS = 92
+
+    start_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    weekdays = forms.TypedMultipleChoiceField(
+        choices=WEEKDAY_CHOICES,
+        coerce=int,
+        initial=[0, 1, 2, 3, 4],
+        widget=forms.CheckboxSelectMultiple
+    )
+    day_start = forms.TimeField(widget=forms.TimeInput(attrs={'type': 'time'}))
+    day_end = forms.TimeField(widget=forms.TimeInput(attrs={'type': 'time'}))
+    slot_minutes = forms.TypedChoiceField(choices=SLOT_LENGTH_CHOICES, coerce=int, initial=30)
+    breaks = forms.CharField(
+        required=False,
+        help_text='Comma separated, e.g. 12:00-13:00, 15:30-15:45'
+    )
+    skip_conflicts = forms.BooleanField(
+        required=False,
+        label='Skip slots that overlap existing ones instead of rejecting the request'
+    )
+    
+    def clean_breaks(self):
+        breaks = []
+        for part in self.cleaned_data['breaks'].split(','):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                start, end = (datetime.strptime(value.strip(), '%H:%M').time() for value in part.split('-'))
+            except ValueError:
+                raise forms.ValidationError(f"Invalid break '{part}', use HH:MM-HH:MM.")
+            if end <= start:
+                raise forms.ValidationError(f"Break '{part}' must end after it starts.")
+            breaks.append((start, end))
+        return breaks
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        day_start = cleaned_data.get('day_start')
+        day_end = cleaned_data.get('day_end')
+        
+        if start_date and end_date:
+            if start_date < timezone.now().date():
+                raise forms.ValidationError("Date must be in the future.")
+            if end_date < start_date:
+                raise forms.ValidationError("End date must not be before start date.")
+            if (end_date - start_date).days >= self.MAX_DAYS:
+                raise forms.ValidationError(f"Date range can cover at most {self.MAX_DAYS} days.")
+        
+        if day_start and day_end and day_end <= day_start:
+            raise forms.ValidationError("End time must be after start time.")
+        
+        return cleaned_data
+
+
+class ScheduleRuleForm(forms.ModelForm):
+    class Meta:
+        model = ScheduleRule
+        fields = ['weekday', 'start_time', 'end_time', 'slot_minutes', 'valid_from', 'valid_until']
+        widgets = {
+            'start_time': forms.TimeInput(attrs={'type': 'time'}),
+            'end_time': forms.TimeInput(attrs={'type': 'time'}),
+            'valid_from': forms.DateInput(attrs={'type': 'date'}),
+            'valid_until': forms.DateInput(attrs={'type': 'date'}),
+        }
+    
+    def __init__(self, *args, doctor=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.doctor = doctor
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        weekday = cleaned_data.get('weekday')
+        start_time = cleaned_data.get('start_time')
+        end_time = cleaned_data.get('end_time')
+        valid_from = cleaned_data.get('valid_from')
+        valid_until = cleaned_data.get('valid_until')
+        
+        if start_time and end_time and end_time <= start_time:
+            raise forms.ValidationError("End time must be after start time.")
+        if valid_from and valid_until and valid_until < valid_from:
+            raise forms.ValidationError("Valid until must not be before valid from.")
+        
+        if self.doctor is not None and weekday is not None and start_time and end_time and valid_from:
+            overlapping = ScheduleRule.objects.filter(
+                doctor=self.doctor,
+                weekday=weekday,
+                start_time__lt=end_time,
+                end_time__gt=start_time
+            ).filter(Q(valid_until__isnull=True) | Q(valid_until__gte=valid_from))
+            if valid_until:
+                overlapping = overlapping.filter(valid_from__lte=valid_until)
+            if overlapping.exists():
+                raise forms.ValidationError("This rule overlaps another rule on the same day.")
+        
+        return cleaned_data
+
+
+class ScheduleExceptionForm(forms.ModelForm):
+    class Meta:
+        model = ScheduleException
+        fields = ['date', 'reason']
+        widgets = {
+            'date': forms.DateInput(attrs={'type': 'date'}),
+        }
@@ -0,0 +1,183 @@
+import random
+import statistics
+import time
+from datetime import datetime, time as dt_time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from accounts.models import User
+from doctors.models import AvailabilitySlot, DoctorProfile
+from doctors.services import common_free_windows, free_doctor_ids, rebuild_day_bitmaps
+
+
+PREFIX = 'bitmapbench_'
+SPECIALIZATIONS = ['Cardiology', 'Dermatology', 'Neurology', 'Pediatrics', 'Orthopedics']
+
+
+def percentile(values, pct):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+
+def covered(spans, start, end):
+    """True if the sorted (start, end) spans cover [start, end) without gaps"""
+    reached = start
+    for span_start, span_end in spans:
+        if span_start > reached:
+            break
+        reached = max(reached, span_end)
+        if reached >= end:
+            return True
+    return reached >= end
+
+
+def intersect(a, b):
+    """Intersection of two sorted lists of disjoint (start, end) spans"""
+    result, i, j = [], 0, 0
+    while i < len(a) and j < len(b):
+        start, end = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if start < end:
+            result.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def merge(spans):
+    """Sorted spans with touching and overlapping ones joined"""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def orm_free_doctor_ids(specialization, date, start_time, end_time):
+    """Interval version of free_doctor_ids: fetch overlapping open slots, check coverage"""
+    slots = AvailabilitySlot.objects.filter(
+        doctor__doctor_profile__specialization=specialization,
+        date=date,
+        is_available=True,
+        start_time__lt=end_time,
+        end_time__gt=start_time,
+    ).order_by('doctor_id', 'start_time').values_list('doctor_id', 'start_time', 'end_time')
+    spans = {}
+    for doctor_id, slot_start, slot_end in slots:
+        spans.setdefault(doctor_id, []).append((slot_start, slot_end))
+    return [doctor_id for doctor_id, doctor_spans in spans.items() if covered(doctor_spans, start_time, end_time)]
+
+
+def orm_common_free_windows(doctor_ids, date):
+    """Interval version of common_free_windows: merge each doctor's open slots, intersect"""
+    slots = AvailabilitySlot.objects.filter(
+        doctor_id__in=doctor_ids, date=date, is_available=True
+    ).values_list('doctor_id', 'start_time', 'end_time')
+    spans = {doctor_id: [] for doctor_id in doctor_ids}
+    for doctor_id, slot_start, slot_end in slots:
+        spans[doctor_id].append((slot_start, slot_end))
+    windows = None
+    for doctor_spans in spans.values():
+        doctor_spans = merge(doctor_spans)
+        windows = doctor_spans if windows is None else intersect(windows, doctor_spans)
+    return windows or []
+
+
+class Command(BaseCommand):
+    help = 'Compare day-bitmap availability queries with the equivalent slot interval queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=500)
+        parser.add_argument('--days', type=int, default=7)
+        parser.add_argument('--booked', type=float, default=0.4, help='Fraction of seeded slots marked booked')
+        parser.add_argument('--queries', type=int, default=200, help='Queries per method and kind')
+        parser.add_argument('--group', type=int, default=5, help='Doctors per common-window query')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows after the run')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.cleanup()
+        doctor_ids, days = self.seed(rng, options)
+
+        mismatches = 0
+        window_queries = []
+        for _ in range(options['queries']):
+            start = datetime.combine(rng.choice(days), dt_time(8, 0)) + timedelta(minutes=15 * rng.randrange(32))
+            end = start + timedelta(minutes=rng.choice([15, 30, 60]))
+            window_queries.append((rng.choice(SPECIALIZATIONS), start.date(), start.time(), end.time()))
+        bitmap_times, bitmap_results = self.time_queries(free_doctor_ids, window_queries)
+        orm_times, orm_results = self.time_queries(orm_free_doctor_ids, window_queries)
+        mismatches += sum(sorted(a) != sorted(b) for a, b in zip(bitmap_results, orm_results))
+        self.report('Free doctors in a window', bitmap_times, orm_times)
+
+        group_queries = [
+            (rng.sample(doctor_ids, options['group']), rng.choice(days)) for _ in range(options['queries'])
+        ]
+        bitmap_times, bitmap_results = self.time_queries(common_free_windows, group_queries)
+        orm_times, orm_results = self.time_queries(orm_common_free_windows, group_queries)
+        mismatches += sum(a != b for a, b in zip(bitmap_results, orm_results))
+        self.report(f"Common free windows of {options['group']} doctors", bitmap_times, orm_times)
+
+        if not options['keep']:
+            self.cleanup()
+        if mismatches:
+            raise CommandError(f"{mismatches} queries returned different results from the bitmap and interval versions")
+        self.stdout.write(self.style.SUCCESS('Bitmap and interval queries agree'))
+
+    def seed(self, rng, options):
+        doctors = User.objects.bulk_create([
+            User(username=f'{PREFIX}doctor{i}', email=f'{PREFIX}doctor{i}@example.com',
+                 first_name='Bench', last_name=f'Doctor {i}', role='doctor')
+            for i in range(options['doctors'])
+        ])
+        DoctorProfile.objects.bulk_create([
+            DoctorProfile(user=doctor, specialization=rng.choice(SPECIALIZATIONS)) for doctor in doctors
+        ])
+
+        first_day = timezone.now().date() + timedelta(days=1)
+        days = [first_day + timedelta(days=n) for n in range(options['days'])]
+        slots = []
+        for doctor in doctors:
+            length = timedelta(minutes=rng.choice([15, 20, 30]))
+            for day in days:
+                cursor = datetime.combine(day, dt_time(8, 0))
+                while cursor + length <= datetime.combine(day, dt_time(17, 0)):
+                    slot = AvailabilitySlot(
+                        doctor=doctor,
+                        date=day,
+                        start_time=cursor.time(),
+                        end_time=(cursor + length).time(),
+                        is_available=rng.random() >= options['booked'],
+                    )
+                    slot.sync_timestamps()
+                    slots.append(slot)
+                    cursor += length
+        AvailabilitySlot.objects.bulk_create(slots, batch_size=1000)
+        doctor_ids = [doctor.id for doctor in doctors]
+        rows = rebuild_day_bitmaps(doctor_ids)
+        self.stdout.write(f"Seeded {len(doctors)} doctors, {len(slots)} slots, {rows} day bitmaps")
+        return doctor_ids, days
+
+    def time_queries(self, query, queries):
+        durations, results = [], []
+        for args in queries:
+            start = time.perf_counter()
+            results.append(query(*args))
+            durations.append((time.perf_counter() - start) * 1000)
+        return durations, results
+
+    def report(self, title, bitmap_ms, orm_ms):
+        self.stdout.write(title)
+        for label, ms in (('bitmap', bitmap_ms), ('interval', orm_ms)):
+            self.stdout.write(
+                f"  {label:<8} ms: p50={percentile(ms, 50):.2f} p95={percentile(ms, 95):.2f} "
+                f"total={sum(ms):.1f}"
+            )
+        self.stdout.write(f"  speedup (total): {sum(orm_ms) / max(sum(bitmap_ms), 1e-9):.1f}x")
+
+    def cleanup(self):
+        User.objects.filter(username__startswith=PREFIX).delete()
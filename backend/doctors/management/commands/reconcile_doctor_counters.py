@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from doctors.services import reconcile_doctor_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute doctors' directory counters and report drift (run daily just after midnight)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing')
+
+    def handle(self, *args, **options):
+        drift = reconcile_doctor_counters(fix=not options['dry_run'])
+        stale = drift.pop('counters_date')
+        self.stdout.write(f"Profiles with counters from an earlier day: {stale}")
+        for field, count in drift.items():
+            line = f"Drift in {field}: {count} profile(s)"
+            self.stdout.write(self.style.WARNING(line) if count else line)
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('Counters recomputed'))
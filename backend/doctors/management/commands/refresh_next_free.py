@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from doctors.models import DoctorProfile
+from doctors.services import refresh_next_free
+
+
+class Command(BaseCommand):
+    help = "Recompute doctors' next free slot where it has passed (run every few minutes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute every doctor, not just stale ones')
+
+    def handle(self, *args, **options):
+        doctor_ids = DoctorProfile.objects.values('user_id') if options['all'] else None
+        updated = refresh_next_free(doctor_ids)
+        self.stdout.write(self.style.SUCCESS(f"Refreshed next free slot for {updated} doctor(s)"))
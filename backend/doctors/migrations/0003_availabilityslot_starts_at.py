@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+BACKFILL_SQL = """
+    UPDATE doctors_availabilityslot
+    SET starts_at = (date + start_time) AT TIME ZONE %s,
+        ends_at = (date + end_time) AT TIME ZONE %s
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0002_availabilityslot_available_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='availabilityslot',
+            name='starts_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='availabilityslot',
+            name='ends_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunSQL(
+            [(BACKFILL_SQL, [settings.TIME_ZONE, settings.TIME_ZONE])],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='availabilityslot',
+            name='starts_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='availabilityslot',
+            name='ends_at',
+            field=models.DateTimeField(),
+        ),
+    ]
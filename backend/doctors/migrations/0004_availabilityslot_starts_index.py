@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:26
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('doctors', '0003_availabilityslot_starts_at'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='availabilityslot',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['doctor', 'starts_at'], name='slot_available_starts_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+import django.contrib.postgres.constraints
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+import doctors.models
+
+
+class Migration(migrations.Migration):
+
+    # Fails if a doctor already has overlapping slots; delete or fix those
+    # rows first. btree_gist lets the constraint compare doctor_id with =.
+    dependencies = [
+        ('doctors', '0004_availabilityslot_starts_index'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.AddConstraint(
+            model_name='availabilityslot',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[('doctor', '='), (doctors.models.TsTzRange('starts_at', 'ends_at'), '&&')], name='slot_no_overlap'),
+        ),
+    ]
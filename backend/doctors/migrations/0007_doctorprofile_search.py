@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:05
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+CREATE_MISSING_PROFILES_SQL = """
+    INSERT INTO doctors_doctorprofile (user_id, specialization, bio, years_of_experience, created_at, updated_at)
+    SELECT u.id, '', '', 0, now(), now()
+    FROM accounts_user AS u
+    WHERE u.role = 'doctor'
+      AND NOT EXISTS (SELECT 1 FROM doctors_doctorprofile AS p WHERE p.user_id = u.id)
+"""
+
+BACKFILL_SEARCH_SQL = """
+    UPDATE doctors_doctorprofile AS p
+    SET sort_name = lower(trim(u.last_name || ' ' || u.first_name)),
+        search_vector =
+            setweight(to_tsvector('simple', trim(u.first_name || ' ' || u.last_name)), 'A')
+            || setweight(to_tsvector('simple', p.specialization), 'B')
+            || setweight(to_tsvector('simple', p.bio), 'C')
+    FROM accounts_user AS u
+    WHERE u.id = p.user_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('doctors', '0006_schedulerule_scheduleexception'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='sort_name',
+            field=models.CharField(blank=True, editable=False, max_length=301),
+        ),
+        migrations.RunSQL(CREATE_MISSING_PROFILES_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.RunSQL(BACKFILL_SEARCH_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:06
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('doctors', '0007_doctorprofile_search'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='doctorprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='doctor_search_vector_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='doctorprofile',
+            index=models.Index(fields=['sort_name', 'id'], name='doctor_sort_name_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='doctorprofile',
+            index=models.Index(fields=['specialization'], name='doctor_specialization_idx'),
+        ),
+    ]
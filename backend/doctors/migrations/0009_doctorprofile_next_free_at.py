@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+BACKFILL_SQL = """
+    UPDATE doctors_doctorprofile AS p
+    SET next_free_at = (
+        SELECT min(s.starts_at)
+        FROM doctors_availabilityslot AS s
+        WHERE s.doctor_id = p.user_id AND s.is_available AND s.starts_at > now()
+    )
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0008_doctorprofile_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='next_free_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
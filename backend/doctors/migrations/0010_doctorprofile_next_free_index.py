@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:49
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('doctors', '0009_doctorprofile_next_free_at'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='doctorprofile',
+            index=models.Index(fields=['specialization', 'next_free_at'], name='doctor_spec_next_free_idx'),
+        ),
+    ]
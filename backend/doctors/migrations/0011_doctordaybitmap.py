@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import doctors.models
+
+
+# Same encoding as doctors.services.REBUILD_BITMAPS_SQL
+BACKFILL_SQL = """
+    INSERT INTO doctors_doctordaybitmap (doctor_id, date, free)
+    SELECT doctor_id, date, bit_or(mask)
+    FROM (
+        SELECT doctor_id, date, (
+            repeat('0', lo) || repeat('1', greatest(hi - lo, 0)) || repeat('0', 288 - greatest(hi, lo))
+        )::bit(288) AS mask
+        FROM (
+            SELECT doctor_id, date,
+                   ceil(extract(epoch FROM start_time) / 300)::int AS lo,
+                   floor(extract(epoch FROM end_time) / 300)::int AS hi
+            FROM doctors_availabilityslot
+            WHERE is_available
+        ) AS spans
+    ) AS masks
+    GROUP BY doctor_id, date
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('doctors', '0010_doctorprofile_next_free_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDayBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('free', doctors.models.BitStringField(default='000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000', length=288)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_bitmaps', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('doctor', 'date')},
+                'indexes': [models.Index(fields=['date', 'doctor'], name='bitmap_date_doctor_idx')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.utils.timezone
+
+
+# Same definitions as doctors.services.reconcile_doctor_counters
+BACKFILL_SQL = """
+    WITH today AS (SELECT (now() AT TIME ZONE %s)::date AS day)
+    UPDATE doctors_doctorprofile AS p
+    SET counters_date = today.day,
+        open_slots_this_week = (
+            SELECT count(*) FROM doctors_availabilityslot AS s
+            WHERE s.doctor_id = p.user_id AND s.is_available
+              AND s.date BETWEEN today.day AND today.day + (7 - extract(isodow FROM today.day)::int)
+        ),
+        appointments_today = (
+            SELECT count(*) FROM appointments_appointment AS a
+            WHERE a.doctor_id = p.user_id AND a.appointment_date = today.day
+        )
+    FROM today
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_appointment_starts_indexes'),
+        ('doctors', '0011_doctordaybitmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='counters_date',
+            field=models.DateField(blank=True, default=django.utils.timezone.localdate, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='open_slots_this_week',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='appointments_today',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL([(BACKFILL_SQL, [settings.TIME_ZONE])], reverse_sql=migrations.RunSQL.noop),
+    ]
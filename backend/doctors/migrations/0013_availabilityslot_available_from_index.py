@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('doctors', '0012_doctorprofile_counters'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='availabilityslot',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['starts_at', 'id'], name='slot_available_from_idx'),
+        ),
+    ]
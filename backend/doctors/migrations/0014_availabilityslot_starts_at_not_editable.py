@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0013_availabilityslot_available_from_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='availabilityslot',
+            name='ends_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='availabilityslot',
+            name='starts_at',
+            field=models.DateTimeField(editable=False),
+        ),
+    ]
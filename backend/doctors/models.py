@@ -1,23 +1,116 @@
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeBoundary, RangeOperators
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.db.models import Func, Value
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from accounts.models import User
 
 
+def combine_local(date, time):
+    """Aware datetime for a wall-clock date and time in settings.TIME_ZONE"""
+    return timezone.make_aware(
+        timezone.datetime.combine(date, time),
+        timezone.get_default_timezone()
+    )
+
+
+class TsTzRange(Func):
+    """tstzrange(start, end, '[)') so back-to-back slots do not overlap"""
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+    
+    def __init__(self, start, end):
+        super().__init__(start, end, RangeBoundary())
+
+
+class BitStringField(models.Field):
+    """Fixed-length PostgreSQL bit(n), as a Python str of '0' and '1'"""
+    
+    def __init__(self, *args, length, **kwargs):
+        self.length = length
+        super().__init__(*args, **kwargs)
+    
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['length'] = self.length
+        return name, path, args, kwargs
+    
+    def db_type(self, connection):
+        return f'bit({self.length})'
+
+
+class AvailabilitySlotQuerySet(models.QuerySet):
+    def overlapping(self, doctor, starts_at, ends_at):
+        """Slots of `doctor` overlapping [starts_at, ends_at).
+
+        Uses the same expression as the exclusion constraint so the lookup
+        is answered by its GiST index.
+        """
+        return self.annotate(
+            span=TsTzRange('starts_at', 'ends_at')
+        ).filter(doctor=doctor, span__overlap=DateTimeTZRange(starts_at, ends_at))
+
+
 class DoctorProfile(models.Model):
     """Doctor profile information"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='doctor_profile')
     specialization = models.CharField(max_length=100, blank=True)
     bio = models.TextField(blank=True)
     years_of_experience = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    # Directory search: the doctor's name, specialization and bio as one
+    # tsvector, and a name sort key so listing pages come off an index
+    search_vector = SearchVectorField(null=True, editable=False)
+    sort_name = models.CharField(max_length=301, blank=True, editable=False)
+    # Start of the earliest unbooked future slot, maintained by
+    # doctors.services when slots are created, booked or deleted. Like
+    # open_slots_this_week below it leaves out openings from schedule rules.
+    next_free_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Directory and dashboard counters as of counters_date (local), kept
+    # current by doctors.services and reset daily by reconcile_doctor_counters
+    counters_date = models.DateField(null=True, blank=True, default=timezone.localdate, editable=False)
+    open_slots_this_week = models.IntegerField(default=0, editable=False)
+    appointments_today = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='doctor_search_vector_idx'),
+            models.Index(fields=['sort_name', 'id'], name='doctor_sort_name_idx'),
+            models.Index(fields=['specialization'], name='doctor_specialization_idx'),
+            models.Index(fields=['specialization', 'next_free_at'], name='doctor_spec_next_free_idx'),
+        ]
+    
     def __str__(self):
         return f"Dr. {self.user.get_full_name()}"
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.refresh_search_index()
+    
     def get_full_name(self):
         return self.user.get_full_name()
+    
+    def counters_current(self):
+        """Whether the counters describe today rather than an earlier day"""
+        return self.counters_date == timezone.localdate()
+    
+    def refresh_search_index(self):
+        """Recompute search_vector and sort_name (the name lives on User)"""
+        user = self.user
+        self.sort_name = f"{user.last_name} {user.first_name}".strip().lower()
+        DoctorProfile.objects.filter(pk=self.pk).update(
+            sort_name=self.sort_name,
+            search_vector=(
+                SearchVector(Value(user.get_full_name()), weight='A', config='simple')
+                + SearchVector('specialization', weight='B', config='simple')
+                + SearchVector('bio', weight='C', config='simple')
+            )
+        )
 
 
 class AvailabilitySlot(models.Model):
@@ -27,24 +120,135 @@ class AvailabilitySlot(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
     is_available = models.BooleanField(default=True)
+    # Timezone-aware copies of date + start_time/end_time so "is it in the
+    # future" is a single indexed predicate; kept in sync by save()
+    starts_at = models.DateTimeField(editable=False)
+    ends_at = models.DateTimeField(editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = AvailabilitySlotQuerySet.as_manager()
+    
     class Meta:
         ordering = ['date', 'start_time']
         unique_together = ['doctor', 'date', 'start_time', 'end_time']
+        indexes = [
+            # Open slots a patient can book; booked and past rows are skipped.
+            models.Index(
+                fields=['doctor', 'date', 'start_time'],
+                condition=models.Q(is_available=True),
+                name='slot_available_idx',
+            ),
+            models.Index(
+                fields=['doctor', 'starts_at'],
+                condition=models.Q(is_available=True),
+                name='slot_available_starts_idx',
+            ),
+            # Open slots of all doctors in start order, for first
+            # available searches from a later time
+            models.Index(
+                fields=['starts_at', 'id'],
+                condition=models.Q(is_available=True),
+                name='slot_available_from_idx',
+            ),
+        ]
+        constraints = [
+            # A doctor cannot have two slots that overlap in time, even
+            # when they are created concurrently
+            ExclusionConstraint(
+                name='slot_no_overlap',
+                expressions=[
+                    ('doctor', RangeOperators.EQUAL),
+                    (TsTzRange('starts_at', 'ends_at'), RangeOperators.OVERLAPS),
+                ],
+            ),
+        ]
     
     def __str__(self):
         return f"{self.doctor.username} - {self.date} {self.start_time} to {self.end_time}"
     
+    def save(self, *args, **kwargs):
+        self.sync_timestamps()
+        super().save(*args, **kwargs)
+    
+    def sync_timestamps(self):
+        """Derive starts_at/ends_at from date and times (call before bulk_create)"""
+        self.starts_at = combine_local(self.date, self.start_time)
+        self.ends_at = combine_local(self.date, self.end_time)
+    
     def is_future(self):
         """Check if slot is in the future"""
-        now = timezone.now()
-        slot_datetime = timezone.make_aware(
-            timezone.datetime.combine(self.date, self.start_time)
-        )
-        return slot_datetime > now
+        return self.starts_at > timezone.now()
     
     def is_booked(self):
         """Check if slot is booked"""
         return not self.is_available
 
+
+class DoctorDayBitmap(models.Model):
+    """One day of a doctor's open availability, one bit per 5-minute quantum.
+
+    Bit i is set when an unbooked slot covers the whole quantum starting at
+    i * 5 minutes past local midnight. Maintained by doctors.services as
+    slots are created, booked and deleted; openings from schedule rules
+    are not included.
+    """
+    QUANTUM_MINUTES = 5
+    QUANTA = 24 * 60 // QUANTUM_MINUTES
+    
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='day_bitmaps')
+    date = models.DateField()
+    free = BitStringField(length=QUANTA, default='0' * QUANTA)
+    
+    class Meta:
+        unique_together = ['doctor', 'date']
+        indexes = [
+            models.Index(fields=['date', 'doctor'], name='bitmap_date_doctor_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.doctor.username} - {self.date}"
+
+
+class ScheduleRule(models.Model):
+    """Weekly recurring availability, expanded into bookable slots on demand"""
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'),
+        (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday'),
+    ]
+    SLOT_LENGTH_CHOICES = [(15, '15 minutes'), (20, '20 minutes'), (30, '30 minutes'), (45, '45 minutes'), (60, '60 minutes')]
+    
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='schedule_rules')
+    weekday = models.IntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_minutes = models.PositiveIntegerField(choices=SLOT_LENGTH_CHOICES, default=30)
+    valid_from = models.DateField(default=timezone.localdate)
+    valid_until = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['weekday', 'start_time']
+    
+    def __str__(self):
+        return f"{self.doctor.username} - {self.get_weekday_display()} {self.start_time} to {self.end_time}"
+    
+    def applies_on(self, date):
+        return (
+            date.weekday() == self.weekday
+            and date >= self.valid_from
+            and (self.valid_until is None or date <= self.valid_until)
+        )
+
+
+class ScheduleException(models.Model):
+    """Day on which a doctor's schedule rules do not apply (holiday, leave)"""
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='schedule_exceptions')
+    date = models.DateField()
+    reason = models.CharField(max_length=100, blank=True)
+    
+    class Meta:
+        ordering = ['date']
+        unique_together = ['doctor', 'date']
+    
+    def __str__(self):
+        return f"{self.doctor.username} - {self.date} {self.reason}".strip()
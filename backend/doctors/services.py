@@ -0,0 +1,606 @@
+import re
+import time
+from datetime import datetime, time as dt_time, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.contrib.postgres.search import SearchQuery
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Now
+from django.utils import timezone
+from appointments.models import Appointment
+from hms.pagination import KeysetPage, decode_cursor, encode_cursor
+from .models import AvailabilitySlot, DoctorDayBitmap, DoctorProfile, ScheduleRule, ScheduleException
+
+
+BULK_CREATE_BATCH_SIZE = 500
+SCHEDULE_CACHE_TIMEOUT = 60 * 60
+
+
+def expand_slots(doctor, start_date, end_date, weekdays, day_start, day_end, slot_minutes, breaks=()):
+    """Build unsaved slots for every chosen weekday in [start_date, end_date].
+
+    Each day's window day_start-day_end is cut into slot_minutes pieces;
+    a piece that would overlap a break restarts at the end of that break.
+    Slots that have already started are left out.
+    """
+    length = timedelta(minutes=slot_minutes)
+    breaks = sorted(breaks)
+    now = timezone.now()
+    slots = []
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in weekdays:
+            cursor = datetime.combine(day, day_start)
+            window_end = datetime.combine(day, day_end)
+            while cursor + length <= window_end:
+                end = cursor + length
+                blocking = next(
+                    (datetime.combine(day, b_end) for b_start, b_end in breaks
+                     if cursor < datetime.combine(day, b_end) and datetime.combine(day, b_start) < end),
+                    None
+                )
+                if blocking is not None:
+                    cursor = blocking
+                    continue
+                slot = AvailabilitySlot(doctor=doctor, date=day, start_time=cursor.time(), end_time=end.time())
+                slot.sync_timestamps()
+                if slot.starts_at > now:
+                    slots.append(slot)
+                cursor = end
+        day += timedelta(days=1)
+    return slots
+
+
+def find_conflicts(doctor, slots):
+    """Pair each new slot with an existing slot it overlaps.
+
+    Fetches every existing slot in the covered range with one query and
+    sweeps both sorted lists, so the cost is one index scan plus
+    O(new + existing).
+    """
+    if not slots:
+        return []
+    slots = sorted(slots, key=lambda slot: slot.starts_at)
+    existing = list(
+        AvailabilitySlot.objects.overlapping(
+            doctor, slots[0].starts_at, max(slot.ends_at for slot in slots)
+        ).order_by('starts_at').only('id', 'date', 'start_time', 'end_time', 'starts_at', 'ends_at')
+    )
+    conflicts = []
+    i = 0
+    for slot in slots:
+        # Existing slots ending before this one starts cannot overlap it or any later one
+        while i < len(existing) and existing[i].ends_at <= slot.starts_at:
+            i += 1
+        j = i
+        while j < len(existing) and existing[j].starts_at < slot.ends_at:
+            if existing[j].ends_at > slot.starts_at:
+                conflicts.append((slot, existing[j]))
+                break
+            j += 1
+    return conflicts
+
+
+def create_slots(slots):
+    """Insert slots in batches inside one transaction.
+
+    Raises IntegrityError if a concurrent change makes any slot overlap,
+    in which case none are created.
+    """
+    with transaction.atomic():
+        created = AvailabilitySlot.objects.bulk_create(slots, batch_size=BULK_CREATE_BATCH_SIZE)
+        if created:
+            doctor_id = created[0].doctor_id
+            on_slots_opened(doctor_id, created)
+            transaction.on_commit(lambda: invalidate_schedule(doctor_id))
+    return created
+
+
+def _next_free_subquery(doctor_ref):
+    return Subquery(
+        AvailabilitySlot.objects.filter(doctor_id=doctor_ref, is_available=True, starts_at__gt=Now())
+        .order_by('starts_at').values('starts_at')[:1]
+    )
+
+
+def _week_end(day):
+    return day + timedelta(days=6 - day.weekday())
+
+
+def _in_counted_week(date, today):
+    return today <= date <= _week_end(today)
+
+
+def _add_to_counters(doctor_id, **deltas):
+    """Add `deltas` to the doctor's counters once the current transaction commits.
+
+    The UPDATE runs on its own after commit, so the profile row is locked
+    for that one statement rather than for the rest of a booking. A delta
+    lost to a crash in between is corrected by the daily reconcile.
+    """
+    def apply():
+        # Profiles not yet reset for today are left for the daily reconcile
+        DoctorProfile.objects.filter(user_id=doctor_id, counters_date=timezone.localdate()).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+    transaction.on_commit(apply)
+
+
+def on_slots_opened(doctor_id, slots):
+    """Update per-doctor summaries after bookable slots were created.
+
+    Call inside the transaction that created them.
+    """
+    now = timezone.now()
+    today = timezone.localdate()
+    opened_this_week = sum(1 for slot in slots if slot.is_available and _in_counted_week(slot.date, today))
+    if opened_this_week:
+        _add_to_counters(doctor_id, open_slots_this_week=opened_this_week)
+    earliest = min((slot.starts_at for slot in slots if slot.starts_at > now), default=None)
+    if earliest is not None:
+        DoctorProfile.objects.filter(user_id=doctor_id).filter(
+            Q(next_free_at__isnull=True) | Q(next_free_at__gt=earliest) | Q(next_free_at__lte=now)
+        ).update(next_free_at=earliest)
+    _set_day_bits(doctor_id, slots)
+
+
+def on_slot_closed(doctor_id, slot):
+    """Update per-doctor summaries after a free slot was booked or deleted.
+
+    Call inside the same transaction. The counters are updated after
+    commit and next_free_at only when the slot was the doctor's next free
+    one, so ordinary bookings do not hold the profile row. The slot's day
+    bitmap row is updated here and stays locked until commit, as it has to
+    change together with the slot; bookings of the same doctor on the same
+    day therefore queue on it for the rest of the (short) booking
+    transaction, while other days and doctors do not.
+    """
+    if _in_counted_week(slot.date, timezone.localdate()):
+        _add_to_counters(doctor_id, open_slots_this_week=-1)
+    DoctorProfile.objects.filter(user_id=doctor_id, next_free_at=slot.starts_at).update(
+        next_free_at=_next_free_subquery(doctor_id)
+    )
+    _clear_day_bits(doctor_id, slot)
+
+
+def on_appointment_booked(doctor_id, date):
+    """Update per-doctor summaries after an appointment on `date` was created"""
+    if date == timezone.localdate():
+        _add_to_counters(doctor_id, appointments_today=1)
+
+
+def refresh_next_free(doctor_ids=None):
+    """Recompute next_free_at where it has passed (or for `doctor_ids`), return rows updated"""
+    profiles = DoctorProfile.objects.all()
+    if doctor_ids is None:
+        profiles = profiles.filter(next_free_at__lte=timezone.now())
+    else:
+        profiles = profiles.filter(user_id__in=doctor_ids)
+    return profiles.update(next_free_at=_next_free_subquery(OuterRef('user_id')))
+
+
+COUNTER_FIELDS = ('open_slots_this_week', 'appointments_today', 'next_free_at')
+
+
+def _count_subquery(queryset):
+    return Coalesce(Subquery(queryset.order_by().values('doctor_id').annotate(n=Count('id')).values('n')), 0)
+
+
+def _expected_counters(today):
+    doctor = OuterRef('user_id')
+    return {
+        'open_slots_this_week': _count_subquery(AvailabilitySlot.objects.filter(
+            doctor_id=doctor, is_available=True, date__range=(today, _week_end(today))
+        )),
+        'appointments_today': _count_subquery(Appointment.objects.filter(doctor_id=doctor, appointment_date=today)),
+        'next_free_at': _next_free_subquery(doctor),
+    }
+
+
+def reconcile_doctor_counters(fix=True):
+    """Recompute every profile's counters and next_free_at from the source tables.
+
+    Returns how many profiles held a wrong value, per field. Counters left
+    from an earlier day are expected to be out of date and are reported
+    under 'counters_date' instead.
+    """
+    today = timezone.localdate()
+    expected = {f'expected_{field}': value for field, value in _expected_counters(today).items()}
+    rows = DoctorProfile.objects.annotate(**expected).values('counters_date', *COUNTER_FIELDS, *expected)
+    drift = dict.fromkeys(('counters_date',) + COUNTER_FIELDS, 0)
+    for row in rows.iterator():
+        fields = COUNTER_FIELDS
+        if row['counters_date'] != today:
+            drift['counters_date'] += 1
+            fields = ('next_free_at',)
+        for field in fields:
+            if row[field] != row[f'expected_{field}']:
+                drift[field] += 1
+    if fix:
+        DoctorProfile.objects.update(counters_date=today, **_expected_counters(today))
+    return drift
+
+
+# Earliest free slots across all doctors of one specialization, from now.
+# next_free_at is exact for doctors whose summary is ahead of now, so only
+# the first %(limit)s of them can contribute; doctors whose summary has
+# passed (not refreshed yet) are probed too. Each candidate is probed
+# through the (doctor, starts_at) WHERE is_available index.
+FIRST_AVAILABLE_SQL = f"""
+    WITH candidates AS (
+        (SELECT user_id FROM {DoctorProfile._meta.db_table}
+         WHERE specialization = %(specialization)s AND next_free_at > %(now)s
+         ORDER BY next_free_at
+         LIMIT %(limit)s)
+        UNION
+        (SELECT user_id FROM {DoctorProfile._meta.db_table}
+         WHERE specialization = %(specialization)s AND next_free_at <= %(now)s)
+    )
+    SELECT s.id
+    FROM candidates AS c
+    CROSS JOIN LATERAL (
+        SELECT id, starts_at FROM {AvailabilitySlot._meta.db_table}
+        WHERE doctor_id = c.user_id AND is_available AND starts_at > %(now)s
+        ORDER BY starts_at
+        LIMIT %(limit)s
+    ) AS s
+    ORDER BY s.starts_at, s.id
+    LIMIT %(limit)s
+"""
+# The same from a later time, which next_free_at cannot answer: walks the
+# open slots of all doctors in start order until %(limit)s of them match
+FIRST_AVAILABLE_AFTER_SQL = f"""
+    SELECT s.id
+    FROM {AvailabilitySlot._meta.db_table} AS s
+    JOIN {DoctorProfile._meta.db_table} AS p ON p.user_id = s.doctor_id
+    WHERE s.is_available AND s.starts_at > %(after)s AND p.specialization = %(specialization)s
+    ORDER BY s.starts_at, s.id
+    LIMIT %(limit)s
+"""
+
+
+def first_available_slots(specialization, after=None, limit=10):
+    """The `limit` earliest free slots of any doctor with `specialization`.
+
+    Only concrete slots are searched; openings from schedule rules are not.
+    """
+    now = timezone.now()
+    params = {'specialization': specialization, 'now': now, 'after': after, 'limit': limit}
+    sql = FIRST_AVAILABLE_AFTER_SQL if after is not None and after > now else FIRST_AVAILABLE_SQL
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        ids = [row[0] for row in cursor.fetchall()]
+    slots = AvailabilitySlot.objects.filter(id__in=ids).select_related('doctor', 'doctor__doctor_profile')
+    return sorted(slots, key=lambda slot: (slot.starts_at, slot.id))
+
+
+QUANTUM_SECONDS = DoctorDayBitmap.QUANTUM_MINUTES * 60
+QUANTA = DoctorDayBitmap.QUANTA
+BITMAP_TABLE = DoctorDayBitmap._meta.db_table
+
+# Slots of one doctor never overlap, so setting and clearing a slot's bits
+# in place keeps the bitmap exact without reading the slot table
+SET_DAY_BITS_SQL = f"""
+    INSERT INTO {BITMAP_TABLE} (doctor_id, date, free) VALUES (%s, %s, %s::bit({QUANTA}))
+    ON CONFLICT (doctor_id, date) DO UPDATE SET free = {BITMAP_TABLE}.free | EXCLUDED.free
+"""
+CLEAR_DAY_BITS_SQL = f"""
+    UPDATE {BITMAP_TABLE} SET free = free & ~%s::bit({QUANTA}) WHERE doctor_id = %s AND date = %s
+"""
+# Bits for every open slot, built in SQL; same encoding as quantum_mask()
+REBUILD_BITMAPS_SQL = f"""
+    INSERT INTO {BITMAP_TABLE} (doctor_id, date, free)
+    SELECT doctor_id, date, bit_or(mask)
+    FROM (
+        SELECT doctor_id, date, (
+            repeat('0', lo) || repeat('1', greatest(hi - lo, 0)) || repeat('0', {QUANTA} - greatest(hi, lo))
+        )::bit({QUANTA}) AS mask
+        FROM (
+            SELECT doctor_id, date,
+                   ceil(extract(epoch FROM start_time) / {QUANTUM_SECONDS})::int AS lo,
+                   floor(extract(epoch FROM end_time) / {QUANTUM_SECONDS})::int AS hi
+            FROM {AvailabilitySlot._meta.db_table}
+            WHERE is_available AND (%(doctor_ids)s IS NULL OR doctor_id = ANY(%(doctor_ids)s))
+        ) AS spans
+    ) AS masks
+    GROUP BY doctor_id, date
+"""
+FREE_DOCTORS_SQL = f"""
+    SELECT b.doctor_id
+    FROM {BITMAP_TABLE} AS b
+    JOIN {DoctorProfile._meta.db_table} AS p ON p.user_id = b.doctor_id
+    WHERE b.date = %(date)s AND p.specialization = %(specialization)s
+      AND b.free & %(mask)s::bit({QUANTA}) = %(mask)s::bit({QUANTA})
+"""
+COMMON_FREE_SQL = f"""
+    SELECT bit_and(free), count(*) FROM {BITMAP_TABLE} WHERE date = %s AND doctor_id = ANY(%s)
+"""
+
+
+def quantum_mask(start_time, end_time, cover=True):
+    """Bit string of the quanta in start_time-end_time.
+
+    With cover=True only quanta wholly inside the span are set (what a slot
+    makes free); with cover=False every quantum it touches is set (what a
+    requested window needs free).
+    """
+    start = start_time.hour * 3600 + start_time.minute * 60 + start_time.second
+    end = end_time.hour * 3600 + end_time.minute * 60 + end_time.second
+    if cover:
+        lo, hi = -(-start // QUANTUM_SECONDS), end // QUANTUM_SECONDS
+    else:
+        lo, hi = start // QUANTUM_SECONDS, -(-end // QUANTUM_SECONDS)
+    hi = max(lo, hi)
+    return '0' * lo + '1' * (hi - lo) + '0' * (QUANTA - hi)
+
+
+def _quantum_time(index):
+    if index >= QUANTA:
+        return dt_time.max
+    return (datetime.min + timedelta(seconds=index * QUANTUM_SECONDS)).time()
+
+
+def _day_masks(slots):
+    masks = {}
+    for slot in slots:
+        mask = int(quantum_mask(slot.start_time, slot.end_time), 2)
+        masks[slot.date] = masks.get(slot.date, 0) | mask
+    return sorted((date, format(mask, f'0{QUANTA}b')) for date, mask in masks.items())
+
+
+def _set_day_bits(doctor_id, slots):
+    masks = _day_masks(slot for slot in slots if slot.is_available)
+    if masks:
+        with connection.cursor() as cursor:
+            cursor.executemany(SET_DAY_BITS_SQL, [(doctor_id, date, mask) for date, mask in masks])
+
+
+def _clear_day_bits(doctor_id, slot):
+    with connection.cursor() as cursor:
+        cursor.execute(CLEAR_DAY_BITS_SQL, [quantum_mask(slot.start_time, slot.end_time), doctor_id, slot.date])
+
+
+def rebuild_day_bitmaps(doctor_ids=None):
+    """Recompute day bitmaps from the slot table (all doctors, or `doctor_ids`).
+
+    For backfills and repair; normal changes go through the slot hooks.
+    Returns the number of bitmap rows written.
+    """
+    bitmaps = DoctorDayBitmap.objects.all()
+    if doctor_ids is not None:
+        doctor_ids = list(doctor_ids)
+        bitmaps = bitmaps.filter(doctor_id__in=doctor_ids)
+    with transaction.atomic():
+        bitmaps.delete()
+        if doctor_ids == []:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(REBUILD_BITMAPS_SQL, {'doctor_ids': doctor_ids})
+            return cursor.rowcount
+
+
+def free_doctor_ids(specialization, date, start_time, end_time):
+    """Ids of doctors with `specialization` whose open slots cover start_time-end_time on `date`"""
+    params = {'specialization': specialization, 'date': date, 'mask': quantum_mask(start_time, end_time, cover=False)}
+    with connection.cursor() as cursor:
+        cursor.execute(FREE_DOCTORS_SQL, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def common_free_windows(doctor_ids, date, min_minutes=DoctorDayBitmap.QUANTUM_MINUTES):
+    """(start_time, end_time) windows on `date` when all of `doctor_ids` have open slots"""
+    doctor_ids = set(doctor_ids)
+    if not doctor_ids:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(COMMON_FREE_SQL, [date, list(doctor_ids)])
+        bits, found = cursor.fetchone()
+    if found < len(doctor_ids):
+        return []
+    min_quanta = -(-min_minutes * 60 // QUANTUM_SECONDS)
+    return [
+        (_quantum_time(run.start()), _quantum_time(run.end()))
+        for run in re.finditer('1+', bits)
+        if run.end() - run.start() >= min_quanta
+    ]
+
+
+def _schedule_version_key(doctor_id):
+    return f'schedule-version:{doctor_id}'
+
+
+def invalidate_schedule(doctor_id):
+    """Drop every cached week of a doctor's rule-based openings.
+
+    Call after the doctor's rules, exceptions or slots change. Old entries
+    are not deleted, they just stop being looked up and expire on their own.
+    """
+    cache.set(_schedule_version_key(doctor_id), time.time_ns(), None)
+
+
+def _week_cache_key(doctor_id, monday, version):
+    return f'schedule:{doctor_id}:{monday.isoformat()}:{version}'
+
+
+def expand_schedule(doctor, mondays):
+    """Openings generated by the doctor's rules for each week in `mondays`.
+
+    Returns {monday: [unsaved AvailabilitySlot, ...]}. Days with a
+    ScheduleException are skipped, and openings that overlap any existing
+    slot (booked or not) are dropped, since a concrete slot always wins
+    over a rule. Runs three queries however many weeks are asked for.
+    """
+    mondays = sorted(mondays)
+    if not mondays:
+        return {}
+    first, last = mondays[0], mondays[-1] + timedelta(days=6)
+    rules = list(ScheduleRule.objects.filter(doctor=doctor, valid_from__lte=last).filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gte=first)
+    ))
+    closed = set(
+        ScheduleException.objects.filter(doctor=doctor, date__range=(first, last)).values_list('date', flat=True)
+    )
+    openings = []
+    for monday in mondays:
+        for rule in rules:
+            day = monday + timedelta(days=rule.weekday)
+            if day in closed or not rule.applies_on(day):
+                continue
+            openings.extend(expand_slots(
+                doctor, day, day, {rule.weekday}, rule.start_time, rule.end_time, rule.slot_minutes
+            ))
+    taken = {id(slot) for slot, existing in find_conflicts(doctor, openings)}
+    
+    weeks = {monday: [] for monday in mondays}
+    for slot in sorted(openings, key=lambda slot: slot.starts_at):
+        if id(slot) not in taken:
+            weeks[slot.date - timedelta(days=slot.date.weekday())].append(slot)
+    return weeks
+
+
+def expand_schedule_week(doctor, monday):
+    """Uncached openings for the week starting `monday`"""
+    return expand_schedule(doctor, [monday])[monday]
+
+
+def scheduled_slots(doctor, after, until):
+    """Rule-based openings starting in (after, until], soonest first.
+
+    Each week's expansion is cached; weeks missing from the cache are
+    expanded together.
+    """
+    if not ScheduleRule.objects.filter(doctor=doctor).exists():
+        return []
+    mondays = []
+    monday = after.date() - timedelta(days=after.weekday())
+    while monday <= until.date():
+        mondays.append(monday)
+        monday += timedelta(weeks=1)
+    
+    version = cache.get(_schedule_version_key(doctor.id), 0)
+    keys = {monday: _week_cache_key(doctor.id, monday, version) for monday in mondays}
+    cached = cache.get_many(keys.values())
+    missing = [monday for monday in mondays if keys[monday] not in cached]
+    if missing:
+        fresh = {
+            keys[monday]: [(slot.date, slot.start_time, slot.end_time) for slot in week]
+            for monday, week in expand_schedule(doctor, missing).items()
+        }
+        cache.set_many(fresh, SCHEDULE_CACHE_TIMEOUT)
+        cached.update(fresh)
+    
+    slots = []
+    for monday in mondays:
+        for date, start_time, end_time in cached[keys[monday]]:
+            slot = AvailabilitySlot(doctor=doctor, date=date, start_time=start_time, end_time=end_time)
+            slot.sync_timestamps()
+            if after < slot.starts_at <= until:
+                slots.append(slot)
+    return slots
+
+
+# Keysets of the doctor's availability list (newest first) and of the
+# patients' doctor directory
+AVAILABILITY_LIST_KEYS = ('date', 'start_time', 'id')
+DIRECTORY_KEYS = ('sort_name', 'id')
+
+
+def dashboard_slots(doctor):
+    """The doctor dashboard's slots: the first 20 from today on"""
+    return AvailabilitySlot.objects.filter(
+        doctor=doctor, date__gte=timezone.now().date()
+    ).order_by('date', 'start_time')[:20]
+
+
+def availability_list_queryset(doctor):
+    """The doctor's slots for the availability list, paged by AVAILABILITY_LIST_KEYS"""
+    return AvailabilitySlot.objects.filter(doctor=doctor)
+
+
+def open_slots_after(doctor, after):
+    """The doctor's unbooked slots starting after `after`, soonest first"""
+    return AvailabilitySlot.objects.filter(doctor=doctor, is_available=True, starts_at__gt=after).order_by('starts_at')
+
+
+def bookable_slots_page(doctor, cursor=None, page_size=None):
+    """One page of a doctor's bookable slots, concrete and rule-based merged.
+
+    Slots of one doctor never overlap, so starts_at alone orders them and
+    is the cursor. Only forward paging is offered.
+    """
+    page_size = page_size or settings.PAGE_SIZE
+    now = timezone.now()
+    horizon_span = timedelta(weeks=settings.SCHEDULE_HORIZON_WEEKS)
+    after = now
+    # decode_cursor has parsed starts_at into a datetime; an unusable
+    # cursor shows the first page
+    decoded = decode_cursor(cursor, ('starts_at',), AvailabilitySlot) if cursor else None
+    if decoded:
+        cursor_at = decoded[1][0]
+        if timezone.is_naive(cursor_at):
+            cursor_at = timezone.make_aware(cursor_at)
+        # Far enough from datetime.max that the horizon below cannot overflow
+        if cursor_at.replace(tzinfo=None) < datetime.max - 2 * horizon_span:
+            after = max(cursor_at, now)
+    
+    concrete = list(open_slots_after(doctor, after)[:page_size + 1])
+    if len(concrete) > page_size:
+        horizon = concrete[-1].starts_at
+    else:
+        horizon = after + horizon_span
+    merged = sorted(concrete + scheduled_slots(doctor, after, horizon), key=lambda slot: slot.starts_at)
+    
+    rows = merged[:page_size]
+    next_cursor = encode_cursor('next', rows[-1], ('starts_at',)) if len(merged) > page_size else None
+    return KeysetPage(rows, next_cursor, None, page_size)
+
+
+def directory_search_query(text):
+    """Prefix full-text query matching every word typed, e.g. 'car smi' -> car:* & smi:*"""
+    terms = re.findall(r'\w+', text.lower())
+    if not terms:
+        return None
+    return SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config='simple')
+
+
+def _rules_in_force(today):
+    return ScheduleRule.objects.filter(Q(valid_until__isnull=True) | Q(valid_until__gte=today))
+
+
+def has_schedule_rules(doctor):
+    """Whether the doctor has schedule rules that apply today or later.
+
+    next_free_at, open_slots_this_week and the day bitmaps count concrete
+    slots only, so for such a doctor they leave out the rule-based openings
+    and should not be shown.
+    """
+    return _rules_in_force(timezone.localdate()).filter(doctor=doctor).exists()
+
+
+def with_schedule_rules(profiles):
+    """`profiles` annotated with has_schedule_rules, as has_schedule_rules() gives it"""
+    rules = _rules_in_force(timezone.localdate()).filter(doctor=OuterRef('user_id'))
+    return profiles.annotate(has_schedule_rules=Exists(rules))
+
+
+def directory_queryset(text=''):
+    """Active doctors' profiles, optionally filtered by a search string.
+
+    Matching uses the GIN index on DoctorProfile.search_vector.
+    """
+    profiles = DoctorProfile.objects.filter(user__is_active=True).select_related('user')
+    query = directory_search_query(text)
+    if query is not None:
+        profiles = profiles.filter(search_vector=query)
+    return profiles
+
+
+def specialization_facets(profiles, limit=20):
+    """Most common specializations among `profiles`, with counts"""
+    return list(
+        profiles.exclude(specialization='')
+        .values('specialization')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'specialization')[:limit]
+    )
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from accounts.models import User
+from .models import DoctorProfile
+
+
+# User fields the profile or its search index depend on
+PROFILE_SOURCE_FIELDS = frozenset({'first_name', 'last_name', 'username', 'role'})
+
+
+@receiver(post_save, sender=User)
+def sync_doctor_profile(sender, instance, update_fields=None, **kwargs):
+    """Every doctor gets a profile, so the directory can list and search it"""
+    # e.g. update_last_login on every sign-in
+    if update_fields is not None and not PROFILE_SOURCE_FIELDS & update_fields:
+        return
+    if not instance.is_doctor():
+        return
+    profile, created = DoctorProfile.objects.get_or_create(user=instance)
+    if not created:
+        # Name may have changed
+        profile.refresh_search_index()
@@ -0,0 +1,134 @@
+from datetime import date, time, timedelta
+from django.db import IntegrityError
+from unittest import mock
+from django.test import TestCase
+from django.contrib.messages import get_messages
+from django.urls import reverse
+from accounts.models import User
+from appointments.services import book_slot
+from hms.query_budget import QueryBudgetTestMixin
+from .models import AvailabilitySlot, DoctorProfile, ScheduleRule
+from .services import create_slots, expand_slots, find_conflicts
+
+
+class BulkSlotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('doctor', 'doctor@example.com', 'password', role='doctor')
+        cls.day = date.today() + timedelta(days=14)
+        cls.existing = AvailabilitySlot.objects.create(
+            doctor=cls.doctor, date=cls.day, start_time=time(10, 15), end_time=time(10, 45)
+        )
+
+    def expand(self, breaks=()):
+        return expand_slots(self.doctor, self.day, self.day, {self.day.weekday()}, time(9), time(12), 30, breaks)
+
+    def test_expand_skips_breaks(self):
+        slots = self.expand(breaks=[(time(10), time(10, 45))])
+        self.assertEqual(
+            [(slot.start_time, slot.end_time) for slot in slots],
+            [(time(9), time(9, 30)), (time(9, 30), time(10)), (time(10, 45), time(11, 15)), (time(11, 15), time(11, 45))],
+        )
+
+    def test_find_conflicts_pairs_overlapping_slots(self):
+        conflicts = find_conflicts(self.doctor, self.expand())
+        self.assertEqual(
+            [(slot.start_time, existing.id) for slot, existing in conflicts],
+            [(time(10), self.existing.id), (time(10, 30), self.existing.id)],
+        )
+
+    def test_overlapping_batch_creates_nothing(self):
+        with self.assertRaises(IntegrityError):
+            create_slots(self.expand())
+        self.assertEqual(AvailabilitySlot.objects.filter(doctor=self.doctor).count(), 1)
+
+    def test_bulk_view_rejects_conflicts_unless_skipped(self):
+        self.client.force_login(self.doctor)
+        data = {
+            'start_date': self.day, 'end_date': self.day, 'weekdays': [self.day.weekday()],
+            'day_start': '09:00', 'day_end': '12:00', 'slot_minutes': 30,
+        }
+        url = reverse('doctors:create_availability_bulk')
+        response = self.client.post(url, data)
+        self.assertContains(response, '2 slot(s) overlap existing availability')
+        self.assertEqual(AvailabilitySlot.objects.filter(doctor=self.doctor).count(), 1)
+
+        response = self.client.post(url, {**data, 'skip_conflicts': 'on'})
+        self.assertRedirects(response, reverse('doctors:availability_list'))
+        self.assertEqual(AvailabilitySlot.objects.filter(doctor=self.doctor).count(), 5)
+
+
+class DeleteAvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('doctor', 'doctor@example.com', 'password', role='doctor')
+        cls.patient = User.objects.create_user('patient', 'patient@example.com', 'password', role='patient')
+        day = date.today() + timedelta(days=14)
+        cls.slots = create_slots(expand_slots(cls.doctor, day, day, {day.weekday()}, time(9), time(10), 30))
+
+    def setUp(self):
+        self.client.force_login(self.doctor)
+
+    def delete(self, slot):
+        return self.client.post(reverse('doctors:delete_availability', args=[slot.id]))
+
+    def test_deletes_a_free_slot(self):
+        response = self.delete(self.slots[0])
+        self.assertRedirects(response, reverse('doctors:availability_list'), fetch_redirect_response=False)
+        self.assertFalse(AvailabilitySlot.objects.filter(id=self.slots[0].id).exists())
+        self.assertEqual(DoctorProfile.objects.get(user=self.doctor).next_free_at, self.slots[1].starts_at)
+
+    def test_keeps_a_booked_slot(self):
+        book_slot(self.slots[0].id, self.patient)
+        response = self.delete(self.slots[0])
+        self.assertTrue(AvailabilitySlot.objects.filter(id=self.slots[0].id).exists())
+        self.assertEqual([str(message) for message in get_messages(response.wsgi_request)],
+                         ['Cannot delete a booked slot.'])
+
+
+class SyncDoctorProfileTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('doctor', 'doctor@example.com', 'password', role='doctor')
+
+    def test_unrelated_updates_leave_the_profile_alone(self):
+        with mock.patch.object(DoctorProfile, 'refresh_search_index') as refresh:
+            self.client.force_login(self.doctor)
+            self.doctor.save(update_fields=['phone_number'])
+            refresh.assert_not_called()
+            self.doctor.last_name = 'Smith'
+            self.doctor.save(update_fields=['last_name'])
+            refresh.assert_called_once()
+
+
+class DoctorViewQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """The budgets hold however many rows a page shows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('doctor', 'doctor@example.com', 'password', role='doctor')
+        patients = [
+            User.objects.create_user(f'patient{i}', f'patient{i}@example.com', 'password', role='patient')
+            for i in range(3)
+        ]
+        day = date.today() + timedelta(days=7)
+        for hour in range(9, 15):
+            slot = AvailabilitySlot.objects.create(
+                doctor=cls.doctor, date=day, start_time=time(hour), end_time=time(hour, 30)
+            )
+            if hour % 2:
+                book_slot(slot.id, patients[hour % 3])
+
+    def setUp(self):
+        self.client.force_login(self.doctor)
+
+    def test_dashboard_hides_summaries_with_schedule_rules(self):
+        self.assertContains(self.client.get(reverse('doctors:dashboard')), 'Next free slot')
+        ScheduleRule.objects.create(doctor=self.doctor, weekday=0, start_time=time(9), end_time=time(12))
+        self.assertNotContains(self.client.get(reverse('doctors:dashboard')), 'Next free slot')
+
+    def test_views_stay_within_budget(self):
+        for name in ('doctors:dashboard', 'doctors:availability_list', 'doctors:view_bookings'):
+            with self.subTest(view=name):
+                response = self.assertWithinQueryBudget(reverse(name))
+                self.assertEqual(response.status_code, 200)
@@ -9,7 +9,11 @@ urlpatterns = [
     path('profile/', views.manage_profile, name='manage_profile'),
     path('availability/', views.availability_list, name='availability_list'),
     path('availability/create/', views.create_availability, name='create_availability'),
+    path('availability/bulk/', views.create_availability_bulk, name='create_availability_bulk'),
     path('availability/<int:slot_id>/delete/', views.delete_availability, name='delete_availability'),
+    path('schedule/', views.schedule_rules, name='schedule_rules'),
+    path('schedule/rules/<int:rule_id>/delete/', views.delete_schedule_rule, name='delete_schedule_rule'),
+    path('schedule/days-off/<int:exception_id>/delete/', views.delete_schedule_exception, name='delete_schedule_exception'),
     path('bookings/', views.view_bookings, name='view_bookings'),
 ]
 
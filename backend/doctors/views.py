@@ -2,12 +2,20 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from accounts.models import User
-from .models import DoctorProfile, AvailabilitySlot
-from .forms import DoctorProfileForm, AvailabilitySlotForm
-from appointments.models import Appointment
+from .models import DoctorProfile, AvailabilitySlot, ScheduleRule, ScheduleException
+from .forms import (
+    DoctorProfileForm, AvailabilitySlotForm, BulkAvailabilityForm, ScheduleRuleForm, ScheduleExceptionForm
+)
+from .services import (
+    AVAILABILITY_LIST_KEYS, availability_list_queryset, dashboard_slots, expand_slots, find_conflicts, create_slots,
+    has_schedule_rules, invalidate_schedule, on_slots_opened, on_slot_closed,
+)
+from appointments.services import APPOINTMENT_LIST_KEYS, doctor_appointments, upcoming_appointments
+from hms.pagination import paginate_request
+from hms.query_budget import query_budget
 
 
 @login_required
@@ -15,6 +23,7 @@ def google_authorize(request):
     return redirect('/accounts/google/login/')
 
 
+@query_budget(8)
 @login_required
 def doctor_dashboard(request):
     """Doctor dashboard"""
@@ -25,22 +34,11 @@ def doctor_dashboard(request):
     # Get or create doctor profile
     profile, created = DoctorProfile.objects.get_or_create(user=request.user)
     
-    # Get upcoming appointments
-    upcoming_appointments = Appointment.objects.filter(
-        doctor=request.user,
-        appointment_date__gte=timezone.now().date()
-    ).order_by('appointment_date', 'appointment_time')[:10]
-    
-    # Get availability slots
-    availability_slots = AvailabilitySlot.objects.filter(
-        doctor=request.user,
-        date__gte=timezone.now().date()
-    ).order_by('date', 'start_time')[:20]
-    
     context = {
         'profile': profile,
-        'upcoming_appointments': upcoming_appointments,
-        'availability_slots': availability_slots,
+        'has_schedule_rules': has_schedule_rules(request.user),
+        'upcoming_appointments': upcoming_appointments(doctor_appointments(request.user), timezone.now()),
+        'availability_slots': dashboard_slots(request.user),
     }
     return render(request, 'doctors/dashboard.html', context)
 
@@ -67,6 +65,7 @@ def manage_profile(request):
     return render(request, 'doctors/manage_profile.html', {'form': form})
 
 
+@query_budget(5)
 @login_required
 def availability_list(request):
     """List doctor availability slots"""
@@ -74,8 +73,13 @@ def availability_list(request):
         messages.error(request, 'Access denied.')
         return redirect('accounts:home')
     
-    slots = AvailabilitySlot.objects.filter(doctor=request.user).order_by('-date', '-start_time')
-    return render(request, 'doctors/availability_list.html', {'slots': slots})
+    page = paginate_request(
+        request,
+        availability_list_queryset(request.user),
+        AVAILABILITY_LIST_KEYS,
+        descending=True
+    )
+    return render(request, 'doctors/availability_list.html', {'slots': page.object_list, 'page': page})
 
 
 @login_required
@@ -87,19 +91,75 @@ def create_availability(request):
         return redirect('accounts:home')
     
     if request.method == 'POST':
-        form = AvailabilitySlotForm(request.POST)
+        form = AvailabilitySlotForm(request.POST, doctor=request.user)
         if form.is_valid():
             slot = form.save(commit=False)
             slot.doctor = request.user
-            slot.save()
-            messages.success(request, 'Availability slot created successfully!')
-            return redirect('doctors:availability_list')
+            try:
+                with transaction.atomic():
+                    slot.save()
+                    on_slots_opened(request.user.id, [slot])
+            except IntegrityError:
+                # Lost a race with a concurrent request creating an overlapping slot
+                form.add_error(None, 'This slot overlaps one of your existing slots.')
+            else:
+                invalidate_schedule(request.user.id)
+                messages.success(request, 'Availability slot created successfully!')
+                return redirect('doctors:availability_list')
     else:
-        form = AvailabilitySlotForm()
+        form = AvailabilitySlotForm(doctor=request.user)
     
     return render(request, 'doctors/create_availability.html', {'form': form})
 
 
+@login_required
+@require_http_methods(["GET", "POST"])
+def create_availability_bulk(request):
+    """Create many availability slots from a date range and daily window"""
+    if not request.user.is_doctor():
+        messages.error(request, 'Access denied.')
+        return redirect('accounts:home')
+    
+    conflicts = []
+    if request.method == 'POST':
+        form = BulkAvailabilityForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            slots = expand_slots(
+                request.user,
+                data['start_date'],
+                data['end_date'],
+                data['weekdays'],
+                data['day_start'],
+                data['day_end'],
+                data['slot_minutes'],
+                data['breaks']
+            )
+            conflicts = find_conflicts(request.user, slots)
+            
+            if conflicts and data['skip_conflicts']:
+                conflicting = {id(slot) for slot, existing in conflicts}
+                slots = [slot for slot in slots if id(slot) not in conflicting]
+                conflicts = []
+            
+            if not slots:
+                form.add_error(None, 'No new slots to create for these settings.')
+            elif conflicts:
+                form.add_error(None, f'{len(conflicts)} slot(s) overlap existing availability. Nothing was created.')
+            else:
+                try:
+                    created = create_slots(slots)
+                except IntegrityError:
+                    form.add_error(None, 'Your availability changed while these slots were being created. Please try again.')
+                else:
+                    messages.success(request, f'{len(created)} availability slots created successfully!')
+                    return redirect('doctors:availability_list')
+    else:
+        form = BulkAvailabilityForm()
+    
+    return render(request, 'doctors/create_availability_bulk.html', {'form': form, 'conflicts': conflicts})
+
+
 @login_required
 @require_http_methods(["POST"])
 def delete_availability(request, slot_id):
@@ -108,18 +168,90 @@ def delete_availability(request, slot_id):
         messages.error(request, 'Access denied.')
         return redirect('accounts:home')
     
-    slot = get_object_or_404(AvailabilitySlot, id=slot_id, doctor=request.user)
-    
-    # Check if slot is booked
-    if not slot.is_available:
+    with transaction.atomic():
+        # Locked so a booking cannot take the slot between delete()'s
+        # collecting it and deleting it; the booking then finds it gone
+        slot = get_object_or_404(AvailabilitySlot.objects.select_for_update(), id=slot_id, doctor=request.user)
+        deleted, _ = AvailabilitySlot.objects.filter(id=slot_id, doctor=request.user, is_available=True).delete()
+        if deleted:
+            on_slot_closed(request.user.id, slot)
+    if not deleted:
         messages.error(request, 'Cannot delete a booked slot.')
         return redirect('doctors:availability_list')
-    
-    slot.delete()
+    invalidate_schedule(request.user.id)
     messages.success(request, 'Availability slot deleted successfully!')
     return redirect('doctors:availability_list')
 
 
+@login_required
+@require_http_methods(["GET", "POST"])
+def schedule_rules(request):
+    """Manage weekly schedule rules and days off"""
+    if not request.user.is_doctor():
+        messages.error(request, 'Access denied.')
+        return redirect('accounts:home')
+    
+    rule_form = ScheduleRuleForm(doctor=request.user)
+    exception_form = ScheduleExceptionForm()
+    if request.method == 'POST':
+        if request.POST.get('form') == 'exception':
+            exception_form = ScheduleExceptionForm(request.POST)
+            form = exception_form
+        else:
+            rule_form = ScheduleRuleForm(request.POST, doctor=request.user)
+            form = rule_form
+        if form.is_valid():
+            item = form.save(commit=False)
+            item.doctor = request.user
+            try:
+                item.save()
+            except IntegrityError:
+                form.add_error(None, 'You already have a day off on this date.')
+            else:
+                invalidate_schedule(request.user.id)
+                messages.success(request, 'Schedule updated successfully!')
+                return redirect('doctors:schedule_rules')
+    
+    context = {
+        'rules': ScheduleRule.objects.filter(doctor=request.user),
+        'exceptions': ScheduleException.objects.filter(doctor=request.user, date__gte=timezone.now().date()),
+        'rule_form': rule_form,
+        'exception_form': exception_form,
+    }
+    return render(request, 'doctors/schedule_rules.html', context)
+
+
+@login_required
+@require_http_methods(["POST"])
+def delete_schedule_rule(request, rule_id):
+    """Delete a schedule rule; already booked appointments are kept"""
+    if not request.user.is_doctor():
+        messages.error(request, 'Access denied.')
+        return redirect('accounts:home')
+    
+    rule = get_object_or_404(ScheduleRule, id=rule_id, doctor=request.user)
+    rule.delete()
+    invalidate_schedule(request.user.id)
+    messages.success(request, 'Schedule rule deleted successfully!')
+    return redirect('doctors:schedule_rules')
+
+
+@login_required
+@require_http_methods(["POST"])
+def delete_schedule_exception(request, exception_id):
+    """Delete a day off"""
+    if not request.user.is_doctor():
+        messages.error(request, 'Access denied.')
+        return redirect('accounts:home')
+    
+    exception = get_object_or_404(ScheduleException, id=exception_id, doctor=request.user)
+    exception.delete()
+    invalidate_schedule(request.user.id)
+    messages.success(request, 'Day off deleted successfully!')
+    return redirect('doctors:schedule_rules')
+
+
+@query_budget(5)
 @login_required
 def view_bookings(request):
     """View doctor bookings"""
@@ -127,6 +259,11 @@ def view_bookings(request):
         messages.error(request, 'Access denied.')
         return redirect('accounts:home')
     
-    appointments = Appointment.objects.filter(doctor=request.user).order_by('-appointment_date', '-appointment_time')
-    return render(request, 'doctors/view_bookings.html', {'appointments': appointments})
+    page = paginate_request(
+        request,
+        doctor_appointments(request.user),
+        APPOINTMENT_LIST_KEYS,
+        descending=True
+    )
+    return render(request, 'doctors/view_bookings.html', {'appointments': page.object_list, 'page': page})
 
@@ -0,0 +1,43 @@
+import logging
+from django.conf import settings
+from django.db import connection
+from .query_budget import QueryCounter, get_query_budget
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetMiddleware:
+    """Count the queries each request runs and warn when a view exceeds its budget.
+
+    Must be first in MIDDLEWARE so session and auth queries are counted too.
+    In DEBUG the totals are also returned in X-Query-Count / X-Query-Time-Ms.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        request.query_budget = None
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        budget = request.query_budget
+        if budget is not None and counter.count > budget:
+            message = (
+                f"{request.method} {request.path} ran {counter.count} queries "
+                f"({counter.duration * 1000:.1f} ms), budget is {budget}"
+            )
+            if settings.DEBUG:
+                logger.warning(message)
+            else:
+                logger.info(message)
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(counter.count)
+            response['X-Query-Time-Ms'] = f"{counter.duration * 1000:.1f}"
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
+        return None
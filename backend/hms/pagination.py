@@ -0,0 +1,176 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are fetched with a WHERE clause on the last row seen instead of an
+OFFSET, and no COUNT(*) is issued, so every page costs the same index range
+scan no matter how deep into the history it is. The ordering fields must end
+with a unique column (normally 'id') so that the order is total.
+"""
+
+import base64
+import json
+from datetime import date, datetime, time
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connection
+from django.db.models import Q
+
+
+class KeysetPage:
+    """One page of results plus opaque cursors for its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, page_size=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.page_size = page_size
+        self.query_string = ''
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def _field_value(obj, field):
+    for part in field.split('__'):
+        obj = getattr(obj, part)
+    if isinstance(obj, (date, datetime, time)):
+        return obj.isoformat()
+    return obj
+
+
+def encode_cursor(direction, obj, fields):
+    data = json.dumps([direction, [_field_value(obj, field) for field in fields]])
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def _model_field(model, path):
+    """The model field a (possibly related, e.g. 'user__last_name') field path points at"""
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def _parse_value(model, path, value):
+    """A cursor value converted to its field's type; ValueError if it does not fit"""
+    if value is None or isinstance(value, (list, dict)):
+        raise ValueError(f"Invalid cursor value for {path}")
+    if model is None:
+        return value
+    try:
+        field = _model_field(model, path)
+    except FieldDoesNotExist:
+        # An annotation; its type is unknown
+        return value
+    try:
+        parsed = field.to_python(value)
+    except (ValidationError, TypeError) as e:
+        raise ValueError(f"Invalid cursor value for {path}") from e
+    if parsed is None:
+        raise ValueError(f"Invalid cursor value for {path}")
+    if isinstance(parsed, int) and not isinstance(parsed, bool):
+        # Out of the column's range the database errors instead of matching nothing
+        low, high = connection.ops.integer_field_ranges.get(field.get_internal_type(), (None, None))
+        if low is not None and not low <= parsed <= high:
+            raise ValueError(f"Invalid cursor value for {path}")
+    return parsed
+
+
+def decode_cursor(cursor, fields, model=None):
+    """Return (direction, values) for a cursor, or None if it is not valid.
+
+    Cursors come from the query string, so with `model` given every value
+    is also checked against its field and returned as that field's type.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) != len(fields):
+        return None
+    try:
+        values = [_parse_value(model, field, value) for field, value in zip(fields, values)]
+    except ValueError:
+        return None
+    return direction, values
+
+
+def _beyond(fields, values, lookup):
+    """Row-value comparison (fields) <lookup> (values) expanded into a Q"""
+    condition = Q()
+    for i, field in enumerate(fields):
+        term = Q(**{f'{field}__{lookup}': values[i]})
+        for prefix_field, prefix_value in zip(fields[:i], values[:i]):
+            term &= Q(**{prefix_field: prefix_value})
+        condition |= term
+    return condition
+
+
+def first_page_query(queryset, fields, page_size=None, descending=False):
+    """The query paginate_keyset runs for the first page, one row over to tell if there are more"""
+    page_size = page_size or settings.PAGE_SIZE
+    return queryset.order_by(*[f'-{field}' if descending else field for field in fields])[:page_size + 1]
+
+
+def paginate_keyset(queryset, fields, cursor=None, page_size=None, descending=False):
+    """Return a KeysetPage of `queryset` ordered by `fields`"""
+    page_size = page_size or settings.PAGE_SIZE
+    decoded = decode_cursor(cursor, fields, queryset.model) if cursor else None
+    forward_order = [f'-{field}' if descending else field for field in fields]
+    backward_order = [field if descending else f'-{field}' for field in fields]
+
+    if decoded is None:
+        rows = list(first_page_query(queryset, fields, page_size, descending))
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = encode_cursor('next', rows[-1], fields) if has_more else None
+        return KeysetPage(rows, next_cursor, None, page_size)
+
+    direction, values = decoded
+    if direction == 'next':
+        lookup = 'lt' if descending else 'gt'
+        rows = list(queryset.filter(_beyond(fields, values, lookup)).order_by(*forward_order)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = encode_cursor('next', rows[-1], fields) if has_more else None
+        previous_cursor = encode_cursor('prev', rows[0], fields) if rows else None
+    else:
+        lookup = 'gt' if descending else 'lt'
+        rows = list(queryset.filter(_beyond(fields, values, lookup)).order_by(*backward_order)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        next_cursor = encode_cursor('next', rows[-1], fields) if rows else None
+        previous_cursor = encode_cursor('prev', rows[0], fields) if has_more else None
+    return KeysetPage(rows, next_cursor, previous_cursor, page_size)
+
+
+def paginate_request(request, queryset, fields, descending=False):
+    """Paginate using the `cursor` and `page_size` query parameters"""
+    try:
+        page_size = int(request.GET.get('page_size', settings.PAGE_SIZE))
+    except ValueError:
+        page_size = settings.PAGE_SIZE
+    page_size = max(1, min(page_size, settings.MAX_PAGE_SIZE))
+    page = paginate_keyset(queryset, fields, request.GET.get('cursor'), page_size, descending)
+    page.query_string = filter_query_string(request)
+    return page
+
+
+def filter_query_string(request):
+    """The request's query string without paging parameters, for page links"""
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    params.pop('page_size', None)
+    return params.urlencode()
@@ -0,0 +1,67 @@
+"""
+Per-view query budgets.
+
+Views declare the most queries a request may run with @query_budget(n).
+QueryBudgetMiddleware counts queries and their time for every request and
+warns when a view goes over its budget; QueryBudgetTestMixin lets a test
+assert the same thing. Budgets must not depend on how many rows a page
+renders, so a budget breach usually means a missing select_related.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import resolve
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of queries a view may run per request.
+
+    Apply it as the outermost decorator so the attribute is not hidden by
+    other wrappers.
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+def get_query_budget(view_func):
+    return getattr(view_func, 'query_budget', None)
+
+
+class QueryCounter:
+    """Execute wrapper that counts queries and the time spent in them"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.count += 1
+                self.duration += elapsed
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin asserting that views stay within their declared budget"""
+
+    def assertWithinQueryBudget(self, url, method='get', data=None, budget=None):
+        if budget is None:
+            budget = get_query_budget(resolve(urlsplit(url).path).func)
+            if budget is None:
+                self.fail(f"{url} does not declare a query budget")
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data or {})
+        if len(queries) > budget:
+            listing = '\n'.join(query['sql'] for query in queries.captured_queries)
+            self.fail(f"{url} ran {len(queries)} queries, budget is {budget}:\n{listing}")
+        return response
@@ -31,6 +31,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
 
     'allauth',
     'allauth.account',
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
     'patients',
     'doctors',
     'appointments',
+    'notifications',
 ]
 
 
@@ -51,6 +53,9 @@ SITE_ID = 1
 # -------------------------------------------------------------------
 
 MIDDLEWARE = [
+    # Must stay first so every query of the request is counted
+    'hms.middleware.QueryBudgetMiddleware',
+
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -146,8 +151,29 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# -------------------------------------------------------------------
+# CACHE
+# -------------------------------------------------------------------
+
+# Expanded schedule rules are cached per doctor per week. With more than
+# one server process use a shared backend (e.g. RedisCache) so that
+# invalidation reaches every process.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Keyset pagination for list views (see hms/pagination.py)
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# How far ahead schedule rules are expanded when listing bookable slots
+SCHEDULE_HORIZON_WEEKS = 8
+
 # -------------------------------------------------------------------
 # GOOGLE LOGIN (django-allauth)
 # -------------------------------------------------------------------
@@ -163,6 +189,15 @@ GOOGLE_CALENDAR_CLIENT_ID = os.getenv('GOOGLE_CALENDAR_CLIENT_ID')
 GOOGLE_CALENDAR_CLIENT_SECRET = os.getenv('GOOGLE_CALENDAR_CLIENT_SECRET')
 GOOGLE_CALENDAR_REDIRECT_URI = "http://localhost:8000/accounts/calendar/callback/"
 
+# Point the Calendar client at another server, e.g. manage.py
+# run_fake_calendar at http://localhost:8765/ (unset = Google)
+GOOGLE_CALENDAR_ROOT_URL = os.getenv('GOOGLE_CALENDAR_ROOT_URL')
+# Inserts per Calendar batch request (the API accepts up to 50)
+GOOGLE_CALENDAR_BATCH_SIZE = 50
+# Pace of calendar backfills (inserts per second into one user's calendar),
+# kept under the Calendar API's per-user quota
+GOOGLE_CALENDAR_BACKFILL_RATE = 5
+
 # -------------------------------------------------------------------
 # CORS
 # -------------------------------------------------------------------
@@ -180,6 +215,20 @@ CORS_ALLOW_CREDENTIALS = True
 
 EMAIL_SERVICE_URL = os.getenv('EMAIL_SERVICE_URL', 'http://localhost:3000/dev/send-email')
 
+# -------------------------------------------------------------------
+# OUTBOX DISPATCHER (manage.py run_dispatcher)
+# -------------------------------------------------------------------
+
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_RETRY_BASE_SECONDS = 5
+OUTBOX_RETRY_MAX_SECONDS = 3600
+# A claimed job becomes claimable again if its worker has not finished it
+# within this many seconds; keep it well above the slowest handler.
+OUTBOX_LEASE_SECONDS = 300
+# A doctor's booking emails are held this long from the first new booking
+# and then sent as one digest; patients' confirmations are not held.
+BOOKING_DIGEST_WINDOW_SECONDS = int(os.getenv('BOOKING_DIGEST_WINDOW_SECONDS', '600'))
+
 
 SOCIALACCOUNT_PROVIDERS = {
     'google': {
@@ -0,0 +1,79 @@
+import base64
+import json
+from django.test import TestCase
+from accounts.models import User
+from appointments.models import Appointment
+from .pagination import decode_cursor, encode_cursor, paginate_keyset
+
+
+def raw_cursor(direction, values):
+    data = json.dumps([direction, values]).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+class DecodeCursorTests(TestCase):
+    fields = ('appointment_date', 'appointment_time', 'id')
+
+    def test_round_trip_returns_field_types(self):
+        cursor = raw_cursor('next', ['2024-01-15', '09:30:00', 7])
+        direction, values = decode_cursor(cursor, self.fields, Appointment)
+        self.assertEqual(direction, 'next')
+        self.assertEqual([str(value) for value in values], ['2024-01-15', '09:30:00', '7'])
+        self.assertEqual(values[2], 7)
+
+    def test_rejects_malformed_cursors(self):
+        for cursor in ('', 'not base64!', raw_cursor('sideways', ['2024-01-15', '09:30:00', 7]),
+                       raw_cursor('next', ['2024-01-15', '09:30:00'])):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor, self.fields, Appointment))
+
+    def test_rejects_values_that_do_not_fit_their_field(self):
+        for values in (
+            ['2024-13-45', '09:30:00', 7],
+            ['2024-01-15', 'noon', 7],
+            ['2024-01-15', '09:30:00', 'seven'],
+            ['2024-01-15', '09:30:00', None],
+            ['2024-01-15', '09:30:00', [7]],
+            ['2024-01-15', '09:30:00', 2 ** 70],
+        ):
+            with self.subTest(values=values):
+                self.assertIsNone(decode_cursor(raw_cursor('next', values), self.fields, Appointment))
+
+
+class PaginateKeysetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            User.objects.create_user(f'user{i}', f'user{i}@example.com', 'password', role='patient')
+
+    def usernames(self, page):
+        return [user.username for user in page]
+
+    def test_pages_forward_and_back(self):
+        queryset = User.objects.all()
+        fields = ('username', 'id')
+        first = paginate_keyset(queryset, fields, page_size=2)
+        self.assertEqual(self.usernames(first), ['user0', 'user1'])
+        self.assertFalse(first.has_previous)
+
+        second = paginate_keyset(queryset, fields, first.next_cursor, page_size=2)
+        self.assertEqual(self.usernames(second), ['user2', 'user3'])
+
+        last = paginate_keyset(queryset, fields, second.next_cursor, page_size=2)
+        self.assertEqual(self.usernames(last), ['user4'])
+        self.assertFalse(last.has_next)
+
+        back = paginate_keyset(queryset, fields, last.previous_cursor, page_size=2)
+        self.assertEqual(self.usernames(back), ['user2', 'user3'])
+
+    def test_descending(self):
+        page = paginate_keyset(User.objects.all(), ('username', 'id'), page_size=3, descending=True)
+        self.assertEqual(self.usernames(page), ['user4', 'user3', 'user2'])
+        page = paginate_keyset(User.objects.all(), ('username', 'id'), page.next_cursor, page_size=3, descending=True)
+        self.assertEqual(self.usernames(page), ['user1', 'user0'])
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        user = User.objects.get(username='user3')
+        cursor = encode_cursor('next', user, ('username', 'id'))
+        page = paginate_keyset(User.objects.all(), ('username', 'id'), cursor[:-3] + '!!!', page_size=2)
+        self.assertEqual(self.usernames(page), ['user0', 'user1'])
@@ -0,0 +1,16 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import OutboxJob
+
+
+@admin.register(OutboxJob)
+class OutboxJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'available_at', 'group_key', 'locked_by', 'processed_at')
+    list_filter = ('kind', 'status')
+    search_fields = ('group_key',)
+    readonly_fields = ('created_at', 'processed_at')
+    actions = ['requeue']
+
+    @admin.action(description='Requeue selected jobs')
+    def requeue(self, request, queryset):
+        queryset.update(status='pending', attempts=0, available_at=timezone.now(), locked_by='', locked_until=None)
@@ -0,0 +1,227 @@
+import logging
+import os
+import random
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from django.db.models import F, Min, Q
+from django.utils import timezone
+from .handlers import BATCH_HANDLERS, HANDLERS
+from .models import OutboxJob
+
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter for a job that has failed `attempts` times"""
+    delay = settings.OUTBOX_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+    delay = min(delay, settings.OUTBOX_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_jobs(worker_id, limit):
+    """Lease up to `limit` due jobs to this worker.
+
+    Rows locked by another dispatcher are skipped rather than waited on, so
+    any number of dispatchers can poll the same table. A job whose lease has
+    run out (its worker died mid-job) becomes claimable again, unless that
+    was its last attempt: then it is dead-lettered instead.
+
+    When a job with a group key is due, the group's other pending jobs are
+    claimed with it even if they are not due yet (and beyond `limit`), so
+    the group is handled in one go.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            OutboxJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status='pending', available_at__lte=now)
+                | Q(status='processing', locked_until__lt=now)
+            )
+            .order_by('available_at', 'id')[:limit]
+        )
+        expired = [
+            job for job in jobs
+            if job.status == 'processing' and job.attempts >= settings.OUTBOX_MAX_ATTEMPTS
+        ]
+        if expired:
+            OutboxJob.objects.filter(id__in=[job.id for job in expired]).update(
+                status='dead',
+                last_error='Lease expired on the last attempt',
+                locked_by='',
+                locked_until=None,
+            )
+            for job in expired:
+                logger.error("Outbox job %s (%s) dead after its lease expired on attempt %s",
+                             job.id, job.kind, job.attempts)
+            jobs = [job for job in jobs if job not in expired]
+        group_keys = {job.group_key for job in jobs if job.group_key}
+        if group_keys:
+            jobs += list(
+                OutboxJob.objects.select_for_update(skip_locked=True)
+                .filter(group_key__in=group_keys, status='pending')
+                .exclude(id__in=[job.id for job in jobs])
+                .order_by('available_at', 'id')
+            )
+        if jobs:
+            OutboxJob.objects.filter(id__in=[job.id for job in jobs]).update(
+                status='processing',
+                locked_by=worker_id,
+                locked_until=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS),
+                attempts=F('attempts') + 1,
+            )
+    for job in jobs:
+        job.attempts += 1
+        job.locked_by = worker_id
+    return jobs
+
+
+def record_outcome(job, error=None):
+    """Store the result of running a claimed job, return its new status"""
+    if error is not None:
+        logger.warning("Outbox job %s (%s) attempt %s failed: %s", job.id, job.kind, job.attempts, error)
+        if job.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            status, available_at = 'dead', job.available_at
+        else:
+            status = 'pending'
+            available_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+        OutboxJob.objects.filter(id=job.id, locked_by=job.locked_by).update(
+            status=status,
+            available_at=available_at,
+            last_error=str(error),
+            locked_by='',
+            locked_until=None,
+        )
+        return 'retry' if status == 'pending' else status
+
+    OutboxJob.objects.filter(id=job.id, locked_by=job.locked_by).update(
+        status='done',
+        last_error='',
+        locked_by='',
+        locked_until=None,
+        processed_at=timezone.now(),
+    )
+    return 'done'
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome, return the new status"""
+    close_old_connections()
+    try:
+        HANDLERS[job.kind](**job.payload)
+    except Exception as e:
+        return record_outcome(job, e)
+    return record_outcome(job)
+
+
+def run_jobs(jobs):
+    """Run claimed jobs of one kind and record the outcomes, return the new statuses.
+
+    A kind with a batch handler gets one handler call for all the jobs.
+    """
+    kind = jobs[0].kind
+    if kind not in BATCH_HANDLERS:
+        return [run_job(job) for job in jobs]
+    close_old_connections()
+    try:
+        errors = BATCH_HANDLERS[kind]([job.payload for job in jobs])
+    except Exception as e:
+        errors = [e] * len(jobs)
+    return [record_outcome(job, error) for job, error in zip(jobs, errors)]
+
+
+def group_jobs(jobs):
+    """Split claimed jobs into units of work: each batchable kind together, other jobs alone"""
+    batches = {}
+    for job in jobs:
+        if job.kind in BATCH_HANDLERS:
+            batches.setdefault(job.kind, []).append(job)
+        else:
+            yield [job]
+    yield from batches.values()
+
+
+def queue_stats():
+    """Due-job backlog size and age of the oldest due job in seconds"""
+    now = timezone.now()
+    due = OutboxJob.objects.filter(status='pending', available_at__lte=now)
+    oldest = due.aggregate(oldest=Min('available_at'))['oldest']
+    return due.count(), (now - oldest).total_seconds() if oldest else 0.0
+
+
+class Dispatcher:
+    """Polls the outbox and runs claimed jobs on a bounded thread pool"""
+
+    def __init__(self, workers=4, batch_size=20, poll_interval=1.0, worker_id=None, stdout=None):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or default_worker_id()
+        self.stdout = stdout
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'done': 0, 'retry': 0, 'dead': 0}
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.claimed = 0
+        self.window_started = time.monotonic()
+
+    def record_claim(self, jobs):
+        now = timezone.now()
+        for job in jobs:
+            # Group members claimed ahead of time have no lag
+            lag = max((now - job.available_at).total_seconds(), 0.0)
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+        self.claimed += len(jobs)
+
+    def report(self):
+        elapsed = time.monotonic() - self.window_started
+        finished = sum(self.stats.values())
+        backlog, oldest = queue_stats()
+        avg_lag = self.lag_total / self.claimed if self.claimed else 0.0
+        self.stdout.write(
+            f"[{self.worker_id}] {finished / elapsed:.1f} jobs/s "
+            f"(done={self.stats['done']} retry={self.stats['retry']} dead={self.stats['dead']}) "
+            f"claim lag avg={avg_lag:.2f}s max={self.lag_max:.2f}s "
+            f"backlog={backlog} oldest={oldest:.1f}s"
+        )
+        self.reset_stats()
+
+    def run(self, once=False, report_interval=30.0):
+        in_flight = set()
+        last_report = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dispatcher') as pool:
+            while True:
+                capacity = self.workers * 2 - len(in_flight)
+                jobs = claim_jobs(self.worker_id, min(self.batch_size, capacity)) if capacity > 0 else []
+                self.record_claim(jobs)
+                for group in group_jobs(jobs):
+                    in_flight.add(pool.submit(run_jobs, group))
+
+                if in_flight:
+                    timeout = 0 if jobs and len(in_flight) < self.workers * 2 else self.poll_interval
+                    done, in_flight = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for status in future.result():
+                            self.stats[status] += 1
+                elif once:
+                    break
+                else:
+                    time.sleep(self.poll_interval)
+
+                if self.stdout and time.monotonic() - last_report >= report_interval:
+                    self.report()
+                    last_report = time.monotonic()
+        if self.stdout:
+            self.report()
@@ -0,0 +1,26 @@
+from accounts.services import send_welcome_email
+from appointments.services import (
+    create_appointment_calendar_event, create_appointment_calendar_events, run_calendar_backfill,
+    send_appointment_confirmation_email, send_booking_digest_emails,
+)
+
+
+# Maps OutboxJob.kind to the function that performs it. Each handler is
+# called with the job payload as keyword arguments and signals failure by
+# raising, which schedules a retry.
+HANDLERS = {
+    'calendar_event': create_appointment_calendar_event,
+    'calendar_backfill': run_calendar_backfill,
+    'booking_confirmation_email': send_appointment_confirmation_email,
+    'welcome_email': send_welcome_email,
+}
+
+# Kinds whose claimed jobs the dispatcher hands over together. Each batch
+# handler takes a list of payloads and returns one entry per payload: None
+# on success, otherwise the exception for that job.
+BATCH_HANDLERS = {
+    'calendar_event': create_appointment_calendar_events,
+    # Gets every pending item of each claimed doctor's digest; see
+    # dispatcher.claim_jobs
+    'booking_digest_email': send_booking_digest_emails,
+}
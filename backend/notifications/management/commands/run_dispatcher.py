@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from notifications.dispatcher import Dispatcher
+
+
+class Command(BaseCommand):
+    help = 'Run queued calendar and email jobs from the outbox on a worker pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Size of the worker thread pool')
+        parser.add_argument('--batch-size', type=int, default=20, help='Maximum jobs claimed per poll')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--report-interval', type=float, default=30.0, help='Seconds between throughput reports')
+        parser.add_argument('--worker-id', help='Name recorded on claimed jobs (default: host:pid)')
+        parser.add_argument('--once', action='store_true', help='Drain the due jobs and exit')
+
+    def handle(self, *args, **options):
+        dispatcher = Dispatcher(
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            poll_interval=options['interval'],
+            worker_id=options['worker_id'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(f"Dispatcher {dispatcher.worker_id} started with {dispatcher.workers} worker(s)")
+        try:
+            dispatcher.run(once=options['once'], report_interval=options['report_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Dispatcher stopped')
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:03
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def mark_failed_as_dead(apps, schema_editor):
+    OutboxJob = apps.get_model('notifications', 'OutboxJob')
+    OutboxJob.objects.filter(status='failed').update(status='dead')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outboxjob',
+            name='outbox_status_created_idx',
+        ),
+        migrations.AddField(
+            model_name='outboxjob',
+            name='available_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='outboxjob',
+            name='locked_by',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='outboxjob',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='outboxjob',
+            name='kind',
+            field=models.CharField(choices=[('calendar_event', 'Google Calendar event'), ('booking_confirmation_email', 'Booking confirmation email'), ('welcome_email', 'Welcome email')], max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='outboxjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('dead', 'Dead letter')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(mark_failed_as_dead, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='outboxjob',
+            index=models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_dispatcher'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxjob',
+            name='kind',
+            field=models.CharField(choices=[('calendar_event', 'Google Calendar event'), ('calendar_backfill', 'Google Calendar backfill'), ('booking_confirmation_email', 'Booking confirmation email'), ('welcome_email', 'Welcome email')], max_length=50),
+        ),
+    ]
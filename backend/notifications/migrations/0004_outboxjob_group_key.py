@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_outboxjob_calendar_backfill'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxjob',
+            name='group_key',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='outboxjob',
+            name='kind',
+            field=models.CharField(choices=[('calendar_event', 'Google Calendar event'), ('calendar_backfill', 'Google Calendar backfill'), ('booking_confirmation_email', 'Booking confirmation email'), ('booking_digest_email', 'Booking digest email'), ('welcome_email', 'Welcome email')], max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='outboxjob',
+            index=models.Index(condition=models.Q(('status', 'pending'), models.Q(('group_key', ''), _negated=True)), fields=['group_key'], name='outbox_pending_group_idx'),
+        ),
+    ]
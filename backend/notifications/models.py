@@ -0,0 +1,48 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class OutboxJob(models.Model):
+    """Side effect recorded in the same transaction as the change that caused it"""
+    KIND_CHOICES = [
+        ('calendar_event', 'Google Calendar event'),
+        ('calendar_backfill', 'Google Calendar backfill'),
+        ('booking_confirmation_email', 'Booking confirmation email'),
+        ('booking_digest_email', 'Booking digest email'),
+        ('welcome_email', 'Welcome email'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('dead', 'Dead letter'),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    # Jobs sharing a non-blank key are claimed and handled together, e.g.
+    # one doctor's booking digest items
+    group_key = models.CharField(max_length=100, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+            models.Index(
+                fields=['group_key'],
+                condition=Q(status='pending') & ~Q(group_key=''),
+                name='outbox_pending_group_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
@@ -0,0 +1,51 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+from .models import OutboxJob
+
+
+def enqueue_job(kind, **payload):
+    """Record a side effect to run after the surrounding transaction commits.
+
+    Call this inside the same transaction.atomic() block as the change that
+    caused it, so the job exists if and only if that change was committed.
+    """
+    return OutboxJob.objects.create(kind=kind, payload=payload)
+
+
+def digest_available_at(group_key):
+    """When a new item of the digest `group_key` is due.
+
+    It joins the digest's open window if the key has pending items, so the
+    window runs from the first item and a steady stream of bookings cannot
+    hold the digest back indefinitely; otherwise it opens a new window.
+    """
+    opened = OutboxJob.objects.filter(group_key=group_key, status='pending').aggregate(
+        opened=Min('available_at')
+    )['opened']
+    return opened or timezone.now() + timedelta(seconds=settings.BOOKING_DIGEST_WINDOW_SECONDS)
+
+
+def enqueue_booking_side_effects(appointment):
+    """Queue calendar events and confirmation emails for a new appointment.
+
+    The patient's confirmation goes out right away; the doctor's is an item
+    of their booking digest.
+    """
+    group_key = f'booking_digest:{appointment.doctor_id}'
+    jobs = [
+        OutboxJob(kind='calendar_event', payload={'appointment_id': appointment.id, 'participant': 'doctor'}),
+        OutboxJob(kind='calendar_event', payload={'appointment_id': appointment.id, 'participant': 'patient'}),
+        OutboxJob(
+            kind='booking_confirmation_email',
+            payload={'appointment_id': appointment.id, 'recipients': ['patient']},
+        ),
+        OutboxJob(
+            kind='booking_digest_email',
+            payload={'appointment_id': appointment.id},
+            group_key=group_key,
+            available_at=digest_available_at(group_key),
+        ),
+    ]
+    return OutboxJob.objects.bulk_create(jobs)
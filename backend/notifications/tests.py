@@ -0,0 +1,193 @@
+from datetime import date, time, timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from accounts.models import User
+from appointments.models import Appointment
+from appointments.services import send_booking_digest_emails
+from doctors.models import AvailabilitySlot
+from .dispatcher import claim_jobs, record_outcome, run_jobs
+from .handlers import BATCH_HANDLERS
+from .models import OutboxJob
+from .services import digest_available_at, enqueue_booking_side_effects
+
+
+class BookingTestCase(TestCase):
+    """Two doctors with three booked appointments between them"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctors = [
+            User.objects.create_user(f'doctor{i}', f'doctor{i}@example.com', 'password', role='doctor',
+                                     first_name='Doc', last_name=str(i))
+            for i in range(2)
+        ]
+        cls.patient = User.objects.create_user('patient', 'patient@example.com', 'password', role='patient',
+                                               first_name='Pat', last_name='Ient')
+        day = date.today() + timedelta(days=7)
+        cls.appointments = [
+            cls.book(cls.doctors[0], day, time(11)),
+            cls.book(cls.doctors[0], day, time(9)),
+            cls.book(cls.doctors[1], day, time(10)),
+        ]
+
+    @classmethod
+    def book(cls, doctor, day, start):
+        end = time(start.hour, 30)
+        slot = AvailabilitySlot.objects.create(doctor=doctor, date=day, start_time=start, end_time=end, is_available=False)
+        return Appointment.objects.create(
+            doctor=doctor, patient=cls.patient, availability_slot=slot,
+            appointment_date=day, appointment_time=start,
+        )
+
+
+class BookingSideEffectsTests(BookingTestCase):
+    def test_side_effects(self):
+        jobs = enqueue_booking_side_effects(self.appointments[2])
+        self.assertEqual(
+            [job.kind for job in jobs],
+            ['calendar_event', 'calendar_event', 'booking_confirmation_email', 'booking_digest_email'],
+        )
+        self.assertEqual([job.payload['participant'] for job in jobs[:2]], ['doctor', 'patient'])
+        self.assertEqual(jobs[2].payload['recipients'], ['patient'])
+        self.assertTrue(all(job.status == 'pending' for job in jobs))
+
+
+class ClaimJobsTests(TestCase):
+    def test_claims_due_jobs_only(self):
+        due = OutboxJob.objects.create(kind='welcome_email', payload={'user_id': 1})
+        OutboxJob.objects.create(
+            kind='welcome_email', payload={'user_id': 2}, available_at=timezone.now() + timedelta(minutes=5)
+        )
+        jobs = claim_jobs('worker-1', 10)
+        self.assertEqual([job.id for job in jobs], [due.id])
+        due.refresh_from_db()
+        self.assertEqual((due.status, due.locked_by, due.attempts), ('processing', 'worker-1', 1))
+        self.assertEqual(claim_jobs('worker-2', 10), [])
+
+    def test_reclaims_expired_lease(self):
+        job = OutboxJob.objects.create(
+            kind='welcome_email', payload={}, status='processing', attempts=1,
+            locked_by='worker-1', locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        [claimed] = claim_jobs('worker-2', 10)
+        self.assertEqual((claimed.id, claimed.attempts, claimed.locked_by), (job.id, 2, 'worker-2'))
+        # The first worker finishing late does not overwrite the new lease
+        job.locked_by = 'worker-1'
+        record_outcome(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), ('processing', 'worker-2'))
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_dead_letters_expired_lease_on_the_last_attempt(self):
+        job = OutboxJob.objects.create(
+            kind='welcome_email', payload={}, status='processing', attempts=2,
+            locked_by='worker-1', locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        with self.assertLogs('notifications.dispatcher', 'ERROR'):
+            self.assertEqual(claim_jobs('worker-2', 10), [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('dead', 2, ''))
+
+    def test_claims_pending_group_members_with_a_due_one(self):
+        later = timezone.now() + timedelta(minutes=5)
+        due = OutboxJob.objects.create(kind='booking_digest_email', payload={}, group_key='booking_digest:1')
+        sibling = OutboxJob.objects.create(
+            kind='booking_digest_email', payload={}, group_key='booking_digest:1', available_at=later
+        )
+        OutboxJob.objects.create(kind='booking_digest_email', payload={}, group_key='booking_digest:2', available_at=later)
+        jobs = claim_jobs('worker-1', 1)
+        self.assertEqual({job.id for job in jobs}, {due.id, sibling.id})
+
+
+@override_settings(OUTBOX_MAX_ATTEMPTS=2)
+# It would close the test transaction's connection
+@mock.patch('notifications.dispatcher.close_old_connections', mock.Mock())
+class RecordOutcomeTests(TestCase):
+    def claim(self):
+        OutboxJob.objects.filter(status='pending').update(available_at=timezone.now())
+        [job] = claim_jobs('worker-1', 10)
+        return job
+
+    def test_failure_is_retried_with_backoff_then_dead_lettered(self):
+        OutboxJob.objects.create(kind='welcome_email', payload={})
+        job = self.claim()
+        with self.assertLogs('notifications.dispatcher', 'WARNING'):
+            self.assertEqual(record_outcome(job, RuntimeError('smtp down')), 'retry')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error, job.locked_by), ('pending', 'smtp down', ''))
+        self.assertGreater(job.available_at, timezone.now())
+
+        job = self.claim()
+        with self.assertLogs('notifications.dispatcher', 'WARNING'):
+            self.assertEqual(record_outcome(job, RuntimeError('smtp still down')), 'dead')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('dead', 2))
+        self.assertEqual(claim_jobs('worker-1', 10), [])
+
+    def test_success(self):
+        OutboxJob.objects.create(kind='welcome_email', payload={})
+        job = self.claim()
+        self.assertEqual(record_outcome(job), 'done')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), ('done', ''))
+        self.assertIsNotNone(job.processed_at)
+
+    def test_batch_outcomes_are_recorded_per_job(self):
+        for appointment_id in (1, 2):
+            OutboxJob.objects.create(kind='booking_digest_email', payload={'appointment_id': appointment_id})
+        jobs = claim_jobs('worker-1', 10)
+        handler = mock.Mock(return_value=[None, RuntimeError('rejected')])
+        with mock.patch.dict(BATCH_HANDLERS, {'booking_digest_email': handler}), \
+                self.assertLogs('notifications.dispatcher', 'WARNING'):
+            self.assertEqual(run_jobs(jobs), ['done', 'retry'])
+        handler.assert_called_once_with([{'appointment_id': 1}, {'appointment_id': 2}])
+
+    def test_batch_handler_crash_fails_every_job(self):
+        for appointment_id in (1, 2):
+            OutboxJob.objects.create(kind='booking_digest_email', payload={'appointment_id': appointment_id})
+        jobs = claim_jobs('worker-1', 10)
+        handler = mock.Mock(side_effect=RuntimeError('email service down'))
+        with mock.patch.dict(BATCH_HANDLERS, {'booking_digest_email': handler}), \
+                self.assertLogs('notifications.dispatcher', 'WARNING'):
+            self.assertEqual(run_jobs(jobs), ['retry', 'retry'])
+
+
+class BookingDigestTests(BookingTestCase):
+    def test_digest_window_opens_with_the_first_item(self):
+        with override_settings(BOOKING_DIGEST_WINDOW_SECONDS=600):
+            first = enqueue_booking_side_effects(self.appointments[0])[-1]
+            second = enqueue_booking_side_effects(self.appointments[1])[-1]
+            self.assertGreater(first.available_at, timezone.now() + timedelta(seconds=590))
+            self.assertEqual(second.available_at, first.available_at)
+            self.assertEqual(second.group_key, f'booking_digest:{self.doctors[0].id}')
+            other = digest_available_at(f'booking_digest:{self.doctors[1].id}')
+            self.assertGreater(other, first.available_at)
+
+    def test_side_effects(self):
+        jobs = enqueue_booking_side_effects(self.appointments[2])
+        self.assertEqual(
+            [job.kind for job in jobs],
+            ['calendar_event', 'calendar_event', 'booking_confirmation_email', 'booking_digest_email'],
+        )
+        self.assertEqual(jobs[2].payload['recipients'], ['patient'])
+
+    def test_one_digest_per_doctor(self):
+        payloads = [{'appointment_id': appointment.id} for appointment in self.appointments]
+        payloads.append({'appointment_id': 0})
+        results = [
+            {'to': 'doctor0@example.com', 'status': 'sent'},
+            {'to': 'doctor1@example.com', 'status': 'failed', 'error': 'mailbox full'},
+        ]
+        with mock.patch('appointments.services.send_booking_digests', return_value=results) as send:
+            errors = send_booking_digest_emails(payloads)
+
+        [digests] = send.call_args.args
+        self.assertEqual([digest['doctor_email'] for digest in digests], ['doctor0@example.com', 'doctor1@example.com'])
+        # In appointment order, not booking order
+        self.assertEqual([item['appointment_time'] for item in digests[0]['appointments']], ['09:00:00', '11:00:00'])
+        self.assertEqual(digests[0]['appointments'][0]['patient_name'], 'Pat Ient')
+        # Deleted appointments count as sent; a failed digest fails all its items
+        self.assertEqual(errors[:2], [None, None])
+        self.assertIn('mailbox full', str(errors[2]))
+        self.assertIsNone(errors[3])
@@ -0,0 +1,96 @@
+from datetime import date, datetime, time, timedelta, timezone
+from django.test import TestCase
+from django.urls import reverse
+from accounts.models import User
+from appointments.services import book_slot
+from doctors.models import DoctorProfile, ScheduleRule
+from doctors.services import create_slots, expand_slots
+from hms.query_budget import QueryBudgetTestMixin
+
+
+class PatientViewTestCase(TestCase):
+    """Three cardiologists with a morning of slots each, some booked by the patient"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = User.objects.create_user('patient', 'patient@example.com', 'password', role='patient')
+        cls.day = date.today() + timedelta(days=7)
+        cls.doctors = []
+        for i in range(3):
+            doctor = User.objects.create_user(
+                f'doctor{i}', f'doctor{i}@example.com', 'password', role='doctor', first_name='Doc', last_name=str(i)
+            )
+            profile = DoctorProfile.objects.get(user=doctor)
+            profile.specialization = 'Cardiology'
+            profile.save()
+            slots = create_slots(expand_slots(doctor, cls.day, cls.day, {cls.day.weekday()}, time(9), time(12), 30))
+            book_slot(slots[i].id, cls.patient)
+            cls.doctors.append(doctor)
+
+    def setUp(self):
+        self.client.force_login(self.patient)
+
+
+class PatientViewQueryBudgetTests(QueryBudgetTestMixin, PatientViewTestCase):
+    def test_views_stay_within_budget(self):
+        urls = [
+            reverse('patients:dashboard'),
+            reverse('patients:doctor_list'),
+            reverse('patients:first_available') + '?specialization=Cardiology',
+            reverse('patients:doctor_availability', args=[self.doctors[0].id]),
+            reverse('patients:view_appointments'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.assertWithinQueryBudget(url)
+                self.assertEqual(response.status_code, 200)
+
+
+class FirstAvailableTests(PatientViewTestCase):
+    def get(self, **params):
+        return self.client.get(reverse('patients:first_available'), {'specialization': 'Cardiology', **params})
+
+    def get_json(self, **params):
+        return self.get(format='json', **params)
+
+    def test_earliest_slots_first(self):
+        results = self.get_json().json()['results']
+        self.assertEqual(len(results), 10)
+        # doctor0 has booked its 9:00 slot
+        self.assertEqual([result['doctor_id'] for result in results[:2]], [self.doctors[1].id, self.doctors[2].id])
+        self.assertEqual(results, sorted(results, key=lambda result: result['starts_at']))
+
+    def test_after_and_limit(self):
+        after = datetime.combine(self.day, time(10, 30))
+        results = self.get_json(after=after.isoformat(), limit=4).json()['results']
+        self.assertEqual(len(results), 4)
+        # A naive `after` is in the current time zone (UTC here)
+        after = after.replace(tzinfo=timezone.utc)
+        self.assertTrue(all(datetime.fromisoformat(result['starts_at']) > after for result in results))
+
+    def test_after_finds_doctors_free_earlier_too(self):
+        # Every doctor's next free slot is before `after`, so the summary
+        # cannot answer and the open slots are walked instead
+        after = datetime.combine(self.day, time(11), tzinfo=timezone.utc)
+        results = self.get_json(after=after.isoformat()).json()['results']
+        self.assertEqual(
+            [(result['doctor_id'], result['starts_at']) for result in results],
+            [(doctor.id, after.replace(minute=30).isoformat()) for doctor in self.doctors],
+        )
+
+    def test_invalid_parameters(self):
+        for params in ({'limit': '0'}, {'limit': '51'}, {'limit': 'ten'}, {'after': 'tomorrow'}, {'after': '2024-02-30T10:00'}):
+            with self.subTest(params=params):
+                response = self.get_json(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+        self.assertEqual(self.get(limit='0').status_code, 400)
+
+
+class DoctorListTests(PatientViewTestCase):
+    def test_hides_summaries_of_doctors_with_schedule_rules(self):
+        ScheduleRule.objects.create(doctor=self.doctors[0], weekday=0, start_time=time(9), end_time=time(12))
+        response = self.client.get(reverse('patients:doctor_list'))
+        profiles = {profile.user_id: profile for profile in response.context['profiles']}
+        self.assertEqual([profiles[doctor.id].has_schedule_rules for doctor in self.doctors], [True, False, False])
+        self.assertContains(response, 'Weekly schedule', count=1)
@@ -6,6 +6,8 @@ app_name = 'patients'
 urlpatterns = [
     path('dashboard/', views.patient_dashboard, name='dashboard'),
     path('doctors/', views.doctor_list, name='doctor_list'),
+    path('doctors/first-available/', views.first_available, name='first_available'),
+    path('doctors/autocomplete/', views.doctor_autocomplete, name='doctor_autocomplete'),
     path('doctors/<int:doctor_id>/availability/', views.doctor_availability, name='doctor_availability'),
     path('appointments/', views.view_appointments, name='view_appointments'),
 ]
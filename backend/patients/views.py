@@ -1,14 +1,25 @@
+from django.http import JsonResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from accounts.models import User
-from doctors.models import AvailabilitySlot, DoctorProfile
-from appointments.models import Appointment
+from doctors.models import DoctorProfile
+from doctors.services import (
+    DIRECTORY_KEYS, bookable_slots_page, directory_queryset, first_available_slots, specialization_facets,
+    with_schedule_rules,
+)
+from appointments.services import (
+    APPOINTMENT_LIST_KEYS, past_appointments, patient_appointments, upcoming_appointments
+)
+from hms.pagination import paginate_request
+from hms.query_budget import query_budget
 from .models import PatientProfile
 
 
+@query_budget(8)
 @login_required
 def patient_dashboard(request):
     """Patient dashboard"""
@@ -19,26 +30,17 @@ def patient_dashboard(request):
     # Get or create patient profile
     profile, created = PatientProfile.objects.get_or_create(user=request.user)
     
-    # Get upcoming appointments
-    upcoming_appointments = Appointment.objects.filter(
-        patient=request.user,
-        appointment_date__gte=timezone.now().date()
-    ).order_by('appointment_date', 'appointment_time')[:10]
-    
-    # Get past appointments
-    past_appointments = Appointment.objects.filter(
-        patient=request.user,
-        appointment_date__lt=timezone.now().date()
-    ).order_by('-appointment_date', '-appointment_time')[:10]
-    
+    now = timezone.now()
+    appointments = patient_appointments(request.user)
     context = {
         'profile': profile,
-        'upcoming_appointments': upcoming_appointments,
-        'past_appointments': past_appointments,
+        'upcoming_appointments': upcoming_appointments(appointments, now),
+        'past_appointments': past_appointments(appointments, now),
     }
     return render(request, 'patients/dashboard.html', context)
 
 
+@query_budget(5)
 @login_required
 def doctor_list(request):
     """List all doctors"""
@@ -46,10 +48,130 @@ def doctor_list(request):
         messages.error(request, 'Access denied.')
         return redirect('accounts:home')
     
-    doctors = User.objects.filter(role='doctor').select_related('doctor_profile')
-    return render(request, 'patients/doctor_list.html', {'doctors': doctors})
+    text = request.GET.get('q', '').strip()
+    specialization = request.GET.get('specialization', '').strip()
+    
+    profiles = directory_queryset(text)
+    facets = specialization_facets(profiles)
+    if specialization:
+        profiles = profiles.filter(specialization=specialization)
+    page = paginate_request(request, with_schedule_rules(profiles), DIRECTORY_KEYS)
+    
+    context = {
+        'profiles': page.object_list,
+        'page': page,
+        'facets': facets,
+        'q': text,
+        'specialization': specialization,
+    }
+    return render(request, 'patients/doctor_list.html', context)
+
+
+@login_required
+def doctor_autocomplete(request):
+    """Doctor names matching a typed prefix, as JSON"""
+    if not request.user.is_patient():
+        return JsonResponse({'error': 'Access denied.'}, status=403)
+    
+    text = request.GET.get('q', '').strip()
+    if not text:
+        return JsonResponse({'results': []})
+    
+    profiles = directory_queryset(text).order_by('sort_name', 'id')[:10]
+    results = [
+        {
+            'id': profile.user_id,
+            'name': f"Dr. {profile.user.get_full_name()}",
+            'specialization': profile.specialization,
+        }
+        for profile in profiles
+    ]
+    return JsonResponse({'results': results})
+
+
+FIRST_AVAILABLE_LIMIT = 10
+FIRST_AVAILABLE_MAX_LIMIT = 50
+
+
+def first_available_params(params):
+    """(after, limit) from the `after` (ISO datetime) and `limit` query parameters.
+
+    Raises ValueError with a message for the user if either is invalid.
+    """
+    after = None
+    if params.get('after'):
+        try:
+            after = parse_datetime(params['after'])
+        except ValueError:
+            after = None
+        if after is None:
+            raise ValueError("'after' must be an ISO 8601 date and time, e.g. 2024-01-15T09:00")
+        if timezone.is_naive(after):
+            after = timezone.make_aware(after)
+    limit = FIRST_AVAILABLE_LIMIT
+    if params.get('limit'):
+        try:
+            limit = int(params['limit'])
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= FIRST_AVAILABLE_MAX_LIMIT:
+            raise ValueError(f"'limit' must be a whole number from 1 to {FIRST_AVAILABLE_MAX_LIMIT}")
+    return after, limit
+
+
+@query_budget(6)
+@login_required
+def first_available(request):
+    """Earliest free slots across all doctors of a specialization.
+
+    `after` (ISO datetime, default now) and `limit` (default 10, at most
+    50) narrow the search; invalid values get a 400.
+    """
+    wants_json = request.GET.get('format') == 'json'
+    if not request.user.is_patient():
+        if wants_json:
+            return JsonResponse({'error': 'Access denied.'}, status=403)
+        messages.error(request, 'Access denied.')
+        return redirect('accounts:home')
+    
+    specialization = request.GET.get('specialization', '').strip()
+    slots, status = [], 200
+    try:
+        after, limit = first_available_params(request.GET)
+    except ValueError as e:
+        if wants_json:
+            return JsonResponse({'error': str(e)}, status=400)
+        messages.error(request, str(e))
+        status = 400
+    else:
+        if specialization:
+            slots = first_available_slots(specialization, after=after, limit=limit)
+    
+    if wants_json:
+        results = [
+            {
+                'slot_id': slot.id,
+                'doctor_id': slot.doctor_id,
+                'doctor': f"Dr. {slot.doctor.get_full_name()}",
+                'starts_at': slot.starts_at.isoformat(),
+                'ends_at': slot.ends_at.isoformat(),
+            }
+            for slot in slots
+        ]
+        return JsonResponse({'specialization': specialization, 'results': results})
+    
+    context = {
+        'slots': slots,
+        'facets': specialization_facets(directory_queryset()),
+        'specialization': specialization,
+        'after': request.GET.get('after', ''),
+        'limit': request.GET.get('limit', ''),
+    }
+    return render(request, 'patients/first_available.html', context, status=status)
 
 
+# Rule expansion on a cache miss adds a fixed three queries
+@query_budget(8)
 @login_required
 def doctor_availability(request, doctor_id):
     """View doctor availability"""
@@ -57,32 +179,23 @@ def doctor_availability(request, doctor_id):
         messages.error(request, 'Access denied.')
         return redirect('accounts:home')
     
-    doctor = User.objects.filter(id=doctor_id, role='doctor').first()
+    doctor = User.objects.filter(id=doctor_id, role='doctor').select_related('doctor_profile').first()
     if not doctor:
         messages.error(request, 'Doctor not found.')
         return redirect('patients:doctor_list')
     
-    # Get available slots (future and not booked)
-    now = timezone.now()
-    available_slots = AvailabilitySlot.objects.filter(
-        doctor=doctor,
-        is_available=True,
-        date__gte=now.date()
-    ).order_by('date', 'start_time')
-    
-    # Filter out past slots
-    available_slots = [
-        slot for slot in available_slots 
-        if slot.is_future()
-    ]
+    # Future unbooked slots plus openings from the doctor's schedule rules
+    page = bookable_slots_page(doctor, request.GET.get('cursor'))
     
     context = {
         'doctor': doctor,
-        'available_slots': available_slots,
+        'available_slots': page.object_list,
+        'page': page,
     }
     return render(request, 'patients/doctor_availability.html', context)
 
 
+@query_budget(5)
 @login_required
 def view_appointments(request):
     """View patient appointments"""
@@ -90,6 +203,11 @@ def view_appointments(request):
         messages.error(request, 'Access denied.')
         return redirect('accounts:home')
     
-    appointments = Appointment.objects.filter(patient=request.user).order_by('-appointment_date', '-appointment_time')
-    return render(request, 'patients/view_appointments.html', {'appointments': appointments})
+    page = paginate_request(
+        request,
+        patient_appointments(request.user),
+        APPOINTMENT_LIST_KEYS,
+        descending=True
+    )
+    return render(request, 'patients/view_appointments.html', {'appointments': page.object_list, 'page': page})
 
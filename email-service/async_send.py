@@ -0,0 +1,70 @@
+"""Async send mode of the handler (SMTP_SEND_MODE=async).
+
+Kept out of handler.py so that containers in the default sequential mode
+never import asyncio.
+"""
+import asyncio
+import smtplib
+from concurrent.futures import ThreadPoolExecutor
+from email_templates import render_batch
+
+
+class RateLimiter:
+    """Spaces out sends to at most `rate` per second (0 means no limit)"""
+    
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+    
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = asyncio.get_running_loop().time()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def send_messages_async(config, messages, send):
+    """Send a batch over up to config['concurrency'] pooled SMTP sessions at once.
+
+    smtplib is blocking, so each send runs in a worker thread; the
+    semaphore bounds how many run (and so how many connections are open)
+    and the limiter caps sends per second. `send(config, to_email,
+    subject, html_content, text_content)` sends one message. Results keep
+    the input order.
+    """
+    semaphore = asyncio.Semaphore(config['concurrency'])
+    limiter = RateLimiter(config['rate'])
+    loop = asyncio.get_running_loop()
+    # Own executor: the default one may have fewer workers than `concurrency`
+    executor = ThreadPoolExecutor(max_workers=config['concurrency'])
+    
+    async def send_one(message, content):
+        result = {'to': message.get('to'), 'action': message.get('action')}
+        if isinstance(content, ValueError):
+            result.update(status='failed', error=str(content))
+            return result
+        async with semaphore:
+            await limiter.wait()
+            try:
+                await loop.run_in_executor(executor, send, config, message['to'], *content)
+            except (smtplib.SMTPException, OSError) as e:
+                result.update(status='failed', error=str(e))
+            else:
+                result['status'] = 'sent'
+        return result
+    
+    contents = render_batch(messages)
+    try:
+        return await asyncio.gather(*(send_one(message, content) for message, content in zip(messages, contents)))
+    finally:
+        executor.shutdown(wait=False)
+
+
+def send_batch(config, messages, send):
+    """Run send_messages_async to completion"""
+    return asyncio.run(send_messages_async(config, messages, send))
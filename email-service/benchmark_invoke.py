@@ -0,0 +1,134 @@
+"""Cold and warm invocation latency of the email function.
+
+By default the function is invoked from plain Python against the mock SMTP
+server. Each run starts a fresh interpreter (a cold container): it times
+importing the handler, the first invocation, which also opens the SMTP
+session, and then a series of warm invocations in the same process:
+
+    python benchmark_invoke.py --runs 5 --warm 50
+
+With --url, the same request is posted to a running endpoint instead, e.g.
+under ``serverless offline`` (pointed at ``python mock_smtp.py`` with
+SMTP_STARTTLS=false). The first request is reported as cold; whether it
+really is depends on the server's handler reloading:
+
+    python benchmark_invoke.py --url http://localhost:3000/dev/send-email --warm 50
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmark_send import start_mock_server
+
+
+EVENT_BODY = {
+    'action': 'BOOKING_CONFIRMATION',
+    'to': 'patient@example.com',
+    'recipient_type': 'patient',
+    'patient_name': 'Bench Patient',
+    'doctor_name': 'Jane Smith',
+    'appointment_date': '2024-01-15',
+    'appointment_time': '10:00:00',
+}
+
+
+def percentile(values, pct):
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+
+# One cold run, in a fresh interpreter that has imported nothing else
+# first. argv: request body, warm invocations. Prints timings as JSON.
+CHILD = """
+import sys, time
+start = time.perf_counter()
+import handler
+imported = time.perf_counter()
+event = {'body': sys.argv[1]}
+response = handler.send_email(event, None)
+first = time.perf_counter()
+if response['statusCode'] != 200:
+    raise SystemExit('Invocation failed: ' + response['body'])
+warm_ms = []
+for _ in range(int(sys.argv[2])):
+    begin = time.perf_counter()
+    handler.send_email(event, None)
+    warm_ms.append((time.perf_counter() - begin) * 1000)
+import json
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_ms': (first - imported) * 1000,
+    'warm_ms': warm_ms,
+}))
+"""
+
+
+def run_local(args):
+    mock, port = start_mock_server(0.0)
+    env = dict(
+        os.environ,
+        SMTP_HOST='127.0.0.1',
+        SMTP_PORT=str(port),
+        SMTP_USER='bench@example.com',
+        SMTP_PASSWORD='bench',
+        SMTP_STARTTLS='false',
+        SMTP_SEND_MODE=args.send_mode,
+    )
+    imports, firsts, warm = [], [], []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD, json.dumps(EVENT_BODY), str(args.warm)],
+            env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout
+        timings = json.loads(output.splitlines()[-1])
+        imports.append(timings['import_ms'])
+        firsts.append(timings['first_ms'])
+        warm.extend(timings['warm_ms'])
+
+    print(f"{args.runs} cold starts, {args.warm} warm invocations each ({mock.messages} messages sent)")
+    print(f"  import handler   p50={statistics.median(imports):7.2f} ms  max={max(imports):7.2f} ms")
+    print(f"  first invocation p50={statistics.median(firsts):7.2f} ms  max={max(firsts):7.2f} ms")
+    if warm:
+        print(f"  warm invocation  p50={percentile(warm, 50):7.2f} ms  p95={percentile(warm, 95):7.2f} ms")
+
+
+def post(url, data):
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=30) as response:
+        response.read()
+    return (time.perf_counter() - start) * 1000
+
+
+def run_url(args):
+    data = json.dumps(EVENT_BODY).encode()
+    first = post(args.url, data)
+    warm = [post(args.url, data) for _ in range(args.warm)]
+    print(f"POST {args.url}")
+    print(f"  first request    {first:7.2f} ms")
+    if warm:
+        print(f"  later requests   p50={percentile(warm, 50):7.2f} ms  p95={percentile(warm, 95):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Cold starts to measure')
+    parser.add_argument('--warm', type=int, default=20, help='Warm invocations per cold start')
+    parser.add_argument('--send-mode', default='sequential', choices=['sequential', 'async'])
+    parser.add_argument('--url', help='Post to this endpoint instead of invoking the handler directly')
+    args = parser.parse_args()
+    if args.url:
+        run_url(args)
+    else:
+        run_local(args)
+
+
+if __name__ == '__main__':
+    main()
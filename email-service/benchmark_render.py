@@ -0,0 +1,129 @@
+"""Micro-benchmark of email rendering cost per message.
+
+Compares the registry's render_email and render_batch with the handler's
+path before the registry (checks, action branch and f-string builder),
+and reports what registering (compiling) the templates costs at cold
+start:
+
+    python benchmark_render.py --messages 500 --repeat 20
+"""
+import argparse
+import importlib
+import time
+
+import email_templates
+
+
+def fstring_booking_email(patient_name, doctor_name, appointment_date, appointment_time, recipient_type):
+    """The handler's former BOOKING_CONFIRMATION builder, kept as the baseline"""
+    if recipient_type == 'patient':
+        subject = f'Appointment Confirmed with Dr. {doctor_name}'
+        greeting = f'Hello {patient_name},'
+        main_text = f'Your appointment with Dr. {doctor_name} has been confirmed.'
+    else:
+        subject = f'New Appointment Booking - {patient_name}'
+        greeting = f'Hello Dr. {doctor_name},'
+        main_text = f'You have a new appointment booking with {patient_name}.'
+    other = f'Patient: {patient_name}' if recipient_type == 'doctor' else f'Doctor: Dr. {doctor_name}'
+    html_content = f"""
+    <html>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h2 style="color: #667eea;">Appointment Confirmation</h2>
+                <p>{greeting}</p>
+                <p>{main_text}</p>
+                <div style="background: #f8f9fa; padding: 15px; border-radius: 5px; margin: 20px 0;">
+                    <p><strong>Date:</strong> {appointment_date}</p>
+                    <p><strong>Time:</strong> {appointment_time}</p>
+                    <p><strong>{other.replace(': ', ':</strong> ', 1)}</p>
+                </div>
+                <p>Please make sure to be available at the scheduled time.</p>
+                <p>Best regards,<br>HMS Team</p>
+            </div>
+        </body>
+    </html>
+    """
+    text_content = f"""
+    Appointment Confirmation
+
+    {greeting}
+
+    {main_text}
+
+    Date: {appointment_date}
+    Time: {appointment_time}
+    {other}
+
+    Please make sure to be available at the scheduled time.
+
+    Best regards,
+    HMS Team
+    """
+    return subject, html_content, text_content
+
+
+def fstring_render(message):
+    """The handler's former per-message path, kept as the baseline"""
+    action = message.get('action')
+    if not action or not message.get('to'):
+        raise ValueError('Missing required fields: action and to')
+    if action == 'BOOKING_CONFIRMATION':
+        return fstring_booking_email(
+            message.get('patient_name', ''),
+            message.get('doctor_name', ''),
+            message.get('appointment_date', ''),
+            message.get('appointment_time', ''),
+            message.get('recipient_type', 'patient'),
+        )
+    raise ValueError(f'Unknown action: {action}')
+
+
+def doctor_batch(count):
+    """Confirmations to one doctor, as a busy doctor's batch would be"""
+    return [
+        {
+            'action': 'BOOKING_CONFIRMATION',
+            'to': 'doctor@example.com',
+            'recipient_type': 'doctor',
+            'patient_name': f'Patient {i}',
+            'doctor_name': 'Jane Smith',
+            'appointment_date': '2024-01-15',
+            'appointment_time': f'{9 + i % 8:02d}:{i % 4 * 15:02d}:00',
+        }
+        for i in range(count)
+    ]
+
+
+def best_of(repeat, func):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per method; the best is reported')
+    args = parser.parse_args()
+
+    messages = doctor_batch(args.messages)
+    runs = {
+        'f-string builder': lambda: [fstring_render(m) for m in messages],
+        'render_email': lambda: [email_templates.render_email(m) for m in messages],
+        'render_batch': lambda: email_templates.render_batch(messages),
+    }
+    print(f'{args.messages} doctor confirmations, best of {args.repeat}')
+    for label, func in runs.items():
+        elapsed = best_of(args.repeat, func)
+        print(f'  {label:<17} {elapsed * 1e6 / args.messages:7.2f} us/message')
+
+    # Re-running the module registers every template again
+    compile_time = best_of(args.repeat, lambda: importlib.reload(email_templates))
+    print(f'  registering all {len(email_templates.TEMPLATES)} templates: {compile_time * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Compare sequential and async batch sends against the mock SMTP server.
+
+Starts mock_smtp.py in a background thread and sends the same batch
+through handler.send_email in each mode, reporting wall time and
+throughput:
+
+    python benchmark_send.py --messages 200 --latency 0.05 --concurrency 1 4 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+
+import handler
+from mock_smtp import MockSMTPServer
+
+
+def start_mock_server(latency):
+    """Run a MockSMTPServer on its own event loop thread, return (server, port)"""
+    loop = asyncio.new_event_loop()
+    mock = MockSMTPServer(latency=latency)
+    port = loop.run_until_complete(mock.start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return mock, port
+
+
+def batch_event(count):
+    messages = [
+        {
+            'action': 'BOOKING_CONFIRMATION',
+            'to': f'patient{i}@example.com',
+            'recipient_type': 'patient' if i % 2 else 'doctor',
+            'patient_name': f'Patient {i}',
+            'doctor_name': 'Dr. Bench',
+            'appointment_date': '2024-01-15',
+            'appointment_time': '10:00:00',
+        }
+        for i in range(count)
+    ]
+    return {'body': json.dumps({'messages': messages})}
+
+
+def run(mock, event, mode, concurrency=1):
+    os.environ['SMTP_SEND_MODE'] = mode
+    os.environ['SMTP_CONCURRENCY'] = str(concurrency)
+    handler.CONFIG = handler.load_config()
+    handler.close_smtp_connection()
+    handler.close_pooled_connections()
+    connections, messages = mock.connections, mock.messages
+    start = time.perf_counter()
+    response = handler.send_email(event, None)
+    elapsed = time.perf_counter() - start
+    body = json.loads(response['body'])
+    if response['statusCode'] != 200:
+        raise SystemExit(f'{mode} send failed: {response["statusCode"]} {body}')
+    return elapsed, body['sent'], mock.messages - messages, mock.connections - connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.02, help='Mock server delay per message, seconds')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    mock, port = start_mock_server(args.latency)
+    os.environ.update({
+        'SMTP_HOST': '127.0.0.1',
+        'SMTP_PORT': str(port),
+        'SMTP_USER': 'bench@example.com',
+        'SMTP_PASSWORD': 'bench',
+        'SMTP_STARTTLS': 'false',
+        'SMTP_RATE_PER_SECOND': '0',
+    })
+    event = batch_event(args.messages)
+    print(f'{args.messages} messages, {args.latency * 1000:.0f} ms server latency per message')
+
+    runs = [('sequential', 1)] + [('async', n) for n in args.concurrency]
+    baseline = None
+    for mode, concurrency in runs:
+        elapsed, sent, delivered, connections = run(mock, event, mode, concurrency)
+        if delivered != args.messages:
+            raise SystemExit(f'{mode}: server received {delivered} of {args.messages} messages')
+        baseline = baseline or elapsed
+        label = mode if mode == 'sequential' else f'async x{concurrency}'
+        print(
+            f'  {label:<12} {elapsed:7.2f}s  {sent / elapsed:8.1f} msg/s  '
+            f'{connections:3d} new connections  speedup {baseline / elapsed:.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
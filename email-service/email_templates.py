@@ -0,0 +1,376 @@
+"""Email templates, registered by action and recipient type.
+
+Templates are plain strings with ``{field}`` placeholders, compiled once
+when registered (at cold start) into their static text and the fields
+between. Field values are HTML-escaped in the HTML part only; a missing or
+None value renders empty. A batch renders the fields shared by all its
+messages once and fills in just the rest per message.
+
+Adding an email type is a call to register_template; the handler needs
+no changes.
+"""
+import html
+import re
+import textwrap
+from string import Formatter
+
+
+_formatter = Formatter()
+_HTML_SPECIAL = re.compile('[&<>"\']')
+
+# (action, recipient type) -> EmailTemplate; a recipient type of None
+# matches recipients no template is registered for
+TEMPLATES = {}
+
+
+class CompiledTemplate:
+    """A template split into alternating static text and field names"""
+
+    def __init__(self, parts):
+        # [(text, field or None)], adjacent static text already joined
+        self.parts = parts
+        # Rendering copies `chunks` and fills the field values in at `slots`
+        self.chunks, self.slots = [], []
+        for text, field in parts:
+            self.chunks.append(text)
+            if field is not None:
+                self.slots.append((len(self.chunks), field))
+                self.chunks.append('')
+
+    @classmethod
+    def compile(cls, source):
+        parts = []
+        for text, field, spec, conversion in _formatter.parse(source):
+            if spec or conversion:
+                raise ValueError(f'Format specs are not supported: {{{field}}}')
+            if field is not None and not field.isidentifier():
+                raise ValueError(f'Invalid field name: {{{field}}}')
+            parts.append((text, field))
+        return cls(cls._join(parts))
+
+    @staticmethod
+    def _join(parts):
+        joined = []
+        for text, field in parts:
+            if joined and joined[-1][1] is None:
+                text = joined.pop()[0] + text
+            joined.append((text, field))
+        return joined
+
+    @property
+    def fields(self):
+        return {field for _, field in self.parts if field is not None}
+
+    def bind(self, values, escape=None):
+        """Template with the fields in `values` rendered into the static text.
+
+        `escape(value, field)`, if given, is applied to each value first.
+        """
+        parts = []
+        for text, field in self.parts:
+            if field in values:
+                value = values[field]
+                parts.append((text + (escape(value, field) if escape else value), None))
+            else:
+                parts.append((text, field))
+        return CompiledTemplate(self._join(parts))
+
+    def render(self, values):
+        chunks = self.chunks[:]
+        for index, field in self.slots:
+            chunks[index] = values[field]
+        return ''.join(chunks)
+
+
+def _text(value):
+    # Only a missing value renders empty; 0 and other falsy values show
+    return '' if value is None else str(value)
+
+
+def _escape_html(value):
+    # Most values (dates, times, plain names) need no escaping
+    return html.escape(value, quote=True) if _HTML_SPECIAL.search(value) else value
+
+
+class EmailTemplate:
+    """Subject, HTML and text templates of one email type.
+
+    `context` maps a message request to the template's field values;
+    fields it leaves out or sets to None render empty. Fields named in `html_safe` hold
+    markup the context has escaped itself and go into the HTML as they are.
+    """
+
+    def __init__(self, subject, html_body, text_body, context=None, html_safe=()):
+        self.subject = CompiledTemplate.compile(subject)
+        self.html = CompiledTemplate.compile(textwrap.dedent(html_body).strip() + '\n')
+        self.text = CompiledTemplate.compile(textwrap.dedent(text_body).strip() + '\n')
+        self.context = context
+        self.html_safe = frozenset(html_safe)
+        self.fields = self.subject.fields | self.html.fields | self.text.fields
+        self._set_html_fields()
+
+    def _set_html_fields(self):
+        self.html_fields = self.html.fields
+        self.html_escaped = sorted(self.html_fields - self.html_safe)
+
+    def values(self, message):
+        context = self.context(message) if self.context else message
+        return {field: _text(context.get(field)) for field in self.fields}
+
+    def bind(self, values):
+        """Partially rendered copy for a batch sharing `values`"""
+        bound = EmailTemplate.__new__(EmailTemplate)
+        bound.subject = self.subject.bind(values)
+        bound.html = self.html.bind(values, escape=self._escape)
+        bound.text = self.text.bind(values)
+        bound.context = self.context
+        bound.html_safe = self.html_safe
+        bound.fields = self.fields - values.keys()
+        bound._set_html_fields()
+        return bound
+
+    def render(self, values):
+        """(subject, html_content, text_content)"""
+        subject = self.subject.render(values)
+        if not subject.isprintable():
+            # A header cannot span lines
+            subject = ' '.join(subject.split())
+        # One scan of the values usually shows nothing needs escaping
+        if _HTML_SPECIAL.search(''.join([values[field] for field in self.html_escaped])) is None:
+            escaped = values
+        else:
+            # Escaped once per field, however often the field appears
+            escaped = {field: self._escape(values[field], field) for field in self.html_fields}
+        return subject, self.html.render(escaped), self.text.render(values)
+
+    def _escape(self, value, field):
+        return value if field in self.html_safe else _escape_html(value)
+
+
+def register_template(action, recipient_type, subject, html_body, text_body, context=None, html_safe=()):
+    """Register the email sent for `action` to `recipient_type` (None for any other)"""
+    template = EmailTemplate(subject, html_body, text_body, context, html_safe)
+    TEMPLATES[(action, recipient_type)] = template
+    return template
+
+
+def get_template(message):
+    """Template for a message request; ValueError if it is incomplete or unknown"""
+    action = message.get('action')
+    if not action or not message.get('to'):
+        raise ValueError('Missing required fields: action and to')
+    recipient_type = message.get('recipient_type') or message.get('role')
+    template = TEMPLATES.get((action, recipient_type)) or TEMPLATES.get((action, None))
+    if template is None:
+        raise ValueError(f'Unknown action: {action}')
+    return template
+
+
+def render_email(message):
+    """(subject, html_content, text_content) for one message request"""
+    template = get_template(message)
+    return template.render(template.values(message))
+
+
+def render_batch(messages):
+    """Render each message, sharing the work for fields common to a template's messages.
+
+    Returns a (subject, html_content, text_content) tuple per message, or
+    the ValueError for a message that cannot be rendered.
+    """
+    rendered = [None] * len(messages)
+    groups = {}
+    for index, message in enumerate(messages):
+        try:
+            template = get_template(message)
+        except ValueError as e:
+            rendered[index] = e
+            continue
+        groups.setdefault(id(template), (template, []))[1].append((index, template.values(message)))
+
+    for template, items in groups.values():
+        if len(items) > 1:
+            first = items[0][1]
+            shared = {
+                field: value for field, value in first.items()
+                if all(values[field] == value for _, values in items)
+            }
+            template = template.bind(shared)
+        for index, values in items:
+            rendered[index] = template.render(values)
+    return rendered
+
+
+LAYOUT_HTML = """\
+<html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: #667eea;">%(title)s</h2>
+%(content)s
+            <p>Best regards,<br>HMS Team</p>
+        </div>
+    </body>
+</html>
+"""
+
+
+def _fill(source, **pieces):
+    """Dedent `source` and insert registration-time `pieces` at its %(name)s markers"""
+    return textwrap.dedent(source) % pieces
+
+
+def html_page(title, content):
+    """HTML body with `content` under `title` in the shared layout"""
+    return LAYOUT_HTML % {'title': title, 'content': textwrap.indent(textwrap.dedent(content).strip(), ' ' * 12)}
+
+
+def _welcome_context(message):
+    return {'name': message.get('name') or 'User', 'role_display': (message.get('role') or 'user').title()}
+
+
+def _register_welcome(recipient_type, features):
+    register_template(
+        'SIGNUP_WELCOME', recipient_type,
+        subject='Welcome to Hospital Management System - {role_display}',
+        html_body=html_page('Welcome to Hospital Management System!', _fill("""
+            <p>Hello {name},</p>
+            <p>Thank you for signing up as a {role_display} on our Hospital Management System.</p>
+            <p>You can now:</p>
+            <ul>
+            %(features)s
+            </ul>
+            <p>If you have any questions, please don't hesitate to contact us.</p>
+        """, features='\n'.join(f'    <li>{html.escape(feature)}</li>' for feature in features))),
+        text_body=_fill("""
+            Welcome to Hospital Management System!
+
+            Hello {name},
+
+            Thank you for signing up as a {role_display} on our Hospital Management System.
+
+            You can now:
+            %(features)s
+
+            If you have any questions, please don't hesitate to contact us.
+
+            Best regards,
+            HMS Team
+        """, features='\n'.join(f'- {feature}' for feature in features)),
+        context=_welcome_context,
+    )
+
+
+_register_welcome('doctor', ['Set your availability time slots', 'Manage your appointments', 'View patient bookings'])
+_register_welcome(None, ['Browse available doctors', 'Book appointments', 'Manage your appointments'])
+
+
+def _register_booking_confirmation(recipient_type, subject, greeting, main_text, other_label, other_name):
+    pieces = {'greeting': greeting, 'main_text': main_text, 'other_label': other_label, 'other_name': other_name}
+    register_template(
+        'BOOKING_CONFIRMATION', recipient_type,
+        subject=subject,
+        html_body=html_page('Appointment Confirmation', _fill("""
+            <p>%(greeting)s</p>
+            <p>%(main_text)s</p>
+            <div style="background: #f8f9fa; padding: 15px; border-radius: 5px; margin: 20px 0;">
+                <p><strong>Date:</strong> {appointment_date}</p>
+                <p><strong>Time:</strong> {appointment_time}</p>
+                <p><strong>%(other_label)s:</strong> %(other_name)s</p>
+            </div>
+            <p>Please make sure to be available at the scheduled time.</p>
+        """, **pieces)),
+        text_body=_fill("""
+            Appointment Confirmation
+
+            %(greeting)s
+
+            %(main_text)s
+
+            Date: {appointment_date}
+            Time: {appointment_time}
+            %(other_label)s: %(other_name)s
+
+            Please make sure to be available at the scheduled time.
+
+            Best regards,
+            HMS Team
+        """, **pieces),
+    )
+
+
+_register_booking_confirmation(
+    'patient',
+    subject='Appointment Confirmed with Dr. {doctor_name}',
+    greeting='Hello {patient_name},',
+    main_text='Your appointment with Dr. {doctor_name} has been confirmed.',
+    other_label='Doctor',
+    other_name='Dr. {doctor_name}',
+)
+_register_booking_confirmation(
+    'doctor',
+    subject='New Appointment Booking - {patient_name}',
+    greeting='Hello Dr. {doctor_name},',
+    main_text='You have a new appointment booking with {patient_name}.',
+    other_label='Patient',
+    other_name='{patient_name}',
+)
+# Requests without a recipient type have always been treated as the patient's
+TEMPLATES[('BOOKING_CONFIRMATION', None)] = TEMPLATES[('BOOKING_CONFIRMATION', 'patient')]
+
+
+DIGEST_ROW_HTML = CompiledTemplate.compile(
+    '<tr><td style="padding: 4px 12px 4px 0;">{appointment_date}</td>'
+    '<td style="padding: 4px 12px 4px 0;">{appointment_time}</td><td>{patient_name}</td></tr>'
+)
+DIGEST_ROW_TEXT = CompiledTemplate.compile('- {appointment_date} {appointment_time}  {patient_name}')
+DIGEST_ROW_FIELDS = ('appointment_date', 'appointment_time', 'patient_name')
+
+
+def _digest_context(message):
+    rows = [
+        {field: _text(appointment.get(field)) for field in DIGEST_ROW_FIELDS}
+        for appointment in message.get('appointments') or []
+    ]
+    return {
+        'doctor_name': message.get('doctor_name'),
+        'count': len(rows),
+        # Lined up under the table's header row
+        'appointments_html': ('\n' + ' ' * 16).join(
+            DIGEST_ROW_HTML.render({field: _escape_html(value) for field, value in row.items()}) for row in rows
+        ),
+        'appointments_text': '\n'.join(DIGEST_ROW_TEXT.render(row) for row in rows),
+    }
+
+
+# Several bookings with one doctor, sent as one email in place of a
+# BOOKING_CONFIRMATION each. "appointments" lists them, each with
+# appointment_date, appointment_time and patient_name.
+register_template(
+    'BOOKING_DIGEST', None,
+    subject='New Appointment Bookings ({count})',
+    html_body=html_page('New Appointment Bookings', """
+        <p>Hello Dr. {doctor_name},</p>
+        <p>You have {count} new appointment bookings:</p>
+        <table style="background: #f8f9fa; padding: 15px; border-radius: 5px; margin: 20px 0;">
+            <tr><th align="left">Date</th><th align="left">Time</th><th align="left">Patient</th></tr>
+            {appointments_html}
+        </table>
+        <p>Please make sure to be available at the scheduled times.</p>
+    """),
+    text_body="""
+        New Appointment Bookings
+
+        Hello Dr. {doctor_name},
+
+        You have {count} new appointment bookings:
+
+        {appointments_text}
+
+        Please make sure to be available at the scheduled times.
+
+        Best regards,
+        HMS Team
+    """,
+    context=_digest_context,
+    html_safe=('appointments_html',),
+)
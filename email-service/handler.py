@@ -1,14 +1,69 @@
 import json
 import os
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import ssl
+import threading
+import time
+from functools import lru_cache
+from email_templates import get_template, render_batch
+
+
+SMTP_TIMEOUT = 10
+# A cached connection idle for longer than this is checked with NOOP
+# before use; SMTP servers drop idle clients after a few minutes
+SMTP_CHECK_AFTER_SECONDS = 10
+
+# SMTP session kept open between warm invocations of this container:
+# (host, port, user), the connection, and when it was last used
+_smtp = None
+
+# Idle connections of the async mode's pool, kept between warm invocations
+# like _smtp: [(key, connection, last used)]
+_idle_connections = []
+_idle_lock = threading.Lock()
+
+RESPONSE_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+
+
+def load_config():
+    """SMTP configuration from the environment"""
+    return {
+        'host': os.environ.get('SMTP_HOST', 'smtp.gmail.com'),
+        'port': int(os.environ.get('SMTP_PORT', '587')),
+        'user': os.environ.get('SMTP_USER', ''),
+        'password': os.environ.get('SMTP_PASSWORD', ''),
+        'starttls': os.environ.get('SMTP_STARTTLS', 'true').lower() != 'false',
+        # "async" sends a batch over a pool of connections at once
+        'mode': os.environ.get('SMTP_SEND_MODE', 'sequential'),
+        'concurrency': int(os.environ.get('SMTP_CONCURRENCY', '4')),
+        'rate': float(os.environ.get('SMTP_RATE_PER_SECOND', '0')),
+    }
+
+
+# Read once per container; Lambda environment variables cannot change
+# while it is warm
+CONFIG = load_config()
+
+
+def _response(status_code, payload):
+    return {
+        'statusCode': status_code,
+        'headers': RESPONSE_HEADERS,
+        'body': json.dumps(payload)
+    }
 
 
 def send_email(event, context):
     """
     AWS Lambda function to send emails
     Supports SIGNUP_WELCOME and BOOKING_CONFIRMATION actions
+
+    The body is either one message or {"messages": [message, ...]}; a batch
+    is sent over one SMTP session and answered with a status per message
+    (200 all sent, 207 some failed, 502 none sent).
     """
     try:
         # Parse request body
@@ -17,200 +72,166 @@ def send_email(event, context):
         else:
             body = event.get('body', {})
         
-        action = body.get('action')
-        to_email = body.get('to')
-        
-        if not action or not to_email:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'error': 'Missing required fields: action and to'
-                })
-            }
+        batch = 'messages' in body
+        messages = body['messages'] if batch else [body]
+        if not isinstance(messages, list) or not messages:
+            return _response(400, {'error': 'messages must be a non-empty list'})
+        if not batch:
+            try:
+                get_template(body)
+            except ValueError as e:
+                return _response(400, {'error': str(e)})
         
-        # Get SMTP configuration
-        smtp_host = os.environ.get('SMTP_HOST', 'smtp.gmail.com')
-        smtp_port = int(os.environ.get('SMTP_PORT', '587'))
-        smtp_user = os.environ.get('SMTP_USER', '')
-        smtp_password = os.environ.get('SMTP_PASSWORD', '')
+        if not CONFIG['user'] or not CONFIG['password']:
+            return _response(500, {'error': 'SMTP credentials not configured'})
         
-        if not smtp_user or not smtp_password:
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'error': 'SMTP credentials not configured'
-                })
-            }
-        
-        # Create email based on action
-        if action == 'SIGNUP_WELCOME':
-            subject, html_content, text_content = create_welcome_email(
-                body.get('name', 'User'),
-                body.get('role', 'user')
-            )
-        elif action == 'BOOKING_CONFIRMATION':
-            subject, html_content, text_content = create_booking_confirmation_email(
-                body.get('patient_name', ''),
-                body.get('doctor_name', ''),
-                body.get('appointment_date', ''),
-                body.get('appointment_time', ''),
-                body.get('recipient_type', 'patient')
-            )
+        if batch and CONFIG['mode'] == 'async':
+            # asyncio takes longer to import than the rest of the handler;
+            # containers in sequential mode never load it
+            from async_send import send_batch
+            results = send_batch(CONFIG, messages, send_pooled_email)
         else:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'error': f'Unknown action: {action}'
-                })
-            }
-        
-        # Send email
-        send_smtp_email(
-            smtp_host,
-            smtp_port,
-            smtp_user,
-            smtp_password,
-            to_email,
-            subject,
-            html_content,
-            text_content
-        )
+            results = send_messages(CONFIG, messages)
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
+        if not batch:
+            result = results[0]
+            if result['status'] != 'sent':
+                return _response(500, {'error': result['error']})
+            return _response(200, {
                 'message': 'Email sent successfully',
-                'to': to_email,
-                'action': action
+                'to': result['to'],
+                'action': result['action']
             })
-        }
+        
+        sent = sum(result['status'] == 'sent' for result in results)
+        status_code = 200 if sent == len(results) else 207 if sent else 502
+        return _response(status_code, {'sent': sent, 'failed': len(results) - sent, 'results': results})
         
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'error': str(e)
-            })
-        }
+        return _response(500, {'error': str(e)})
 
 
-def create_welcome_email(name, role):
-    """Create welcome email content"""
-    role_display = role.title()
-    subject = f'Welcome to Hospital Management System - {role_display}'
-    
-    html_content = f"""
-    <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #667eea;">Welcome to Hospital Management System!</h2>
-                <p>Hello {name},</p>
-                <p>Thank you for signing up as a {role_display} on our Hospital Management System.</p>
-                <p>You can now:</p>
-                <ul>
-                    {'<li>Set your availability time slots</li><li>Manage your appointments</li><li>View patient bookings</li>' if role == 'doctor' else '<li>Browse available doctors</li><li>Book appointments</li><li>Manage your appointments</li>'}
-                </ul>
-                <p>If you have any questions, please don't hesitate to contact us.</p>
-                <p>Best regards,<br>HMS Team</p>
-            </div>
-        </body>
-    </html>
-    """
-    
-    text_content = f"""
-    Welcome to Hospital Management System!
-    
-    Hello {name},
-    
-    Thank you for signing up as a {role_display} on our Hospital Management System.
-    
-    You can now:
-    {'- Set your availability time slots\n- Manage your appointments\n- View patient bookings' if role == 'doctor' else '- Browse available doctors\n- Book appointments\n- Manage your appointments'}
-    
-    If you have any questions, please don't hesitate to contact us.
-    
-    Best regards,
-    HMS Team
-    """
-    
-    return subject, html_content, text_content
-
-
-def create_booking_confirmation_email(patient_name, doctor_name, appointment_date, appointment_time, recipient_type):
-    """Create booking confirmation email content"""
-    if recipient_type == 'patient':
-        subject = f'Appointment Confirmed with Dr. {doctor_name}'
-        greeting = f'Hello {patient_name},'
-        main_text = f'Your appointment with Dr. {doctor_name} has been confirmed.'
-    else:
-        subject = f'New Appointment Booking - {patient_name}'
-        greeting = f'Hello Dr. {doctor_name},'
-        main_text = f'You have a new appointment booking with {patient_name}.'
-    
-    html_content = f"""
-    <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #667eea;">Appointment Confirmation</h2>
-                <p>{greeting}</p>
-                <p>{main_text}</p>
-                <div style="background: #f8f9fa; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                    <p><strong>Date:</strong> {appointment_date}</p>
-                    <p><strong>Time:</strong> {appointment_time}</p>
-                    {'<p><strong>Patient:</strong> ' + patient_name + '</p>' if recipient_type == 'doctor' else '<p><strong>Doctor:</strong> Dr. ' + doctor_name + '</p>'}
-                </div>
-                <p>Please make sure to be available at the scheduled time.</p>
-                <p>Best regards,<br>HMS Team</p>
-            </div>
-        </body>
-    </html>
-    """
-    
-    text_content = f"""
-    Appointment Confirmation
-    
-    {greeting}
-    
-    {main_text}
-    
-    Date: {appointment_date}
-    Time: {appointment_time}
-    {'Patient: ' + patient_name if recipient_type == 'doctor' else 'Doctor: Dr. ' + doctor_name}
-    
-    Please make sure to be available at the scheduled time.
-    
-    Best regards,
-    HMS Team
-    """
+def send_messages(config, messages):
+    """Send each message over the shared SMTP session, return a result per message"""
+    results = []
+    for message, content in zip(messages, render_batch(messages)):
+        result = {'to': message.get('to'), 'action': message.get('action')}
+        results.append(result)
+        if isinstance(content, ValueError):
+            result.update(status='failed', error=str(content))
+            continue
+        try:
+            send_smtp_email(config, message['to'], *content)
+        except (smtplib.SMTPException, OSError) as e:
+            result.update(status='failed', error=str(e))
+        else:
+            result['status'] = 'sent'
+    return results
+
+
+def _connection_key(config):
+    return (config['host'], config['port'], config['user'])
+
+
+def _is_alive(server, last_used):
+    if time.monotonic() - last_used <= SMTP_CHECK_AFTER_SECONDS:
+        return True
+    try:
+        return server.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+def _close_quietly(server):
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+@lru_cache(maxsize=None)
+def _tls_context():
+    # Loading the CA certificates takes tens of milliseconds; do it once
+    return ssl.create_default_context()
+
+
+def open_smtp_connection(config):
+    """New authenticated SMTP session"""
+    server = smtplib.SMTP(config['host'], config['port'], timeout=SMTP_TIMEOUT)
+    try:
+        if config.get('starttls', True):
+            server.starttls(context=_tls_context())
+        server.login(config['user'], config['password'])
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+def get_smtp_connection(config):
+    """Authenticated SMTP session for `config`, reusing the cached one while it is alive"""
+    global _smtp
+    key = _connection_key(config)
+    if _smtp is not None:
+        cached_key, server, last_used = _smtp
+        if cached_key == key and _is_alive(server, last_used):
+            _smtp = (key, server, time.monotonic())
+            return server
+        close_smtp_connection()
     
-    return subject, html_content, text_content
+    server = open_smtp_connection(config)
+    _smtp = (key, server, time.monotonic())
+    return server
 
 
-def send_smtp_email(smtp_host, smtp_port, smtp_user, smtp_password, to_email, subject, html_content, text_content):
-    """Send email via SMTP"""
+def close_smtp_connection():
+    global _smtp
+    if _smtp is not None:
+        server = _smtp[1]
+        _smtp = None
+        _close_quietly(server)
+
+
+def checkout_connection(config):
+    """A live idle pooled connection for `config`, or a new one"""
+    key = _connection_key(config)
+    while True:
+        with _idle_lock:
+            index = next((i for i, idle in enumerate(_idle_connections) if idle[0] == key), None)
+            if index is None:
+                break
+            _, server, last_used = _idle_connections.pop(index)
+        if _is_alive(server, last_used):
+            return server
+        _close_quietly(server)
+    return open_smtp_connection(config)
+
+
+def checkin_connection(config, server):
+    """Return a connection to the pool, closing it if the pool is full"""
+    with _idle_lock:
+        if len(_idle_connections) < config['concurrency']:
+            _idle_connections.append((_connection_key(config), server, time.monotonic()))
+            return
+    _close_quietly(server)
+
+
+def close_pooled_connections():
+    with _idle_lock:
+        idle = _idle_connections[:]
+        _idle_connections.clear()
+    for _, server, _ in idle:
+        _close_quietly(server)
+
+
+def build_mime_message(sender, to_email, subject, html_content, text_content):
+    # Imported on first send: most of email.mime is unused until then
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    
     msg = MIMEMultipart('alternative')
     msg['Subject'] = subject
-    msg['From'] = smtp_user
+    msg['From'] = sender
     msg['To'] = to_email
     
     # Add both plain text and HTML versions
@@ -219,10 +240,43 @@ def send_smtp_email(smtp_host, smtp_port, smtp_user, smtp_password, to_email, su
     
     msg.attach(part1)
     msg.attach(part2)
-    
-    # Send email
-    with smtplib.SMTP(smtp_host, smtp_port) as server:
-        server.starttls()
-        server.login(smtp_user, smtp_password)
+    return msg
+
+
+def _send_and_checkin(config, server, msg):
+    """Send on a checked-out connection, then pool it again or close it if broken"""
+    try:
         server.send_message(msg)
+    except smtplib.SMTPServerDisconnected:
+        server.close()
+        raise
+    except smtplib.SMTPException:
+        # Refused recipient or data: the session itself is still usable
+        checkin_connection(config, server)
+        raise
+    except OSError:
+        server.close()
+        raise
+    checkin_connection(config, server)
+
+
+def send_pooled_email(config, to_email, subject, html_content, text_content):
+    """Send email over a connection from the async mode's pool"""
+    msg = build_mime_message(config['user'], to_email, subject, html_content, text_content)
+    try:
+        _send_and_checkin(config, checkout_connection(config), msg)
+    except smtplib.SMTPServerDisconnected:
+        # Dropped by the server while pooled; retry once on a new session
+        _send_and_checkin(config, open_smtp_connection(config), msg)
 
+
+def send_smtp_email(config, to_email, subject, html_content, text_content):
+    """Send email via SMTP"""
+    msg = build_mime_message(config['user'], to_email, subject, html_content, text_content)
+    
+    # Send email; a session the server dropped is reopened once
+    try:
+        get_smtp_connection(config).send_message(msg)
+    except smtplib.SMTPServerDisconnected:
+        close_smtp_connection()
+        get_smtp_connection(config).send_message(msg)
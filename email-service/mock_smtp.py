@@ -0,0 +1,100 @@
+"""Local mock SMTP server for trying out and benchmarking the email service.
+
+Speaks just enough SMTP for smtplib: EHLO/HELO, AUTH PLAIN and LOGIN
+(any credentials are accepted), MAIL, RCPT, DATA, RSET, NOOP and QUIT.
+Messages are counted, not delivered. STARTTLS is not offered, so point
+the service at it with SMTP_STARTTLS=false:
+
+    python mock_smtp.py --port 2525 --latency 0.05
+    SMTP_HOST=127.0.0.1 SMTP_PORT=2525 SMTP_STARTTLS=false ...
+
+--latency delays every reply to DATA, standing in for a remote relay.
+"""
+import argparse
+import asyncio
+
+
+class MockSMTPServer:
+    """Asyncio SMTP server counting connections and accepted messages"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.connections = 0
+        self.messages = 0
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+
+        async def reply(*lines):
+            writer.write(''.join(f'{line}\r\n' for line in lines).encode())
+            await writer.drain()
+
+        await reply('220 mock-smtp ESMTP ready')
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command, _, argument = line.decode().rstrip('\r\n').partition(' ')
+                command = command.upper()
+                if command in ('EHLO', 'HELO'):
+                    await reply('250-mock-smtp', '250-AUTH PLAIN LOGIN', '250 8BITMIME')
+                elif command == 'AUTH':
+                    mechanism, _, initial = argument.partition(' ')
+                    if mechanism.upper() == 'LOGIN':
+                        # Username and password prompts, each answered with one line
+                        for _ in range(1 if initial else 2):
+                            await reply('334 VXNlcm5hbWU6')
+                            await reader.readline()
+                    elif not initial:
+                        await reply('334 ')
+                        await reader.readline()
+                    await reply('235 2.7.0 Authentication successful')
+                elif command in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                    await reply('250 OK')
+                elif command == 'DATA':
+                    await reply('354 End data with <CR><LF>.<CR><LF>')
+                    while (await reader.readline()).rstrip(b'\r\n') != b'.':
+                        pass
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    self.messages += 1
+                    await reply('250 OK queued')
+                elif command == 'QUIT':
+                    await reply('221 Bye')
+                    break
+                else:
+                    await reply('502 Command not implemented')
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, latency):
+    mock = MockSMTPServer(latency=latency)
+    port = await mock.start(host, port)
+    print(f'Mock SMTP server listening on {host}:{port}')
+    async with mock.server:
+        await mock.server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2525)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before accepting a message')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.latency))
+    except KeyboardInterrupt:
+        pass